@@ -1,12 +1,13 @@
 import streamlit as st
-from PIL import Image
+
+from utils.assets import logo
 
 st.set_page_config(
     page_title="Home")
 
 #image_path = '/home/pedro/Documentos/repos/ftc/img/'
-image = Image.open('logo.jpg')
-st.sidebar.image(image, width=120)
+# Logo decodificado uma vez por processo (utils.assets)
+st.sidebar.image(logo(), width=120)
 
 st.sidebar.markdown('# Cury Company')
 st.sidebar.markdown('## Fastest Delivery in town')
@@ -0,0 +1,147 @@
+""" Equivalência e tempo dos backends de consulta (pandas e SQLite)
+
+    Para cada estado de filtro de benchmarks.suite.FILTERS, compara o que
+    as páginas recebem de cada backend (utils.backend): o cubo filtrado, as
+    linhas filtradas, os entregadores distintos (total e por semana), as
+    consultas de período do índice de tempo (cubo, série diária e móvel) e
+    o índice de entregadores (resumo e perfil de um entregador). Os
+    gráficos e tabelas são funções só desses dados, então resultados iguais
+    aqui garantem páginas iguais. Imprime o tempo de cada consulta e
+    termina com código 1 se algum resultado for diferente. A mesma
+    comparação roda no pytest (tests/test_backends.py), sobre um dataset
+    sintético pequeno com células vazias.
+
+    Uso: python -m benchmarks.backends [--path dataset/train.csv]
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.suite import FILTERS
+from utils.backend import (BACKENDS, load_cube_index, load_distinct_index, load_filter_index,
+                           load_profile_index, load_time_index)
+from utils.cube import DIMENSIONS
+from utils.loader import DATASET_PATH
+from utils.maps import MAP_COLUMNS
+from utils.schema import decode_categories
+from utils.timeindex import TIME_DIMENSIONS
+
+
+def normalize(df):
+    """ Texto no lugar de category e linhas em ordem das colunas
+
+        A ordem das linhas do cubo e as categorias sem linhas não mudam os
+        gráficos, então não entram na comparação.
+    """
+    df = decode_categories(df)
+    for dims in [DIMENSIONS, TIME_DIMENSIONS]:
+        if isinstance(df, pd.DataFrame) and set(dims) <= set(df.columns):
+            return df.sort_values(dims).reset_index(drop=True)
+
+    return df
+
+
+def queries(path, backend):
+    """ Esta função tem a responsabilidade de montar as consultas
+
+        Retorna {nome: função sem argumentos} com as consultas das páginas
+        no backend informado.
+    """
+    cube_index = load_cube_index(path, backend)
+    filter_index = load_filter_index(path, backend)
+    distinct_index = load_distinct_index(path, backend)
+    time_index = load_time_index(path, backend)
+    profile_index = load_profile_index(path, backend)
+
+    result = {}
+    for name, (date, selections) in FILTERS.items():
+        result[f'{name}/cube'] = (cube_index.filter, date, selections)
+        result[f'{name}/rows'] = (filter_index.filter, date, selections)
+        result[f'{name}/extremes'] = (
+            lambda d, s: filter_index.extremes(d, s, ['Delivery_person_Age', 'Vehicle_condition']),
+            date, selections)
+        result[f'{name}/ratings'] = (
+            lambda d, s: filter_index.group_mean(d, s, ['Delivery_person_ID'],
+                                                 'Delivery_person_Ratings').reset_index(),
+            date, selections)
+        result[f'{name}/time_means'] = (
+            lambda d, s: filter_index.group_mean(d, s, ['City', 'Delivery_person_ID'],
+                                                 'Time_taken(min)').reset_index(),
+            date, selections)
+        result[f'{name}/deliverers'] = (distinct_index.count, date, selections)
+        result[f'{name}/deliverers_by_week'] = (
+            lambda d, s: distinct_index.count(d, s, by='order_week'), date, selections)
+        # Período com início, como no slider das páginas
+        period = ('2022-03-01', date)
+        result[f'{name}/rows_period'] = (filter_index.filter, period, selections)
+        result[f'{name}/map_period'] = (
+            lambda d, s: filter_index.filter(d, s, MAP_COLUMNS), period, selections)
+        result[f'{name}/time_cube'] = (time_index.cube, period, selections)
+        result[f'{name}/daily'] = (time_index.daily, period, selections)
+        result[f'{name}/rolling_28'] = (
+            lambda d, s: time_index.rolling(d, s, 28), period, selections)
+
+    # Índice de entregadores: resumo de todos e o perfil de um deles
+    deliverer = profile_index.ids[len(profile_index) // 2]
+    result['profile/summary'] = (lambda d, s: profile_index.summary, None, None)
+    for key in ['orders', 'City', 'Weatherconditions']:
+        result[f'profile/{key}'] = (
+            lambda d, s, key=key: profile_index.profile(deliverer, d)[key].reset_index(drop=True),
+            ('2022-03-01', '2022-04-13'), None)
+
+    return result
+
+
+def compare(expected, actual):
+    """ Retorna None se os resultados são iguais ou a mensagem do erro """
+    try:
+        if isinstance(expected, pd.DataFrame):
+            # As linhas do SQLite trazem também as colunas derivadas
+            pd.testing.assert_frame_equal(normalize(actual[expected.columns]),
+                                          normalize(expected))
+        elif isinstance(expected, pd.Series):
+            pd.testing.assert_series_equal(actual, expected)
+        elif actual != expected:
+            return f'{actual} != {expected}'
+    except AssertionError as error:
+        return str(error).splitlines()[0]
+
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=DATASET_PATH)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        runs = queries(args.path, backend)
+        print(f'{backend}: carga {time.perf_counter() - start:.3f}s')
+        for name, (func, date, selections) in runs.items():
+            start = time.perf_counter()
+            results[backend, name] = func(date, selections)
+            print(f'  {name:32s} {(time.perf_counter() - start) * 1000:8.1f} ms')
+
+    failed = []
+    reference = BACKENDS[0]
+    for backend in BACKENDS[1:]:
+        for (name_backend, name), value in results.items():
+            if name_backend != backend:
+                continue
+            error = compare(results[reference, name], value)
+            if error is not None:
+                failed.append(name)
+                print(f'{backend} {name}: {error}')
+
+    print('resultados diferentes: ' + ', '.join(failed) if failed else
+          'resultados iguais nos backends: ' + ', '.join(BACKENDS))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
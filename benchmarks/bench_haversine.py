@@ -0,0 +1,58 @@
+""" Micro-benchmark: coluna 'distance' com DataFrame.apply x haversine_np
+
+    Uso: python -m benchmarks.bench_haversine [n_linhas]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from haversine import haversine
+from utils.geo import haversine_np
+
+COLS = ['Restaurant_latitude', 'Restaurant_longitude',
+        'Delivery_location_latitude', 'Delivery_location_longitude']
+
+
+def make_coords(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-30, 30, n)
+    lon = rng.uniform(70, 90, n)
+    return pd.DataFrame({COLS[0]: lat,
+                         COLS[1]: lon,
+                         COLS[2]: lat + rng.uniform(-0.2, 0.2, n),
+                         COLS[3]: lon + rng.uniform(-0.2, 0.2, n)})
+
+
+def timeit(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(n=45000):
+    df = make_coords(n)
+
+    t_apply, ref = timeit(lambda: df.loc[:, COLS].apply(lambda x: haversine(
+        (x[COLS[0]], x[COLS[1]]), (x[COLS[2]], x[COLS[3]])), axis=1), repeat=1)
+    t_f64, d64 = timeit(lambda: haversine_np(*(df[c] for c in COLS)))
+    t_f32, d32 = timeit(lambda: haversine_np(*(df[c] for c in COLS),
+                                             dtype=np.float32))
+
+    np.testing.assert_allclose(d64, ref.to_numpy(), rtol=1e-9)
+    np.testing.assert_allclose(d32, ref.to_numpy(), rtol=0, atol=1e-2)
+
+    print(f'linhas: {n}')
+    print(f'apply + haversine : {t_apply * 1000:10.2f} ms')
+    print(f'haversine_np f64  : {t_f64 * 1000:10.2f} ms  ({t_apply / t_f64:.0f}x)')
+    print(f'haversine_np f32  : {t_f32 * 1000:10.2f} ms  ({t_apply / t_f32:.0f}x)')
+    print(f'erro máximo f64   : {np.abs(d64 - ref).max():.3e} km')
+    print(f'erro máximo f32   : {np.abs(d32 - ref).max():.3e} km')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,144 @@
+""" Gerador determinístico de um train.csv sintético
+
+    Reproduz o formato do dataset/train.csv: espaços no final dos textos,
+    sentinelas 'NaN ', 'conditions <clima>' e '(min) NN' no tempo de
+    entrega. A quantidade de entregadores cresce com a de linhas, com
+    ~ORDERS_PER_DELIVERER pedidos cada, como no dataset real. A mesma
+    semente e a mesma quantidade de linhas geram sempre o mesmo arquivo.
+
+    Uso: python -m benchmarks.generate <n_linhas> <saida.csv> [semente]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings',
+           'Restaurant_latitude', 'Restaurant_longitude',
+           'Delivery_location_latitude', 'Delivery_location_longitude',
+           'Order_Date', 'Time_Orderd', 'Time_Order_picked', 'Weatherconditions',
+           'Road_traffic_density', 'Vehicle_condition', 'Type_of_order',
+           'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City',
+           'Time_taken(min)']
+
+CITY_CODES = ['INDO', 'BANG', 'COIMB', 'CHEN', 'HYD', 'RANCHI', 'MYS', 'DEH',
+              'KOC', 'PUNE', 'LUDH', 'KNP', 'MUM', 'KOL', 'JAP', 'SUR', 'GOA',
+              'AURG', 'AGR', 'VAD', 'ALH', 'BHP']
+WEATHER = ['Sunny', 'Fog', 'Cloudy', 'Windy', 'Stormy', 'Sandstorms', 'NaN']
+TRAFFIC = ['Low', 'Medium', 'High', 'Jam']
+ORDERS = ['Snack', 'Meal', 'Drinks', 'Buffet']
+VEHICLES = ['motorcycle', 'scooter', 'electric_scooter']
+CITIES = ['Metropolitian', 'Urban', 'Semi-Urban']
+FESTIVAL = ['No', 'Yes']
+TIMES = ['%02d:%02d:00' % (h, m) for h in range(8, 24) for m in (0, 15, 30, 45)]
+
+FIRST_DAY = np.datetime64('2022-02-11')
+DAYS = 55
+
+# Probabilidade de 'NaN ' nas colunas que têm sentinelas no dataset real
+NAN_RATE = {'Delivery_person_Age': 0.04, 'Delivery_person_Ratings': 0.04,
+            'Time_Orderd': 0.04, 'Road_traffic_density': 0.01,
+            'multiple_deliveries': 0.02, 'Festival': 0.005, 'City': 0.02}
+
+# Linhas geradas por bloco (o arquivo é escrito bloco a bloco)
+CHUNK_ROWS = 500000
+
+# Pedidos por entregador no dataset real (~45 mil pedidos, 1320 entregadores)
+ORDERS_PER_DELIVERER = 34
+
+# Entregadores por restaurante no ID (DEL01 a DEL03)
+DELIVERERS_PER_RESTAURANT = 3
+
+# Versão do gerador: muda sempre que o conteúdo gerado muda (ver
+# benchmarks.suite.dataset_for)
+GENERATOR_VERSION = '2'
+
+
+def _choice(rng, values, n, suffix=' '):
+    return np.array([value + suffix for value in values], dtype=object)[
+        rng.integers(0, len(values), n)]
+
+
+def restaurant_count(n):
+    """ Restaurantes por cidade para n linhas
+
+        Os entregadores (cidades x restaurantes x DEL01-DEL03) acompanham
+        n, com ~ORDERS_PER_DELIVERER pedidos cada.
+    """
+    deliverers = n / ORDERS_PER_DELIVERER
+
+    return max(1, round(deliverers / (len(CITY_CODES) * DELIVERERS_PER_RESTAURANT)))
+
+
+def generate_chunk(start, n, seed=0, restaurants=None):
+    """ Esta função tem a responsabilidade de gerar um bloco de linhas
+
+        O gerador aleatório de cada bloco depende só da semente e da
+        posição da primeira linha, então o arquivo não depende de como foi
+        escrito. restaurants é a quantidade de restaurantes por cidade
+        nos IDs dos entregadores (padrão: restaurant_count(start + n)).
+    """
+    rng = np.random.default_rng([seed, start])
+    restaurants = restaurants or restaurant_count(start + n)
+
+    ids = np.arange(start, start + n)
+    city = rng.integers(0, len(CITY_CODES), n)
+    deliverer = pd.Series(np.array(CITY_CODES, dtype=object)[city]) + \
+        pd.Series(rng.integers(1, restaurants + 1, n)).map('RES{:02d}'.format) + \
+        pd.Series(rng.integers(1, DELIVERERS_PER_RESTAURANT + 1, n)).map('DEL{:02d} '.format)
+
+    lat = rng.uniform(10, 31, n).round(6)
+    lon = rng.uniform(72, 88, n).round(6)
+    dates = pd.Series(FIRST_DAY + rng.integers(0, DAYS, n).astype('timedelta64[D]'))
+
+    df = pd.DataFrame({
+        'ID': pd.Series(ids).map('0x{:04x} '.format),
+        'Delivery_person_ID': deliverer,
+        'Delivery_person_Age': rng.integers(20, 40, n).astype(str),
+        'Delivery_person_Ratings': rng.uniform(2.5, 5.0, n).round(1).astype(str),
+        'Restaurant_latitude': lat,
+        'Restaurant_longitude': lon,
+        'Delivery_location_latitude': (lat + rng.uniform(-0.1, 0.1, n)).round(6),
+        'Delivery_location_longitude': (lon + rng.uniform(-0.1, 0.1, n)).round(6),
+        'Order_Date': dates.dt.strftime('%d-%m-%Y'),
+        'Time_Orderd': _choice(rng, TIMES, n, suffix=''),
+        'Time_Order_picked': _choice(rng, TIMES, n, suffix=''),
+        'Weatherconditions': _choice(rng, WEATHER, n, suffix='').astype(object),
+        'Road_traffic_density': _choice(rng, TRAFFIC, n),
+        'Vehicle_condition': rng.integers(0, 4, n),
+        'Type_of_order': _choice(rng, ORDERS, n),
+        'Type_of_vehicle': _choice(rng, VEHICLES, n),
+        'multiple_deliveries': rng.integers(0, 4, n).astype(str),
+        'Festival': np.array(['No ', 'Yes '], dtype=object)[(rng.random(n) < 0.02).astype(int)],
+        'City': _choice(rng, CITIES, n),
+        'Time_taken(min)': pd.Series(rng.integers(10, 55, n)).map('(min) {}'.format),
+    }, columns=COLUMNS)
+    df['Weatherconditions'] = 'conditions ' + df['Weatherconditions']
+
+    for col, rate in NAN_RATE.items():
+        df.loc[rng.random(n) < rate, col] = 'NaN '
+
+    return df
+
+
+def generate(n, path, seed=0):
+    """ Esta função tem a responsabilidade de gravar o CSV sintético
+
+        Escreve n linhas em blocos de CHUNK_ROWS, então a memória usada não
+        depende do tamanho do arquivo.
+    """
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', newline='') as f:
+        for start in range(0, n, CHUNK_ROWS):
+            chunk = generate_chunk(start, min(CHUNK_ROWS, n - start), seed,
+                                   restaurant_count(n))
+            chunk.to_csv(f, header=start == 0, index=False)
+    os.replace(tmp, path)
+
+    return path
+
+
+if __name__ == '__main__':
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    print(generate(int(sys.argv[1]), sys.argv[2], seed))
@@ -0,0 +1,293 @@
+""" Teste de carga das páginas com sessões simultâneas
+
+    Cada página roda em um processo próprio (memória por processo) com N
+    sessões simultâneas, uma thread por sessão como no servidor do
+    streamlit. O script da página é executado em modo bare (sem servidor)
+    e os widgets da sidebar e da escolha de visão retornam os valores da
+    sessão: a primeira execução usa os padrões (sessão aberta) e cada rerun
+    seguinte muda um widget ao acaso (período do slider, trânsito, cidade,
+    clima ou visão), como um analista aplicando filtros. São medidos:
+    1. Latência de cada rerun (p50/p95/p99) e vazão (reruns por segundo).
+    2. Memória residente do processo (antes, pico e fim).
+    3. Taxa de acerto do cache de gráficos (utils.memo).
+    O primeiro rerun de cada processo (carga do dataset e dos índices) é
+    medido à parte, sem entrar nos percentis.
+
+    Uso: python -m benchmarks.loadtest [--pages pages/1_visao_empresa.py,...]
+                                       [--sessions 1,4,16] [--reruns 20]
+                                       [--think 0] [--seed 0]
+                                       [--output loadtest.json] [--max-p95 MS]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['pages/1_visao_empresa.py', 'pages/2_visao_entregador.py',
+         'pages/3_visao_restaurante.py']
+
+# Intervalo da amostragem de memória durante a carga
+RSS_INTERVAL = 0.05
+
+# Sessão da thread atual (None fora das sessões simuladas)
+_local = threading.local()
+
+
+class Session:
+    """ Valores dos widgets de uma sessão simulada
+
+        Cada widget visto nas execuções da página fica registrado com o
+        seu tipo e as suas opções. step muda um deles ao acaso.
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.widgets = {}
+        self.values = {}
+
+    def value(self, kind, label, spec, default):
+        """ Valor atual do widget (o padrão até step mudá-lo) """
+        self.widgets[label] = (kind, spec)
+
+        return self.values.get(label, default)
+
+    def step(self):
+        """ Esta função tem a responsabilidade de aplicar um filtro
+
+            Escolhe um widget já visto e sorteia um novo valor para ele.
+        """
+        if not self.widgets:
+            return None
+
+        label = self.rng.choice(sorted(self.widgets))
+        kind, spec = self.widgets[label]
+        if kind == 'slider':
+            first, last = spec
+            days = (last - first).days
+            start, end = sorted(self.rng.sample(range(days + 1), 2))
+            value = (first + datetime.timedelta(days=start), first + datetime.timedelta(days=end))
+        elif kind == 'multiselect':
+            value = self.rng.sample(spec, self.rng.randint(1, len(spec)))
+        else:
+            value = self.rng.choice(spec)
+        self.values[label] = value
+
+        return label
+
+
+def patch_widgets():
+    """ Esta função tem a responsabilidade de ligar os widgets às sessões
+
+        slider com período, multiselect e as escolhas de visão
+        (utils.views, key terminada em '_view') chamam o widget original
+        com o valor da sessão da thread como padrão; no modo bare o
+        streamlit retorna esse padrão. Fora das sessões nada muda.
+    """
+    import streamlit as st
+    from streamlit.delta_generator import DeltaGenerator
+
+    slider = DeltaGenerator.slider
+    multiselect = DeltaGenerator.multiselect
+    radio = DeltaGenerator.radio
+
+    def _slider(self, label, *args, **kwargs):
+        session = getattr(_local, 'session', None)
+        if session is not None and isinstance(kwargs.get('value'), tuple):
+            spec = (kwargs['min_value'], kwargs['max_value'])
+            kwargs['value'] = session.value('slider', label, spec, kwargs['value'])
+        return slider(self, label, *args, **kwargs)
+
+    def _multiselect(self, label, options, default=None, *args, **kwargs):
+        session = getattr(_local, 'session', None)
+        if session is not None:
+            default = session.value('multiselect', label, list(options), default)
+        return multiselect(self, label, options, default, *args, **kwargs)
+
+    def _radio(self, label, options, index=0, *args, **kwargs):
+        session = getattr(_local, 'session', None)
+        if session is not None and str(kwargs.get('key', '')).endswith('_view'):
+            options = list(options)
+            index = options.index(session.value('radio', label, options, options[index]))
+        return radio(self, label, options, index, *args, **kwargs)
+
+    DeltaGenerator.slider = _slider
+    DeltaGenerator.multiselect = _multiselect
+    DeltaGenerator.radio = _radio
+    # st.slider e afins são métodos já ligados ao container principal
+    for name in ['slider', 'multiselect', 'radio']:
+        setattr(st, name, getattr(st._main, name))
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """ Percentis em ms de uma lista de tempos em segundos """
+    import numpy as np
+
+    if not values:
+        return {f'p{point}_ms': None for point in points}
+
+    return {f'p{point}_ms': float(np.percentile(values, point)) * 1000 for point in points}
+
+
+def run_sessions(page, sessions, reruns, think=0.0, seed=0):
+    """ Esta função tem a responsabilidade de simular as sessões
+
+        Roda a página uma vez (carga fria) e depois `sessions` threads,
+        cada uma com `reruns` execuções e um filtro novo por rerun. think
+        é o tempo médio de espera entre os reruns de uma sessão
+        (exponencial; 0 para carga máxima). Retorna as métricas em um
+        dicionário.
+    """
+    from utils.memo import cache_stats
+    from utils.perf import rss_mb
+
+    patch_widgets()
+    with open(page, encoding='utf-8') as f:
+        code = compile(f.read(), page, 'exec')
+
+    def execute():
+        # Como o ScriptRunner do streamlit: um namespace novo por rerun
+        exec(code, {'__name__': '__main__', '__file__': page})
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    execute()
+    cold = time.perf_counter() - start
+    rss_warm = rss_mb()
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(sessions)
+
+    def session_main(number):
+        rng = random.Random(seed * 1000 + number)
+        _local.session = Session(rng)
+        times = []
+        barrier.wait()
+        for rerun in range(reruns):
+            if rerun:
+                _local.session.step()
+                if think:
+                    time.sleep(rng.expovariate(1 / think))
+            begin = time.perf_counter()
+            try:
+                execute()
+            except Exception as error:  # a carga continua; o erro vai para o relatório
+                with lock:
+                    errors.append(f'{type(error).__name__}: {error}')
+            times.append(time.perf_counter() - begin)
+        with lock:
+            latencies.extend(times)
+
+    peak = [rss_warm or 0.0]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(RSS_INTERVAL):
+            peak[0] = max(peak[0], rss_mb() or 0.0)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    threads = [threading.Thread(target=session_main, args=(number,))
+               for number in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    rss_end = rss_mb()
+
+    result = {'page': page, 'sessions': sessions, 'reruns': len(latencies),
+              'errors': len(errors), 'first_errors': sorted(set(errors))[:5],
+              'cold_ms': cold * 1000, 'wall_s': wall,
+              'throughput_rps': len(latencies) / wall if wall else None,
+              'rss_before_mb': rss_before, 'rss_warm_mb': rss_warm,
+              'rss_peak_mb': max(peak[0], rss_end or 0.0), 'rss_end_mb': rss_end,
+              'cache_hit_rate': cache_stats()['hit_rate']}
+    result.update(percentiles(latencies))
+
+    return result
+
+
+def measure(page, sessions, reruns, think, seed):
+    """ Roda run_sessions em um processo novo e retorna as métricas """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run([sys.executable, '-m', 'benchmarks.loadtest', '--worker', page,
+                           '--sessions', str(sessions), '--reruns', str(reruns),
+                           '--think', str(think), '--seed', str(seed)],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def report(results):
+    """ Esta função tem a responsabilidade de imprimir o relatório """
+    print(f"{'página':30s} {'sessões':>7s} {'reruns':>6s} {'erros':>5s} {'p50':>8s} "
+          f"{'p95':>8s} {'p99':>8s} {'rps':>7s} {'frio':>8s} {'RSS MB':>17s} {'cache':>6s}")
+    for result in results:
+        rss = (f"{result['rss_warm_mb'] or 0:5.0f}/{result['rss_peak_mb'] or 0:5.0f}/"
+               f"{result['rss_end_mb'] or 0:5.0f}")
+        print(f"{os.path.basename(result['page']):30s} {result['sessions']:7d} "
+              f"{result['reruns']:6d} {result['errors']:5d} {result['p50_ms']:6.0f}ms "
+              f"{result['p95_ms']:6.0f}ms {result['p99_ms']:6.0f}ms "
+              f"{result['throughput_rps']:7.1f} {result['cold_ms']:6.0f}ms {rss:>17s} "
+              f"{result['cache_hit_rate']:6.0%}")
+        for error in result['first_errors']:
+            print(f'  {error}')
+    print('RSS MB: após a carga fria / pico / fim')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', default=','.join(PAGES))
+    parser.add_argument('--sessions', default='1,4,16',
+                        help='sessões simultâneas, separadas por vírgula')
+    parser.add_argument('--reruns', type=int, default=20, help='reruns por sessão')
+    parser.add_argument('--think', type=float, default=0.0,
+                        help='espera média entre os reruns de uma sessão (s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='grava as métricas em JSON')
+    parser.add_argument('--max-p95', type=float,
+                        help='falha se o p95 de alguma página passar desse tempo (ms)')
+    parser.add_argument('--worker', metavar='PAGE', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_sessions(args.worker, int(args.sessions), args.reruns,
+                                      args.think, args.seed)))
+        return 0
+
+    results = []
+    for page in args.pages.split(','):
+        for sessions in args.sessions.split(','):
+            print(f'rodando {page} com {sessions} sessões...', file=sys.stderr)
+            results.append(measure(page, int(sessions), args.reruns, args.think, args.seed))
+
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    slow = [f"{result['page']} ({result['sessions']} sessões)" for result in results
+            if args.max_p95 is not None and result['p95_ms'] > args.max_p95]
+    failed = [f"{result['page']} ({result['sessions']} sessões)" for result in results
+              if result['errors']]
+    if slow:
+        print(f'\np95 acima de {args.max_p95} ms: {slow}')
+    if failed:
+        print(f'\nreruns com erro: {failed}')
+
+    return 1 if slow or failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
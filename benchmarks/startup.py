@@ -0,0 +1,115 @@
+""" Tempo de startup das páginas: imports e tempo até o primeiro render
+
+    Cada página roda em um processo novo (cold start) com
+    python -X importtime, em modo bare (sem servidor). São medidos:
+    1. 'imports_ms' - Soma do tempo de import dos módulos de primeiro
+       nível, segundo o -X importtime.
+    2. 'first_render_ms' - Tempo do início do script até o primeiro
+       elemento do streamlit ser criado.
+    3. 'total_ms' - Tempo do script inteiro.
+    e os módulos mais pesados de importar.
+
+    Uso: python -m benchmarks.startup [--pages Home.py,pages/1_visao_empresa.py]
+                                      [--top 8] [--max-first-render MS]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['Home.py', 'pages/1_visao_empresa.py', 'pages/2_visao_entregador.py',
+         'pages/3_visao_restaurante.py']
+
+IMPORTTIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr):
+    """ Esta função tem a responsabilidade de ler a saída do -X importtime
+
+        Retorna {módulo de primeiro nível: tempo acumulado em ms}.
+    """
+    modules = {}
+    for match in IMPORTTIME.finditer(stderr):
+        _, cumulative, indent, name = match.groups()
+        if len(indent) == 1:
+            modules[name] = modules.get(name, 0) + int(cumulative) / 1000
+
+    return modules
+
+
+def worker(page):
+    """ Roda a página e imprime os tempos medidos em JSON """
+    start = time.perf_counter()
+    first = []
+
+    import runpy
+
+    from streamlit.delta_generator import DeltaGenerator
+
+    enqueue = DeltaGenerator._enqueue
+
+    def _enqueue(self, *args, **kwargs):
+        if not first:
+            first.append(time.perf_counter() - start)
+        return enqueue(self, *args, **kwargs)
+
+    DeltaGenerator._enqueue = _enqueue
+    runpy.run_path(page, run_name='__main__')
+
+    print(json.dumps({'first_render_ms': first[0] * 1000 if first else None,
+                      'total_ms': (time.perf_counter() - start) * 1000}))
+
+
+def measure(page):
+    """ Esta função tem a responsabilidade de medir o cold start da página """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'benchmarks.startup',
+                           '--worker', page],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(proc.stderr)
+    result['imports_ms'] = sum(modules.values())
+    result['modules'] = dict(sorted(modules.items(), key=lambda item: -item[1]))
+
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', default=','.join(PAGES))
+    parser.add_argument('--top', type=int, default=8,
+                        help='quantidade de módulos mais pesados exibidos')
+    parser.add_argument('--max-first-render', type=float,
+                        help='falha se alguma página passar desse tempo (ms)')
+    parser.add_argument('--worker', metavar='PAGE', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.worker)
+        return 0
+
+    slow = []
+    for page in args.pages.split(','):
+        result = measure(page)
+        first = result['first_render_ms']
+        print(f"\n== {page} ==")
+        print(f"imports {result['imports_ms']:8.1f} ms | primeiro render "
+              f"{first:8.1f} ms | total {result['total_ms']:8.1f} ms")
+        for name, ms in list(result['modules'].items())[:args.top]:
+            print(f'  {name:35s} {ms:8.1f} ms')
+        if args.max_first_render is not None and first > args.max_first_render:
+            slow.append(page)
+
+    if slow:
+        print(f'\nprimeiro render acima de {args.max_first_render} ms: {slow}')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,333 @@
+""" Suite de benchmarks do pipeline e das páginas
+
+    Para cada escala gera (uma vez) um train.csv sintético com
+    benchmarks.generate e mede, em um processo separado, o tempo e o pico
+    de memória (RSS) de cada etapa: leitura, clean_code, schema,
+    colunas derivadas (feature_engineering), índices, filtros da sidebar e cada função
+    de gráfico/agregação das três páginas. O resultado vai para um JSON e é
+    comparado com o baseline local (benchmarks/baseline.json, gravado com
+    --save-baseline). O baseline fica fora do git: tempos absolutos só são
+    comparáveis na máquina onde foram medidos.
+
+    Uso: python -m benchmarks.suite [--scales 10k,100k,1M,10M] [--output results.json]
+                                    [--baseline benchmarks/baseline.json]
+                                    [--save-baseline] [--tolerance 1.25]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.generate import GENERATOR_VERSION, generate
+from utils.pages import page_functions
+
+SCALES = {'10k': 10000, '100k': 100000, '1M': 1000000, '10M': 10000000}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+RESULTS_PATH = os.path.join(ROOT, 'benchmarks', 'results.json')
+
+# Etapas mais rápidas que isso são repetidas e fica o melhor tempo
+REPEAT_BELOW = 1.0
+REPEAT = 5
+
+# Etapas com baseline abaixo disso não contam como regressão (ruído)
+MIN_SECONDS = 0.005
+
+# Estado padrão dos filtros de cada página e um filtro mais restrito
+ALL_TRAFFIC = ['Low', 'Medium', 'High', 'Jam']
+ALL_CITIES = ['Metropolitian', 'Urban', 'Semi-Urban']
+ALL_WEATHER = ['conditions Sunny', 'conditions Fog', 'conditions Cloudy',
+               'conditions Windy', 'conditions Stormy', 'conditions Sandstorms']
+FILTERS = {'empresa': ('2022-04-13', {'Road_traffic_density': ALL_TRAFFIC, 'City': ALL_CITIES}),
+           'entregador': ('2022-06-04', {'Road_traffic_density': ALL_TRAFFIC,
+                                         'Weatherconditions': ALL_WEATHER}),
+           'restrito': ('2022-03-10', {'Road_traffic_density': ['Low', 'Jam'],
+                                       'City': ['Urban']})}
+
+
+def peak_rss_mb():
+    """ Pico de memória residente do processo até agora, em MB """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB e macOS em bytes
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+class Timer:
+    """ Mede as etapas e guarda {etapa: {'seconds', 'peak_rss_mb'}} """
+
+    def __init__(self):
+        self.results = {}
+
+    def __call__(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        value = func(*args, **kwargs)
+        best = time.perf_counter() - start
+
+        if best < REPEAT_BELOW:
+            for _ in range(REPEAT - 1):
+                start = time.perf_counter()
+                func(*args, **kwargs)
+                best = min(best, time.perf_counter() - start)
+
+        self.results[stage] = {'seconds': best, 'peak_rss_mb': peak_rss_mb()}
+
+        return value
+
+
+def run_scale(path):
+    """ Esta função tem a responsabilidade de medir todas as etapas
+
+        Roda o pipeline inteiro sobre o CSV informado, na ordem em que o
+        app faz, e retorna o dicionário de resultados do Timer.
+    """
+    from utils.cube import build_cube
+    from utils.distinct import DistinctIndex
+    from utils.features import FEATURES, with_features
+    from utils.filters import FilterIndex
+    from utils.maps import MAP_COLUMNS, MAP_MODES, map_html
+    from utils.profiles import ProfileIndex
+    from utils.ranking import DELIVERER, rank_means
+    from utils.table import table_index, table_page
+    from utils.timeindex import TimeIndex
+    from utils.schema import apply_schema
+    from utils.stream import stream_aggregates
+    from utils.transform import clean_code, read_dataset
+
+    timer = Timer()
+
+    df = timer('read', read_dataset, path)
+    df = timer('clean_code', clean_code, df)
+    df = timer('apply_schema', apply_schema, df)
+    # Todas as colunas derivadas, como ficam em cache depois da primeira página
+    df1 = timer('feature_engineering', with_features, df, list(FEATURES))
+    del df
+
+    cube = timer('build_cube', build_cube, df1)
+    df1_index = timer('filter_index', FilterIndex, df1)
+    cube_index = timer('cube_index', FilterIndex, cube)
+    distinct_index = timer('distinct_index', DistinctIndex, df1)
+    time_index = timer('time_index', TimeIndex, cube)
+    profile_index = timer('profile_index', ProfileIndex, df1)
+    # Modo de ingestão 'stream': CSV em blocos até o cubo e os distintos
+    aggregates = timer('stream_aggregates', stream_aggregates, path)
+    timer('stream/distinct_index', DistinctIndex, aggregates['cell_deliverers'])
+    del aggregates
+
+    for name, (date, selections) in FILTERS.items():
+        timer(f'filter/{name}/df1', df1_index.filter, date, selections)
+        timer(f'filter/{name}/cube', cube_index.filter, date, selections)
+        timer(f'filter/{name}/distinct', distinct_index.count, date, selections)
+        timer(f'filter/{name}/time_cube', time_index.cube, date, selections)
+        timer(f'filter/{name}/daily', time_index.daily, date, selections)
+        timer(f'filter/{name}/rolling_28', time_index.rolling, date, selections, 28)
+
+    empresa = page_functions(os.path.join(ROOT, 'pages', '1_visao_empresa.py'))
+    date, selections = FILTERS['empresa']
+    df1_f = timer('empresa/filter_map', df1_index.filter, date, selections, MAP_COLUMNS)
+    cube_f = cube_index.filter(date, selections)
+    deliverers = distinct_index.count(date, selections, by='order_week')
+    daily = time_index.daily(date, selections)
+    week, month = (time_index.rolling(date, selections, window) for window in (7, 28))
+    for name in ['order_metric', 'order_by_week']:
+        timer(f'empresa/{name}', empresa[name], daily)
+    timer('empresa/rolling_orders', empresa['rolling_orders'], week, month)
+    for name in ['traffic_order_share', 'traffic_order_city']:
+        timer(f'empresa/{name}', empresa[name], cube_f)
+    timer('empresa/order_share_by_week', empresa['order_share_by_week'], cube_f, deliverers)
+    for mode in MAP_MODES:
+        timer(f'empresa/map_html/{mode}', map_html, df1_f, mode)
+
+    entregador = page_functions(os.path.join(ROOT, 'pages', '2_visao_entregador.py'))
+    date, selections = FILTERS['entregador']
+    cube_f = cube_index.filter(date, selections)
+    extremes = timer('entregador/extremes', df1_index.extremes, date, selections,
+                     ['Delivery_person_Age', 'Vehicle_condition'])
+    for col, operation in [('Delivery_person_Age', 'max'), ('Vehicle_condition', 'min')]:
+        timer(f'entregador/calculate_key_numbers/{col}', entregador['calculate_key_numbers'],
+              extremes, col, operation)
+    ratings = timer('entregador/group_mean/ratings', df1_index.group_mean, date, selections,
+                    [DELIVERER], 'Delivery_person_Ratings')
+    ratings = timer('entregador/mean_deliver_ratings', entregador['mean_deliver_ratings'], ratings)
+    ratings_index = timer('entregador/table_index', table_index, ratings, 'mean_deliver_ratings',
+                          list(ratings.columns), 'Delivery_person_ID')
+    timer('entregador/table_page', table_page, ratings_index, 'mean_deliver_ratings',
+          'Delivery_person_Ratings', False)
+    # Prefixo de um ID existente (código da cidade, ex.: 'INDO' de
+    # 'INDORES13DEL02'), para a busca medir uma página com resultados
+    prefix = str(ratings[DELIVERER].iloc[len(ratings) // 2]).split('RES')[0]
+    _, found, _ = timer('entregador/table_page/search', table_page, ratings_index,
+                        'mean_deliver_ratings', search=prefix)
+    if not found:
+        raise RuntimeError(f'A busca por {prefix!r} não encontrou entregadores')
+    for col in ['Road_traffic_density', 'Weatherconditions']:
+        timer(f'entregador/mean_ratings/{col}', entregador['mean_ratings'], cube_f, col)
+    time_means = timer('entregador/group_mean/time', df1_index.group_mean, date, selections,
+                       ['City', DELIVERER], 'Time_taken(min)')
+    timer('entregador/rank_means', rank_means, time_means)
+    deliverer = profile_index.ids[len(profile_index) // 2]
+    timer('entregador/profile', profile_index.profile, deliverer, date)
+
+    restaurante = page_functions(os.path.join(ROOT, 'pages', '3_visao_restaurante.py'))
+    date, selections = FILTERS['empresa']
+    cube_f = time_index.cube(date, selections)
+    week, month = (time_index.rolling(date, selections, window) for window in (7, 28))
+    timer('restaurante/rolling_delivery_time', restaurante['rolling_delivery_time'], week, month)
+    for festival in ['Yes', 'No']:
+        timer(f'restaurante/avg_time_taken/{festival}', restaurante['avg_time_taken'],
+              cube_f, festival)
+    for name in ['delivery_time_by_city', 'time_by_city_traffic', 'distance_by_city',
+                 'sunburst_chart']:
+        timer(f'restaurante/{name}', restaurante[name], cube_f)
+
+    return timer.results
+
+
+def dataset_for(scale, data_dir=DATA_DIR):
+    """ Caminho do CSV sintético da escala, gerado na primeira vez
+
+        A versão do gerador faz parte do nome: um CSV de uma versão
+        anterior não é reaproveitado.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'train_{scale}.v{GENERATOR_VERSION}.csv')
+    if not os.path.exists(path):
+        print(f'gerando {path}...', file=sys.stderr)
+        generate(SCALES[scale], path)
+
+    return path
+
+
+def run(scales, data_dir=DATA_DIR):
+    """ Esta função tem a responsabilidade de rodar a suite
+
+        Cada escala roda em um subprocesso, para o pico de memória de uma
+        escala não contaminar a outra.
+    """
+    results = {'meta': {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                        'python': platform.python_version(),
+                        'pandas': pd.__version__,
+                        'platform': platform.platform(),
+                        'generator': GENERATOR_VERSION},
+               'scales': {}}
+
+    for scale in scales:
+        path = dataset_for(scale, data_dir)
+        print(f'rodando {scale}...', file=sys.stderr)
+        out = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--worker', path],
+                             cwd=ROOT, check=True, capture_output=True, text=True).stdout
+        results['scales'][scale] = json.loads(out)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ Esta função tem a responsabilidade de comparar com o baseline
+
+        Imprime, por escala e etapa, o tempo atual, o do baseline e a razão.
+        Retorna a lista de etapas mais lentas que tolerance x baseline. O
+        baseline só é comparável se foi gravado na mesma máquina.
+    """
+    regressions = []
+    for scale, stages in results['scales'].items():
+        base = baseline.get('scales', {}).get(scale, {})
+        print(f'\n== {scale} ==')
+        print(f"{'etapa':55s} {'atual':>10s} {'baseline':>10s} {'razão':>7s} {'RSS MB':>8s}")
+        for stage, value in stages.items():
+            seconds = value['seconds']
+            ref = base.get(stage, {}).get('seconds')
+            if ref:
+                ratio = seconds / ref
+                flag = ' <-' if ratio > tolerance and ref >= MIN_SECONDS else ''
+                if flag:
+                    regressions.append((scale, stage, ratio))
+                print(f'{stage:55s} {seconds * 1000:8.2f}ms {ref * 1000:8.2f}ms '
+                      f'{ratio:6.2f}x {value["peak_rss_mb"]:8.1f}{flag}')
+            else:
+                print(f'{stage:55s} {seconds * 1000:8.2f}ms {"-":>10s} {"-":>7s} '
+                      f'{value["peak_rss_mb"]:8.1f}')
+
+    return regressions
+
+
+def stale_stages(results, baseline):
+    """ Esta função tem a responsabilidade de checar se o baseline está
+        em dia com a suite
+
+        Retorna as etapas sem baseline (novas ou renomeadas) e as do
+        baseline que a suite não mede mais, como (escala, etapa). Um CSV de
+        outra versão do gerador torna todas as etapas da escala velhas.
+    """
+    same_data = baseline.get('meta', {}).get('generator') == GENERATOR_VERSION
+    stale = []
+    for scale, stages in results['scales'].items():
+        base = baseline.get('scales', {}).get(scale, {}) if same_data else {}
+        stale += [(scale, stage) for stage in stages if stage not in base]
+        stale += [(scale, stage) for stage in base if stage not in stages]
+
+    return stale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='10k,100k,1M',
+                        help=f"escalas separadas por vírgula ({', '.join(SCALES)})")
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='grava os resultados como novo baseline')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='razão atual/baseline a partir da qual é regressão')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--worker', metavar='CSV', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_scale(args.worker)))
+        return 0
+
+    scales = args.scales.split(',')
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f'escalas desconhecidas: {unknown}')
+
+    results = run(scales, args.data_dir)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if not baseline and not args.save_baseline:
+        print(f'\nsem baseline em {args.baseline}; grave um nesta máquina com --save-baseline')
+        return 0
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nbaseline gravado em {args.baseline}')
+        return 0
+
+    stale = stale_stages(results, baseline)
+    if stale:
+        print(f'\nbaseline desatualizado em {len(stale)} etapa(s), ex.: {stale[:5]}; '
+              f'regrave com --save-baseline')
+    if regressions:
+        print(f'\n{len(regressions)} etapa(s) acima de {args.tolerance}x o baseline')
+
+    return 1 if regressions or stale else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
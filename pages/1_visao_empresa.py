@@ -1,110 +1,66 @@
 # Libraries
-import re
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 import datetime
 
+import streamlit.components.v1 as components
 
-import plotly.express as px
-import folium
-
-from haversine import haversine
-from PIL import Image
-from streamlit_folium import folium_static
+from utils.assets import logo
+from utils.backend import (load_cube_index, load_distinct_index, load_filter_index,
+                           load_time_index)
+from utils.cube import cube_count
+from utils.maps import MAP_COLUMNS, MAP_MODES, map_html, sample_size
+from utils.loader import DATASET_PATH
+from utils.memo import Deferred, filter_state, memoize
+from utils.perf import perf_panel, start_run, timed
+from utils.schema import decode_categories
+from utils.views import render_views
 
 st.set_page_config(page_title='Visão Empresa', layout='wide')
 
-# --------- FUNÇÕES ------------
-
-
-def clean_code(df1):
-    """ Esta função tem a responsabilidade de limpar o dataframe
-
-        Tipos de limpeza:
-        1. Retirar os valores NaN das colunas
-        2. Converter os tipos dos dados das colunas
-        3. Remoção dos espaços vazios
-        4. Formatação da coluna de data
-        5. Limpeza da coluna 'Time_taken(min)'
-    """
-    # Change Data Types
-    # 1. Convertendo a coluna 'Age' de texto para número
-    df1 = df1.loc[df1['Delivery_person_Age'] != 'NaN ', :].copy()
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
-
-    # 2. Convertendo a coluna ratings de texto para número decimal
-    df1 = df1.loc[df1['Delivery_person_Ratings'] != 'NaN ', :].copy()
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(
-        float)
-
-    # 3. Convertendo a coluna order date de texto para data
-    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
-
-    # 4. Convertendo Multiple Deliveries de texto para numero
-    df1 = df1.loc[df1['multiple_deliveries'] != 'NaN ', :].copy()
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
-
-    # 5. Convertendo Multiple Deliveries de texto para numero
-    df1 = df1.loc[df1['Festival'] != 'NaN ', :].copy()
+# Medição das etapas do rerun (utils.perf)
+start_run('empresa')
 
-    df1 = df1.loc[df1['Road_traffic_density'] != 'NaN ', :].copy()
-
-    df1 = df1.loc[df1['City'] != 'NaN ', :].copy()
+# --------- FUNÇÕES ------------
 
-    # 6. Coluna Time Taken
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(
-        lambda x: re.search('[0-9]+', x).group(0))
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
+# O plotly é importado dentro das funções dos gráficos: só é carregado
+# quando um gráfico é gerado (e não vem do cache)
 
-    # 7. Removendo os espaços dentro de strings/texto/object
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:,
-                                                 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
 
-    return df1
+# Gráfico de Barras
 
 
-def feature_engineering(df1):
-    """ Esta função tem a responsabilidade de criar novas colunas:
+def order_metric(daily):
+    import plotly.express as px
 
-        As colunas criadas são:
-        1. 'distance' - Distancia em quilometros.
-        2. 'order_week' - Semana do ano em que o pedido foi realizado.
-    """
-    col = ['Restaurant_latitude', 'Restaurant_longitude',
-           'Delivery_location_latitude', 'Delivery_location_longitude']
-    df1['distance'] = df1.loc[:, col].apply(lambda x: haversine(
-        (x['Restaurant_latitude'], x['Restaurant_longitude']), (x['Delivery_location_latitude'], x['Delivery_location_longitude'])), axis=1)
+    # Série diária do índice de tempo (utils.timeindex): só dias com pedidos
+    aux = cube_count(daily.loc[daily['count'] > 0], 'Order_Date').rename('ID').reset_index()
+    fig = px.bar(aux, x='Order_Date', y='ID')
 
-    df1['order_week'] = df1['Order_Date'].dt.isocalendar().week
-    print('Estou na visão empresa')
+    return fig
 
-    aux = df1[['ID', 'Order_Date']].groupby('Order_Date').count().reset_index()
-    px.bar(aux, x='Order_Date', y='ID')
 
-    return df1
+# Gráfico de linha pedidos nos últimos 7 e 28 dias
 
-# Gráfico de Barras
 
+def rolling_orders(week, month):
+    import plotly.express as px
 
-def order_metric(df1):
-    aux = df1[['ID', 'Order_Date']].groupby(
-        'Order_Date').count().reset_index()
-    fig = px.bar(aux, x='Order_Date', y='ID')
+    aux = pd.DataFrame({'Order_Date': week['Order_Date'],
+                        '7 dias': week['count'],
+                        '28 dias': month['count']})
+    fig = px.line(aux, x='Order_Date', y=['7 dias', '28 dias'])
 
     return fig
 
 # Gráfico de pizza densidade trânsito
 
 
-def traffic_order_share(df1):
-    aux = df1[['ID', 'Road_traffic_density']].groupby(
-        'Road_traffic_density').count().reset_index()
+def traffic_order_share(cube):
+    import plotly.express as px
+
+    aux = cube_count(cube, 'Road_traffic_density').rename('ID').reset_index()
+    aux = decode_categories(aux)
     aux['perc'] = round(aux['ID'] / aux['ID'].sum() * 100, 2)
     fig = px.pie(aux, values='perc', names='Road_traffic_density')
 
@@ -112,9 +68,12 @@ def traffic_order_share(df1):
 
 
 # Grafico de bolha
-def traffic_order_city(df1):
-    aux = df1[['ID', 'City', 'Road_traffic_density']].groupby(
-        ['City', 'Road_traffic_density']).count().reset_index()
+def traffic_order_city(cube):
+    import plotly.express as px
+
+    aux = cube_count(cube, ['City', 'Road_traffic_density']
+                     ).rename('ID').reset_index()
+    aux = decode_categories(aux)
     fig = px.scatter(aux, x='City', y='Road_traffic_density',
                      size='ID', color='City')
 
@@ -123,18 +82,21 @@ def traffic_order_city(df1):
 # Gráfico de linha pedidos por semana
 
 
-def order_by_week(df1):
-    aux = df1[['ID', 'order_week']].groupby('order_week').count().reset_index()
+def order_by_week(daily):
+    import plotly.express as px
+
+    aux = cube_count(daily.loc[daily['count'] > 0], 'order_week').rename('ID').reset_index()
     fig = px.line(aux, x='order_week', y='ID')
 
     return fig
 
 
-def order_share_by_week(df1):
-    aux1 = df1[['ID', 'order_week']].groupby(
-        'order_week').count().reset_index()
-    aux2 = df1[['Delivery_person_ID', 'order_week']].groupby(
-        'order_week').nunique().reset_index()
+def order_share_by_week(cube, deliverers):
+    import plotly.express as px
+
+    aux1 = cube_count(cube, 'order_week').rename('ID').reset_index()
+    # Entregadores distintos por semana (utils.distinct.DistinctIndex)
+    aux2 = deliverers.reset_index()
     df_aux = pd.merge(aux1, aux2, how='inner')
     df_aux['order_by_deliver'] = df_aux['ID'] / df_aux['Delivery_person_ID']
     fig = px.line(df_aux, x='order_week', y='order_by_deliver')
@@ -142,48 +104,37 @@ def order_share_by_week(df1):
     return fig
 
 
-def country_maps(df1):
-
-    cols = ['City', 'Road_traffic_density',
-            'Delivery_location_latitude', 'Delivery_location_longitude']
-    aux = df1.loc[:, cols].groupby(
-        ['City', 'Road_traffic_density']).median().reset_index()
-    map = folium.Map()
-
-    for index, location in aux.iterrows():
-        folium.Marker([location['Delivery_location_latitude'],
-                      location['Delivery_location_longitude']]).add_to(map)
-    folium_static(map, width=1024, height=600)
+def country_maps(df1, state, mode):
+    # HTML do mapa em cache por estado dos filtros e modo (utils.maps)
+    html = memoize(map_html, state, df1, mode=mode)
+    timed(f'render/map_{mode}', components.html, html, width=1024, height=600 + 10)
+    if mode != 'medians':
+        # Acima de MAX_POINTS o mapa recebe uma amostra com passo fixo
+        shown, total = memoize(sample_size, state, df1)
+        if shown < total:
+            st.caption(f'O mapa mostra uma amostra: {shown} de {total} pedidos')
 
     return None
 
 # ------------------INICIO DA ESTRUTURA LOGICA DO CODIGO------------------------------
 
 
-# ------- Import Dataset ----------
-df = pd.read_csv('dataset/train.csv')
-
-# ------- Transformation Dataset ------------
-df1 = clean_code(df)
-
-df2 = feature_engineering(df1)
-
-
 # =============================
 # SIDEBAR
 # =============================
 st.header('Marketplace - Visão Empresa')
 
 # image_path = '/home/pedro/Documentos/repos/ftc/img/logo.jpg'
-image = Image.open('logo.jpg')
-st.sidebar.image(image, width=120)
+# Logo decodificado uma vez por processo (utils.assets)
+st.sidebar.image(logo(), width=120)
 
 st.sidebar.markdown('# Cury Company')
 st.sidebar.markdown('## Fastest Delivery in town')
 st.sidebar.markdown("""___""")
 
-data_slider = st.sidebar.slider('Selecione uma data limite',
-                                value=datetime.datetime(2022, 4, 13),
+data_slider = st.sidebar.slider('Selecione o período',
+                                value=(datetime.datetime(2022, 2, 11),
+                                       datetime.datetime(2022, 4, 13)),
                                 min_value=datetime.datetime(2022, 2, 11),
                                 max_value=datetime.datetime(2022, 4, 6),
                                 format='DD-MM-YYYY')
@@ -202,31 +153,42 @@ city_options = st.sidebar.multiselect('Quais tipos de cidades?',
 st.sidebar.markdown("""___""")
 st.sidebar.markdown('### Powered by Pedro Cortez')
 
-# Filtro de Data
-linhas_selecionadas = df1['Order_Date'] < data_slider
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtros de data, trânsito e cidade (utils.filters.FilterIndex). Os dados
+# só são filtrados se algum gráfico não vier do cache (utils.memo.Deferred)
+selections = {'Road_traffic_density': traffic_options,
+              'City': city_options}
+cube = Deferred('filter/cube', lambda: load_cube_index(
+    DATASET_PATH).filter(data_slider, selections))
 
-# Filtro de Transito
-linhas_selecionadas = df1['Road_traffic_density'].isin(traffic_options)
-df1 = df1.loc[linhas_selecionadas, :]
+# Séries diárias e móveis: somas acumuladas por dia (utils.timeindex)
+daily = Deferred('filter/daily', lambda: load_time_index(
+    DATASET_PATH).daily(data_slider, selections))
+rolling_week, rolling_month = (
+    Deferred(f'filter/rolling_{window}', lambda window=window: load_time_index(
+        DATASET_PATH).rolling(data_slider, selections, window))
+    for window in (7, 28))
 
-# Filtro de Cidade
-linhas_selecionadas = df1['City'].isin(city_options)
-df1 = df1.loc[linhas_selecionadas, :]
+# Gráficos e tabelas ficam em cache por estado dos filtros (utils.memo)
+state = filter_state(data_slider, selections, DATASET_PATH)
 
 # =============================
 # LAYOUT NO STREAMLIT
 # =============================
 
-tab1, tab2, tab3 = st.tabs(
-    ['Visão Gerencial', 'Visão Tática', 'Visão Geográfica'])
+# Cada visão só é calculada quando selecionada (utils.views)
+
 
-with tab1:
+def visao_gerencial():
 
     with st.container():
         st.markdown('# Orders by day')
-        fig = order_metric(df1)
-        st.plotly_chart(fig, use_container_width=True)
+        fig = memoize(order_metric, state, daily)
+        timed('render/order_metric', st.plotly_chart, fig, use_container_width=True)
+
+    with st.container():
+        st.markdown('# Orders in the last 7 and 28 days')
+        fig = memoize(rolling_orders, state, rolling_week, rolling_month)
+        timed('render/rolling_orders', st.plotly_chart, fig, use_container_width=True)
 
     with st.container():
 
@@ -234,27 +196,42 @@ with tab1:
 
         with col1:
             st.markdown('# Traffic Order Share ')
-            fig = traffic_order_share(df1)
-            st.plotly_chart(fig, use_container_width=True)
+            fig = memoize(traffic_order_share, state, cube)
+            timed('render/traffic_order_share', st.plotly_chart, fig, use_container_width=True)
 
         with col2:
             st.markdown('# Traffic Order City ')
-            fig = traffic_order_city(df1)
-            st.plotly_chart(fig, use_container_width=True)
+            fig = memoize(traffic_order_city, state, cube)
+            timed('render/traffic_order_city', st.plotly_chart, fig, use_container_width=True)
 
 
-with tab2:
+def visao_tatica():
 
     with st.container():
         st.markdown('# Order by Week')
-        fig = order_by_week(df1)
-        st.plotly_chart(fig, use_container_width=True)
+        fig = memoize(order_by_week, state, daily)
+        timed('render/order_by_week', st.plotly_chart, fig, use_container_width=True)
 
     with st.container():
         st.markdown('# Order Share by Week')
-        fig = order_share_by_week(df1)
-        st.plotly_chart(fig, use_container_width=True)
+        deliverers = Deferred('filter/deliverers', lambda: load_distinct_index(
+            DATASET_PATH).count(data_slider, selections, by='order_week'))
+        fig = memoize(order_share_by_week, state, cube, deliverers)
+        timed('render/order_share_by_week', st.plotly_chart, fig, use_container_width=True)
 
-with tab3:
+
+def visao_geografica():
     st.markdown('# Country Maps')
-    country_maps(df1)
+    map_mode = st.radio('Modo do mapa', list(MAP_MODES),
+                        format_func=MAP_MODES.get, horizontal=True)
+    # Só as colunas dos mapas são filtradas (no sqlite, só elas são lidas)
+    df1 = Deferred('filter/df1', lambda: load_filter_index(
+        DATASET_PATH).filter(data_slider, selections, MAP_COLUMNS))
+    country_maps(df1, state, map_mode)
+
+
+render_views(st, {'Visão Gerencial': visao_gerencial,
+                  'Visão Tática': visao_tatica,
+                  'Visão Geográfica': visao_geografica}, key='empresa_view')
+
+perf_panel(st)
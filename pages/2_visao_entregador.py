@@ -1,140 +1,69 @@
 # Libraries
-import re
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 import datetime
 
-import plotly.express as px
-import folium
-
-from haversine import haversine
-from PIL import Image
-from streamlit_folium import folium_static
+from utils.assets import logo
+from utils.backend import load_cube_index, load_filter_index, load_profile_index
+from utils.cube import cube_stats
+from utils.loader import DATASET_PATH
+from utils.memo import Deferred, filter_state, memoize
+from utils.perf import perf_panel, start_run, timed
+from utils.ranking import DELIVERER, rank_means
+from utils.table import paged_table
+from utils.views import render_views
 
 
 st.set_page_config(page_title='Visão Entregador', layout='wide')
 
-# ====================== FUNÇÕES ================================
-
-
-def clean_code(df1):
-    """ Esta função tem a responsabilidade de limpar o dataframe
-
-        Tipos de limpeza:
-        1. Retirar os valores NaN das colunas
-        2. Converter os tipos dos dados das colunas
-        3. Remoção dos espaços vazios
-        4. Formatação da coluna de data
-        5. Limpeza da coluna 'Time_taken(min)'
-    """
-    # Change Data Types
-    # 1. Convertendo a coluna 'Age' de texto para número
-    df1 = df1.loc[df1['Delivery_person_Age'] != 'NaN ', :].copy()
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
-
-    # 2. Convertendo a coluna ratings de texto para número decimal
-    df1 = df1.loc[df1['Delivery_person_Ratings'] != 'NaN ', :].copy()
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(
-        float)
-
-    # 3. Convertendo a coluna order date de texto para data
-    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
-
-    # 4. Convertendo Multiple Deliveries de texto para numero
-    df1 = df1.loc[df1['multiple_deliveries'] != 'NaN ', :].copy()
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
-
-    # 5. Convertendo Multiple Deliveries de texto para numero
-    df1 = df1.loc[df1['Festival'] != 'NaN ', :].copy()
-
-    df1 = df1.loc[df1['Road_traffic_density'] != 'NaN ', :].copy()
-
-    df1 = df1.loc[df1['City'] != 'NaN ', :].copy()
+# Colunas dos números gerais (maior e menor valor no período)
+KEY_COLUMNS = ['Delivery_person_Age', 'Vehicle_condition']
 
-    # 6. Coluna Time Taken
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(
-        lambda x: re.search('[0-9]+', x).group(0))
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
+# Medição das etapas do rerun (utils.perf)
+start_run('entregador')
 
-    # 7. Removendo os espaços dentro de strings/texto/object
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:,
-                                                 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
-
-    return df1
-
-
-def feature_engineering(df1):
-    """ Esta função tem a responsabilidade de criar novas colunas:
-
-        As colunas criadas são:
-        1. 'distance' - Distancia em quilometros.
-        2. 'order_week' - Semana do ano em que o pedido foi realizado.
-    """
-    col = ['Restaurant_latitude', 'Restaurant_longitude',
-           'Delivery_location_latitude', 'Delivery_location_longitude']
-    df1['distance'] = df1.loc[:, col].apply(lambda x: haversine(
-        (x['Restaurant_latitude'], x['Restaurant_longitude']), (x['Delivery_location_latitude'], x['Delivery_location_longitude'])), axis=1)
-
-    # Criando coluna Week of Year
-    df1['order_week'] = df1['Order_Date'].dt.isocalendar().week
+# ====================== FUNÇÕES ================================
 
 
-def mean_deliver_ratings(df1):
-    mean_deliver_ratings = (df1.loc[:, ['Delivery_person_ID', 'Delivery_person_Ratings']]
-                            .groupby('Delivery_person_ID')
-                            .mean()
-                            .reset_index()
+def mean_deliver_ratings(ratings):
+    mean_deliver_ratings = (ratings.reset_index()
                             .sort_values('Delivery_person_Ratings', ascending=False))
 
     return mean_deliver_ratings
 
 
-def mean_ratings(df1, col):
-    mean_weather_ratings = (df1.loc[:, [col, 'Delivery_person_Ratings']].groupby(
-        col).agg({'Delivery_person_Ratings': ['mean', 'std']}))
+def mean_ratings(cube, col):
+    mean_weather_ratings = cube_stats(cube, col, 'Delivery_person_Ratings')
+    mean_weather_ratings = mean_weather_ratings.loc[:, ['mean', 'std']]
     mean_weather_ratings.columns = ['mean_rating', 'std_rating']
-    mean_weather_ratings.reset_index()
     mean_weather_ratings = mean_weather_ratings.sort_values(
         'mean_rating', ascending=False)
 
     return mean_weather_ratings
 
 
-def top_delivers(df1, top_asc):
-    aux = df1.loc[:, ['Delivery_person_ID', 'City', 'Time_taken(min)']].groupby(
-        ['City', 'Delivery_person_ID']).mean().reset_index().sort_values(['City', 'Time_taken(min)'], ascending=top_asc)
-    aux_metropolitian = aux.loc[aux['City'] == 'Metropolitian', :].head(10)
-    aux_urban = aux.loc[aux['City'] == 'Urban', :].head(10)
-    aux_semi = aux.loc[aux['City'] == 'Semi-Urban', :].head(10)
-    faster_deliver = pd.concat([aux_metropolitian, aux_urban, aux_semi],
-                               axis=0).reset_index(drop=True)
-    return faster_deliver
-
-
-def calculate_key_numbers(col, operation):
+def calculate_key_numbers(extremes, col, operation):
     if operation == 'max':
-        result = df1.loc[:, col].max()
+        result = extremes.loc['max', col]
     elif operation == 'min':
-        result = df1.loc[:, col].min()
+        result = extremes.loc['min', col]
 
     return result
 
-# ------------------INICIO DA ESTRUTURA LOGICA DO CODIGO------------------------------
 
+def profile_stat(mean, std):
+    if mean != mean:
+        return '—'
+    if std != std:
+        return f'{mean:.2f}'
+
+    return f'{mean:.2f} ± {std:.2f}'
 
-# ------- Import Dataset ----------
-df = pd.read_csv('dataset/train.csv')
 
-# ------- Transformation Dataset ------------
-df1 = clean_code(df)
+def profile_range(low, high):
+    return f'{low}' if low == high else f'{low} - {high}'
+
+# ------------------INICIO DA ESTRUTURA LOGICA DO CODIGO------------------------------
 
-df2 = feature_engineering(df1)
 
 # =============================
 # SIDEBAR
@@ -142,15 +71,16 @@ df2 = feature_engineering(df1)
 st.header('Marketplace - Visão Entregadores')
 
 # image_path = '/home/pedro/Documentos/repos/ftc/img/logo.jpg'
-image = Image.open('logo.jpg')
-st.sidebar.image(image, width=120)
+# Logo decodificado uma vez por processo (utils.assets)
+st.sidebar.image(logo(), width=120)
 
 st.sidebar.markdown('# Cury Company')
 st.sidebar.markdown('## Fastest Delivery in town')
 st.sidebar.markdown("""___""")
 
-data_slider = st.sidebar.slider('Selecione a data limite',
-                                value=datetime.datetime(2022, 6, 4),
+data_slider = st.sidebar.slider('Selecione o período',
+                                value=(datetime.datetime(2022, 2, 11),
+                                       datetime.datetime(2022, 6, 4)),
                                 min_value=datetime.datetime(2022, 2, 11),
                                 max_value=datetime.datetime(2022, 6, 4),
                                 format='DD-MM-YYYY')
@@ -172,53 +102,59 @@ wheater_options = st.sidebar.multiselect('Selecione as condições climaticas',
 st.sidebar.markdown("""___""")
 st.sidebar.markdown('### Powered by Pedro Cortez')
 
-# Filtro de Data
-linhas_selecionadas = df1['Order_Date'] < data_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de Transito
-linhas_selecionadas = df1['Road_traffic_density'].isin(traffic_options)
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de Clima
-linhas_selecionadas = df1['Weatherconditions'].isin(wheater_options)
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtros de data, trânsito e clima (utils.filters.FilterIndex). Os dados
+# só são filtrados se algum gráfico não vier do cache (utils.memo.Deferred).
+# Mínimos, máximos e médias por entregador são calculados no backend (no
+# sqlite, com MIN/MAX e AVG ... GROUP BY): só o resultado vem para a página
+selections = {'Road_traffic_density': traffic_options,
+              'Weatherconditions': wheater_options}
+extremes = Deferred('filter/extremes', lambda: load_filter_index(
+    DATASET_PATH).extremes(data_slider, selections, KEY_COLUMNS))
+ratings = Deferred('filter/ratings', lambda: load_filter_index(
+    DATASET_PATH).group_mean(data_slider, selections, [DELIVERER], 'Delivery_person_Ratings'))
+time_means = Deferred('filter/time_means', lambda: load_filter_index(
+    DATASET_PATH).group_mean(data_slider, selections, ['City', DELIVERER], 'Time_taken(min)'))
+cube = Deferred('filter/cube', lambda: load_cube_index(
+    DATASET_PATH).filter(data_slider, selections))
+
+# Gráficos e tabelas ficam em cache por estado dos filtros (utils.memo)
+state = filter_state(data_slider, selections, DATASET_PATH)
 
 
 # =============================
 # LAYOUT NO STREAMLIT
 # =============================
 
-tab1, tab2, tab3 = st.tabs(
-    ['Visão Gerencial', '_', '_'])
+# Cada visão só é calculada quando selecionada (utils.views)
+
 
-with tab1:
+def visao_gerencial():
     with st.container():
         st.title('Overall Metrics')
         col1, col2, col3, col4 = st.columns(4, gap='large')
 
         with col1:
             # Maior idade dos entregadores
-            maior_idade = calculate_key_numbers(
-                col='Delivery_person_Age', operation='max')
+            maior_idade = memoize(calculate_key_numbers, state, extremes,
+                                  col='Delivery_person_Age', operation='max')
             col1.metric('Maior idade', maior_idade)
 
         with col2:
             # Menor idade dos entregadores
-            menor_idade = calculate_key_numbers(
-                col='Delivery_person_Age', operation='min')
+            menor_idade = memoize(calculate_key_numbers, state, extremes,
+                                  col='Delivery_person_Age', operation='min')
             col2.metric('Menor idade', menor_idade)
 
         with col3:
             # Melhor Condição de veiculo
-            melhor_condicao = calculate_key_numbers(
-                col='Vehicle_condition', operation='max')
+            melhor_condicao = memoize(calculate_key_numbers, state, extremes,
+                                      col='Vehicle_condition', operation='max')
             col3.metric('Melhor condição', melhor_condicao)
 
         with col4:
             # Pior Condição de veiculo
-            pior_condicao = calculate_key_numbers(
-                col='Vehicle_condition', operation='min')
+            pior_condicao = memoize(calculate_key_numbers, state, extremes,
+                                    col='Vehicle_condition', operation='min')
             col4.metric('Pior condição', pior_condicao)
 
     with st.container():
@@ -229,18 +165,24 @@ with tab1:
 
         with col1:
             st.markdown('##### Avaliações médias por entregador')
-            mean_deliver_ratings = mean_deliver_ratings(df1)
-            st.dataframe(mean_deliver_ratings, use_container_width=False)
+            # Só a página visível vai ao navegador; a busca usa o índice
+            # da tabela (utils.table)
+            deliver_ratings = Deferred('table/mean_deliver_ratings/rows', memoize,
+                                       mean_deliver_ratings, state, ratings)
+            paged_table(st, 'mean_deliver_ratings', state, deliver_ratings,
+                        ['Delivery_person_ID', 'Delivery_person_Ratings'],
+                        search='Delivery_person_ID', use_container_width=False)
 
         with col2:
             st.markdown('##### Avaliação média por trânsito')
-            mean_traffic_ratings = mean_ratings(
-                df1, col='Road_traffic_density')
-            st.dataframe(mean_traffic_ratings)
+            mean_traffic_ratings = memoize(
+                mean_ratings, state, cube, col='Road_traffic_density')
+            timed('render/mean_traffic_ratings', st.dataframe, mean_traffic_ratings)
 
             st.markdown('##### Avaliação média por clima')
-            mean_weather_ratings = mean_ratings(df1, col='Weatherconditions')
-            st.dataframe(mean_weather_ratings)
+            mean_weather_ratings = memoize(
+                mean_ratings, state, cube, col='Weatherconditions')
+            timed('render/mean_weather_ratings', st.dataframe, mean_weather_ratings)
 
     with st.container():
         st.markdown("""___""")
@@ -248,12 +190,62 @@ with tab1:
 
         col1, col2 = st.columns(2)
 
+        # Uma única média por entregador para os dois rankings; no pandas
+        # só fica a seleção dos k primeiros (utils.ranking)
+        faster_deliver, slowest_deliver = memoize(
+            rank_means, state, time_means, k=10)
+
         with col1:
             st.markdown('##### Top entregadores mais rápidos')
-            faster_deliver = top_delivers(df1, top_asc=True)
-            st.dataframe(faster_deliver, use_container_width=True)
+            timed('render/faster_deliver', st.dataframe, faster_deliver, use_container_width=True)
 
         with col2:
             st.markdown('##### Top entregadores mais lentos')
-            slowest_deliver = top_delivers(df1, top_asc=False)
-            st.dataframe(slowest_deliver, use_container_width=True)
+            timed('render/slowest_deliver', st.dataframe, slowest_deliver, use_container_width=True)
+
+
+def visao_entregador():
+    # Índice montado uma vez por dataset: buscar um entregador não filtra
+    # os pedidos (utils.profiles)
+    profiles = load_profile_index(DATASET_PATH)
+
+    with st.container():
+        st.title('Perfil do entregador')
+        deliverer = st.text_input('ID do entregador', value=profiles.ids[0].strip(),
+                                  key='perfil_entregador')
+        profile = timed('profile/lookup', profiles.profile, deliverer, data_slider)
+        if profile is None:
+            st.warning(f'Entregador não encontrado: {deliverer}')
+            return
+
+        summary = profile['summary']
+        st.caption('Resumo de todos os pedidos do entregador; os pedidos no período '
+                   'seguem o slider da sidebar')
+        col1, col2, col3, col4, col5, col6 = st.columns(6)
+        col1.metric('Pedidos', int(summary['orders']))
+        col2.metric('Pedidos no período', len(profile['orders']))
+        col3.metric('Avaliação média', profile_stat(summary['avg_rating'], summary['std_rating']))
+        col4.metric('Tempo médio (min)', profile_stat(summary['avg_time'], summary['std_time']))
+        col5.metric('Idade', profile_range(summary['min_age'], summary['max_age']))
+        col6.metric('Condição do veículo', profile_range(summary['min_vehicle_condition'],
+                                                         summary['max_vehicle_condition']))
+
+    with st.container():
+        st.markdown("""___""")
+        col1, col2 = st.columns(2)
+
+        with col1:
+            # Posição 1 é o mais rápido (ou o mais lento) da cidade
+            st.markdown('##### Por cidade e posição nos rankings de velocidade')
+            timed('render/profile_city', st.dataframe, profile['City'], use_container_width=True)
+
+        with col2:
+            st.markdown('##### Por clima')
+            timed('render/profile_weather', st.dataframe, profile['Weatherconditions'],
+                  use_container_width=True)
+
+
+render_views(st, {'Visão Gerencial': visao_gerencial, 'Visão por Entregador': visao_entregador},
+             key='entregador_view')
+
+perf_panel(st)
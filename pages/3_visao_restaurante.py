@@ -1,126 +1,100 @@
 # Libraries
-import re
-import pandas as pd
 import numpy as np
+import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
 import datetime
 
-import plotly.express as px
-import folium
-
-from haversine import haversine
-from PIL import Image
-from streamlit_folium import folium_static
+from utils.assets import logo
+from utils.backend import load_distinct_index, load_time_index
+from utils.cube import cube_stats
+from utils.loader import DATASET_PATH
+from utils.memo import Deferred, filter_state, memoize
+from utils.perf import perf_panel, start_run, timed
+from utils.schema import decode_categories
+from utils.table import paged_table
+from utils.views import render_views
 
 
 st.set_page_config(page_title='Visão Restaurante', layout='wide')
 
+# Medição das etapas do rerun (utils.perf)
+start_run('restaurante')
+
 # ====================== FUNÇÕES ================================
 
+# O plotly é importado dentro das funções dos gráficos: só é carregado
+# quando um gráfico é gerado (e não vem do cache)
 
-def clean_code(df1):
-    """ Esta função tem a responsabilidade de limpar o dataframe
 
-        Tipos de limpeza:
-        1. Retirar os valores NaN das colunas
-        2. Converter os tipos dos dados das colunas
-        3. Remoção dos espaços vazios
-        4. Formatação da coluna de data
-        5. Limpeza da coluna 'Time_taken(min)'
-    """
-    # Change Data Types
-    # 1. Convertendo a coluna 'Age' de texto para número
-    df1 = df1.loc[df1['Delivery_person_Age'] != 'NaN ', :].copy()
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
+def count_deliverers(date_limit, selections):
+    distinct_index = load_distinct_index(DATASET_PATH)
 
-    # 2. Convertendo a coluna ratings de texto para número decimal
-    df1 = df1.loc[df1['Delivery_person_Ratings'] != 'NaN ', :].copy()
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(
-        float)
+    return distinct_index.count(date_limit, selections)
 
-    # 3. Convertendo a coluna order date de texto para data
-    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
 
-    # 4. Convertendo Multiple Deliveries de texto para numero
-    df1 = df1.loc[df1['multiple_deliveries'] != 'NaN ', :].copy()
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
+def avg_distance(cube):
+    return np.round(cube['distance_sum'].sum() / cube['count'].sum(), 2)
 
-    # 5. Convertendo Multiple Deliveries de texto para numero
-    df1 = df1.loc[df1['Festival'] != 'NaN ', :].copy()
 
-    df1 = df1.loc[df1['Road_traffic_density'] != 'NaN ', :].copy()
+def avg_time_taken(cube, festival):
+    df_aux = cube_stats(cube, 'Festival', 'Time_taken(min)')
+    df_aux = df_aux.rename(columns={'mean': 'avg_time', 'std': 'std_time'})
+    df_aux = df_aux.reset_index()
+    df_aux = df_aux.loc[df_aux['Festival'] == festival, 'avg_time']
 
-    df1 = df1.loc[df1['City'] != 'NaN ', :].copy()
+    # Sem pedidos com esse Festival no período o metric mostra '—'
+    return np.round(df_aux.iloc[0], 2) if len(df_aux) else None
 
-    # 6. Coluna Time Taken
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(
-        lambda x: re.search('[0-9]+', x).group(0))
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
 
-    # 7. Removendo os espaços dentro de strings/texto/object
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:,
-                                                 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
+def delivery_time_by_city(cube):
+    import plotly.graph_objects as go
 
-    return df1
+    aux = cube_stats(cube, 'City', 'Time_taken(min)')
+    aux = aux.rename(columns={'mean': 'avg_time', 'std': 'std_time'})
+    aux = aux.reset_index()
 
+    fig = go.Figure()
+    fig.add_trace(go.Bar(name='Control', x=aux['City'], y=aux['avg_time'], error_y=dict(
+        type='data', array=aux['std_time'])))
+    fig.update_layout(barmode='group')
 
-def feature_engineering(df1):
-    """ Esta função tem a responsabilidade de criar novas colunas:
+    return fig
 
-        As colunas criadas são:
-        1. 'distance' - Distancia em quilometros.
-        2. 'order_week' - Semana do ano em que o pedido foi realizado.
-    """
-    col = ['Restaurant_latitude', 'Restaurant_longitude',
-           'Delivery_location_latitude', 'Delivery_location_longitude']
-    df1['distance'] = df1.loc[:, col].apply(lambda x: haversine(
-        (x['Restaurant_latitude'], x['Restaurant_longitude']), (x['Delivery_location_latitude'], x['Delivery_location_longitude'])), axis=1)
 
-    # Criando coluna Week of Year
-    df1['order_week'] = df1['Order_Date'].dt.isocalendar().week
+def time_by_city_traffic(cube):
+    aux = cube_stats(cube, ['City', 'Road_traffic_density'], 'Time_taken(min)')
+    aux = aux.loc[:, ['mean', 'std']].rename(
+        columns={'mean': 'avg_time', 'std': 'std_time'})
 
-    return df1
+    return aux.reset_index()
 
 
-def avg_time_taken(df1, festival):
-    df_aux = (df1.loc[:, ['Time_taken(min)', 'Festival']]
-                 .groupby('Festival')
-                 .agg({'Time_taken(min)': ['mean', 'std']}))
-    df_aux.columns = ['avg_time', 'std_time']
-    df_aux = df_aux.reset_index()
-    df_aux = np.round(
-        df_aux.loc[df_aux['Festival'] == festival, 'avg_time'], 2)
+def distance_by_city(cube):
+    import plotly.graph_objects as go
 
-    return df_aux
+    avg_distance = cube_stats(cube, 'City', 'distance').reset_index()
+    fig = go.Figure(data=[go.Pie(labels=avg_distance['City'],
+                    values=avg_distance['mean'], pull=[0, 0.1, 0])])
 
+    return fig
 
-def delivery_time_by_city(df1):
-    aux = df1.loc[:, ['City', 'Time_taken(min)']].groupby(
-        'City').agg({'Time_taken(min)': ['mean', 'std']})
-    aux.columns = ['avg_time', 'std_time']
-    aux = aux.reset_index()
 
-    fig = go.Figure()
-    fig.add_trace(go.Bar(name='Control', x=aux['City'], y=aux['avg_time'], error_y=dict(
-        type='data', array=aux['std_time'])))
-    fig.update_layout(barmode='group')
+def rolling_delivery_time(week, month):
+    import plotly.express as px
+
+    column = 'Time_taken(min)_sum'
+    aux = pd.DataFrame({'Order_Date': week['Order_Date'],
+                        '7 dias': week[column] / week['count'].where(week['count'] > 0),
+                        '28 dias': month[column] / month['count'].where(month['count'] > 0)})
+    fig = px.line(aux, x='Order_Date', y=['7 dias', '28 dias'])
 
     return fig
 
 
-def sunburst_chart(df1):
-    aux = df1.loc[:, ['City', 'Road_traffic_density', 'Time_taken(min)']].groupby(
-        ['City', 'Road_traffic_density']).agg({'Time_taken(min)': ['mean', 'std']})
+def sunburst_chart(cube):
+    import plotly.express as px
 
-    aux.columns = ['avg_time', 'std_time']
-    aux = aux.reset_index()
+    aux = decode_categories(time_by_city_traffic(cube))
 
     fig = px.sunburst(aux, path=['City', 'Road_traffic_density'],
                       values='avg_time',
@@ -133,29 +107,22 @@ def sunburst_chart(df1):
 # ------------------INICIO DA ESTRUTURA LOGICA DO CODIGO------------------------------
 
 
-# ------- Import Dataset ----------
-df = pd.read_csv('dataset/train.csv')
-
-# ------- Transformation Dataset ------------
-df1 = clean_code(df)
-df2 = feature_engineering(df1)
-
-
 # =============================
 # SIDEBAR
 # =============================
 st.header('Marketplace - Visão Restaurante')
 
 # image_path = '/home/pedro/Documentos/repos/ftc/img/logo.jpg'
-image = Image.open('logo.jpg')
-st.sidebar.image(image, width=120)
+# Logo decodificado uma vez por processo (utils.assets)
+st.sidebar.image(logo(), width=120)
 
 st.sidebar.markdown('# Cury Company')
 st.sidebar.markdown('## Fastest Delivery in town')
 st.sidebar.markdown("""___""")
 
-data_slider = st.sidebar.slider('Selecione uma data limite',
-                                value=datetime.datetime(2022, 6, 4),
+data_slider = st.sidebar.slider('Selecione o período',
+                                value=(datetime.datetime(2022, 2, 11),
+                                       datetime.datetime(2022, 6, 4)),
                                 min_value=datetime.datetime(2022, 2, 11),
                                 max_value=datetime.datetime(2022, 6, 4),
                                 format='DD-MM-YYYY')
@@ -173,25 +140,30 @@ city_options = st.sidebar.multiselect('Quais tipos de cidades?',
 st.sidebar.markdown("""___""")
 st.sidebar.markdown('### Powered by Pedro Cortez')
 
-# Filtro de Data
-linhas_selecionadas = df1['Order_Date'] < data_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de Transito
-linhas_selecionadas = df1['Road_traffic_density'].isin(traffic_options)
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de Cidade
-linhas_selecionadas = df1['City'].isin(city_options)
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtros de período, trânsito e cidade: a página só usa o índice de tempo
+# (utils.timeindex, duas posições e uma subtração por período) e a contagem
+# de entregadores distintos (utils.distinct). Os dados só são filtrados se
+# algum gráfico não vier do cache (utils.memo.Deferred)
+selections = {'Road_traffic_density': traffic_options,
+              'City': city_options}
+cube = Deferred('filter/cube', lambda: load_time_index(
+    DATASET_PATH).cube(data_slider, selections))
+rolling_week, rolling_month = (
+    Deferred(f'filter/rolling_{window}', lambda window=window: load_time_index(
+        DATASET_PATH).rolling(data_slider, selections, window))
+    for window in (7, 28))
+
+# Gráficos e tabelas ficam em cache por estado dos filtros (utils.memo)
+state = filter_state(data_slider, selections, DATASET_PATH)
 
 # =============================
 # LAYOUT NO STREAMLIT
 # =============================
 
-tab1, tab2, tab3 = st.tabs(['Visão Gerencial', '_', '_'])
+# Cada visão só é calculada quando selecionada (utils.views)
+
 
-with tab1:
+def visao_gerencial():
 
     with st.container():
         st.title('Overall Metrics')
@@ -199,40 +171,48 @@ with tab1:
         col1, col2, col3, col4 = st.columns(4)
 
         with col1:
-            deliver_num = len(df1.loc[:, 'Delivery_person_ID'].unique())
+            deliver_num = memoize(count_deliverers, state, data_slider, selections)
             col1.metric('Entregadores', deliver_num)
 
         with col2:
-            avg_distance = np.round(df1['distance'].mean(), 2)
-            col2.metric('Distancia média', avg_distance)
+            distance = memoize(avg_distance, state, cube)
+            col2.metric('Distancia média', distance)
 
         with col3:
 
-            df_aux = avg_time_taken(df1, festival='Yes')
+            df_aux = memoize(avg_time_taken, state, cube, festival='Yes')
             col3.metric('Tempo médio com Festival', df_aux)
 
         with col4:
-            df_aux = avg_time_taken(df1, festival='No')
+            df_aux = memoize(avg_time_taken, state, cube, festival='No')
             col4.metric('Tempo médio sem Festival', df_aux)
 
     with st.container():
         st.markdown("""___""")
 
-        tab1, tab2 = st.tabs(['Bar Chart', 'Dataframe'])
-
-        with tab1:
+        def bar_chart():
             st.title('Tempo médio de entrega por cidade')
-            fig = delivery_time_by_city(df1)
-            st.plotly_chart(fig, use_container_width=True)
+            fig = memoize(delivery_time_by_city, state, cube)
+            timed('render/delivery_time_by_city', st.plotly_chart, fig, use_container_width=True)
 
-        with tab2:
+        def dataframe():
             st.title('Distribuição da distancia')
-            aux = df1.loc[:, ['City', 'Road_traffic_density', 'Time_taken(min)']].groupby(
-                ['City', 'Road_traffic_density']).agg({'Time_taken(min)': ['mean', 'std']})
-            aux.columns = ['avg_time', 'std_time']
-            aux = aux.reset_index()
+            # Paginada e ordenada no servidor (utils.table)
+            aux = Deferred('table/time_by_city_traffic/rows', memoize,
+                           time_by_city_traffic, state, cube)
+            paged_table(st, 'time_by_city_traffic', state, aux,
+                        ['City', 'Road_traffic_density', 'avg_time', 'std_time'],
+                        use_container_width=True)
+
+        render_views(st, {'Bar Chart': bar_chart, 'Dataframe': dataframe},
+                     key='restaurante_time_view')
+
+    with st.container():
 
-            st.dataframe(aux, use_container_width=True)
+        st.markdown("""___""")
+        st.title('Tempo médio de entrega nos últimos 7 e 28 dias')
+        fig = memoize(rolling_delivery_time, state, rolling_week, rolling_month)
+        timed('render/rolling_delivery_time', st.plotly_chart, fig, use_container_width=True)
 
     with st.container():
 
@@ -242,12 +222,14 @@ with tab1:
 
         with col1:
 
-            avg_distance = df1.loc[:, ['City', 'distance']].groupby(
-                'City').mean().reset_index()
-            fig = go.Figure(data=[go.Pie(labels=avg_distance['City'],
-                            values=avg_distance['distance'], pull=[0, 0.1, 0])])
-            st.plotly_chart(fig, use_container_width=True)
+            fig = memoize(distance_by_city, state, cube)
+            timed('render/distance_by_city', st.plotly_chart, fig, use_container_width=True)
 
         with col2:
-            fig = sunburst_chart(df1)
-            st.plotly_chart(fig, use_container_width=True)
+            fig = memoize(sunburst_chart, state, cube)
+            timed('render/sunburst_chart', st.plotly_chart, fig, use_container_width=True)
+
+
+render_views(st, {'Visão Gerencial': visao_gerencial}, key='restaurante_view')
+
+perf_panel(st)
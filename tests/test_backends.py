@@ -0,0 +1,55 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from benchmarks.backends import compare, queries
+from benchmarks.generate import generate_chunk
+from utils import sqlite_backend
+
+# Colunas com células vazias no dataset de teste
+EMPTY_COLUMNS = ['City', 'Road_traffic_density', 'Weatherconditions', 'Festival',
+                 'Type_of_order', 'Type_of_vehicle', 'Delivery_person_Ratings']
+
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    df = generate_chunk(0, 4000, seed=3)
+    rng = np.random.default_rng(3)
+    for col in EMPTY_COLUMNS:
+        df.loc[rng.choice(len(df), 40, replace=False), col] = None
+    path = str(tmp_path_factory.mktemp('backends') / 'train.csv')
+    df.to_csv(path, index=False)
+
+    return path
+
+
+def test_backends_return_the_same_results(dataset):
+    expected = queries(dataset, 'pandas')
+    actual = queries(dataset, 'sqlite')
+
+    assert set(actual) == set(expected)
+    errors = {}
+    for name, (func, date, selections) in expected.items():
+        error = compare(func(date, selections), actual[name][0](date, selections))
+        if error is not None:
+            errors[name] = error
+
+    assert errors == {}
+
+
+def test_database_is_valid_by_content(dataset, tmp_path):
+    path = str(tmp_path / 'train.csv')
+    shutil.copyfile(dataset, path)
+    sqlite_backend.build_database(path)
+    assert sqlite_backend.database_is_valid(path)
+
+    # Mesmo conteúdo com outro mtime (touch, checkout): o banco continua valendo
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert sqlite_backend.database_is_valid(path)
+
+    with open(path, 'a') as f:
+        f.write(open(dataset).read().splitlines()[1] + '\n')
+    assert not sqlite_backend.database_is_valid(path)
@@ -0,0 +1,61 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generate import generate_chunk
+from utils.cube import build_cube, cube_count, cube_stats
+from utils.filters import FilterIndex
+from utils.schema import compact_dataset
+from utils.transform import clean_code, read_dataset
+
+# Dimensões com células vazias nos pedidos de teste
+EMPTY_COLUMNS = ['City', 'Road_traffic_density', 'Weatherconditions', 'Festival',
+                 'Type_of_order', 'Type_of_vehicle']
+
+FILTERS = {
+    'todos': ('2022-04-07', {'Road_traffic_density': ['Low', 'Medium', 'High', 'Jam'],
+                             'City': ['Metropolitian', 'Urban', 'Semi-Urban']}),
+    'restrito': (('2022-03-01', '2022-03-20'), {'Road_traffic_density': ['Jam'],
+                                                'City': ['Urban', 'Semi-Urban']}),
+}
+
+
+@pytest.fixture(scope='module')
+def orders():
+    df = generate_chunk(0, 3000, seed=5)
+    rng = np.random.default_rng(5)
+    for col in EMPTY_COLUMNS:
+        df.loc[rng.choice(len(df), 40, replace=False), col] = None
+    return compact_dataset(clean_code(read_dataset(io.StringIO(df.to_csv(index=False)))))
+
+
+def eager_filter(df1, date_range, selections):
+    start, end = (date_range if isinstance(date_range, tuple) else (None, date_range))
+    mask = df1['Order_Date'] < pd.Timestamp(end)
+    if start is not None:
+        mask &= df1['Order_Date'] >= pd.Timestamp(start)
+    for col, values in selections.items():
+        mask &= df1[col].isin(values)
+
+    return df1.loc[mask]
+
+
+@pytest.mark.parametrize('name', list(FILTERS))
+def test_cube_matches_eager_filter(orders, name):
+    date_range, selections = FILTERS[name]
+    assert orders[EMPTY_COLUMNS].isna().any().all()
+
+    cube = FilterIndex(build_cube(orders)).filter(date_range, selections)
+    df1 = eager_filter(orders, date_range, selections)
+
+    assert cube['count'].sum() == len(df1)
+    pd.testing.assert_series_equal(cube_count(cube, 'Order_Date'),
+                                   df1.groupby('Order_Date').size().rename('count'))
+    for by, col in [('Festival', 'Time_taken(min)'),
+                    (['City', 'Road_traffic_density'], 'distance'),
+                    ('Type_of_vehicle', 'Delivery_person_Ratings')]:
+        stats = cube_stats(cube, by, col)
+        expected = df1.groupby(by, observed=True)[col].agg(['count', 'mean', 'std'])
+        pd.testing.assert_frame_equal(stats, expected.sort_index(), check_dtype=False)
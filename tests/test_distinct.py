@@ -0,0 +1,59 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generate import generate_chunk
+from utils.distinct import DistinctIndex
+from utils.features import with_features
+from utils.schema import apply_schema
+from utils.transform import clean_code, read_dataset
+
+FILTERS = [
+    ('2022-04-07', {'Road_traffic_density': ['Low', 'Medium', 'High', 'Jam'],
+                    'City': ['Metropolitian', 'Urban', 'Semi-Urban']}),
+    (('2022-03-01', '2022-03-20'), {'Road_traffic_density': ['Jam'], 'City': ['Urban']}),
+    ('2022-03-15', {'Weatherconditions': ['conditions Fog', 'conditions Sunny']}),
+]
+
+
+@pytest.fixture(scope='module')
+def orders():
+    df = generate_chunk(0, 4000, seed=8)
+    rng = np.random.default_rng(8)
+    for col in ['City', 'Road_traffic_density']:
+        df.loc[rng.choice(len(df), 40, replace=False), col] = None
+    df1 = apply_schema(clean_code(read_dataset(io.StringIO(df.to_csv(index=False)))))
+
+    return with_features(df1, ['order_week'])
+
+
+def eager_filter(df1, date_range, selections):
+    start, end = date_range if isinstance(date_range, tuple) else (None, date_range)
+    mask = df1['Order_Date'] < pd.Timestamp(end)
+    if start is not None:
+        mask &= df1['Order_Date'] >= pd.Timestamp(start)
+    for col, values in selections.items():
+        mask &= df1[col].isin(values)
+
+    return df1.loc[mask]
+
+
+@pytest.mark.parametrize('date_range, selections', FILTERS)
+def test_exact_count_matches_nunique(orders, date_range, selections):
+    index = DistinctIndex(orders)
+    df1 = eager_filter(orders, date_range, selections)
+
+    assert index.count(date_range, selections) == df1['Delivery_person_ID'].nunique()
+    by_week = index.count(date_range, selections, by='order_week')
+    expected = df1.groupby('order_week')['Delivery_person_ID'].nunique()
+    assert by_week.to_dict() == expected[expected > 0].to_dict()
+
+
+@pytest.mark.parametrize('date_range, selections', FILTERS)
+def test_hll_count_is_close(orders, date_range, selections):
+    index = DistinctIndex(orders)
+    exact = index.count(date_range, selections)
+
+    assert abs(index.count(date_range, selections, method='hll') - exact) <= 0.1 * exact + 2
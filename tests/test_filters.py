@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from utils.filters import FilterIndex
+
+
+def orders():
+    return pd.DataFrame({
+        'Order_Date': pd.to_datetime(['2022-03-02', '2022-03-01', '2022-03-03', '2022-03-01',
+                                      '2022-03-04']),
+        'City': pd.Categorical(['Urban', 'Metropolitian', None, 'Semi-Urban', 'Urban']),
+        'Road_traffic_density': pd.Categorical(['Low', 'Jam', 'High', 'Medium', 'Low']),
+        'Weatherconditions': pd.Categorical(['conditions Fog'] * 5),
+        'Time_taken(min)': np.arange(10, 15, dtype='int16'),
+    })
+
+
+def expected(df1, date_limit, selections):
+    mask = df1['Order_Date'] < pd.Timestamp(date_limit)
+    for col, values in selections.items():
+        mask &= df1[col].isin(values)
+
+    return df1.loc[mask].sort_values('Order_Date', kind='stable')
+
+
+def test_filter_drops_missing_values_when_all_selected():
+    df1 = orders()
+    selections = {'City': ['Metropolitian', 'Urban', 'Semi-Urban']}
+
+    result = FilterIndex(df1).filter('2022-03-10', selections)
+
+    assert len(result) == 4
+    pd.testing.assert_frame_equal(result, expected(df1, '2022-03-10', selections))
+
+
+def test_filter_matches_isin():
+    df1 = orders()
+    selections = {'City': ['Urban'], 'Road_traffic_density': ['Low', 'High']}
+
+    result = FilterIndex(df1).filter('2022-03-04', selections)
+
+    pd.testing.assert_frame_equal(result, expected(df1, '2022-03-04', selections))
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.backends import compare
+from benchmarks.generate import generate_chunk
+from benchmarks.suite import FILTERS
+from utils import loader
+from utils.cube import DIMENSIONS, load_cube
+from utils.distinct import load_distinct_index
+from utils.schema import decode_categories
+from utils.timeindex import load_time_index
+
+# Linhas do CSV de teste e quantas delas são acrescentadas depois
+ROWS = 3000
+APPENDED = 600
+
+
+def load_all(path):
+    """ Dataset, cubo, índice de distintos (com o HLL montado) e de tempo """
+    distinct = load_distinct_index(path)
+    distinct.registers
+
+    return loader.load_dataset(path), load_cube(path), distinct, load_time_index(path)
+
+
+def answers(distinct, time_index):
+    results = {}
+    for name, (date, selections) in FILTERS.items():
+        period = ('2022-03-01', date)
+        results[f'{name}/distinct'] = distinct.count(date, selections)
+        results[f'{name}/distinct_hll'] = distinct.count(date, selections, method='hll')
+        results[f'{name}/distinct_by_week'] = distinct.count(date, selections, by='order_week')
+        results[f'{name}/time_cube'] = time_index.cube(period, selections)
+        results[f'{name}/daily'] = time_index.daily(period, selections)
+        results[f'{name}/rolling_28'] = time_index.rolling(period, selections, 28)
+
+    return results
+
+
+def sorted_cube(cube):
+    return decode_categories(cube).sort_values(DIMENSIONS).reset_index(drop=True)
+
+
+def test_append_matches_fresh_build(tmp_path):
+    df = generate_chunk(0, ROWS, seed=9)
+    rng = np.random.default_rng(9)
+    for col in ['City', 'Road_traffic_density', 'Festival']:
+        df.loc[rng.choice(ROWS, 30, replace=False), col] = None
+    text = df.to_csv(index=False)
+    lines = text.splitlines(keepends=True)
+    head = lines[:len(lines) - APPENDED]
+
+    path = str(tmp_path / 'train.csv')
+    with open(path, 'w') as f:
+        f.writelines(head)
+    loaded = load_all(path)
+    old_key = loader.dataset_key(path)
+
+    with open(path, 'a') as f:
+        f.writelines(lines[len(head):])
+    df1, cube, distinct, time_index = load_all(path)
+
+    # Só as linhas novas foram processadas, e os índices anteriores não mudam
+    delta = loader.dataset_delta(path, old_key)
+    assert 0 < len(delta) <= APPENDED and delta.index.min() >= ROWS - APPENDED
+    assert distinct is not loaded[2] and time_index is not loaded[3]
+
+    fresh_path = str(tmp_path / 'fresh' / 'train.csv')
+    os.makedirs(os.path.dirname(fresh_path))
+    with open(fresh_path, 'w') as f:
+        f.write(text)
+    fresh = load_all(fresh_path)
+
+    pd.testing.assert_frame_equal(decode_categories(df1), decode_categories(fresh[0]))
+    pd.testing.assert_frame_equal(sorted_cube(cube), sorted_cube(fresh[1]))
+    expected = answers(*fresh[2:])
+    errors = {name: compare(value, expected[name])
+              for name, value in answers(distinct, time_index).items()}
+
+    assert {name: error for name, error in errors.items() if error} == {}
+
+    # Processo novo: o dataset vem do cache colunar com o segmento acrescentado
+    loader.clear_cache()
+    pd.testing.assert_frame_equal(decode_categories(loader.load_dataset(path)),
+                                  decode_categories(fresh[0]))
+    assert len(loader.segment_paths(path)) == 1
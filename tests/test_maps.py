@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from utils.maps import LAT, LON, delivery_points, sample_size
+
+
+def points_frame(n):
+    return pd.DataFrame({LAT: np.linspace(10, 20, n), LON: np.linspace(70, 80, n)})
+
+
+def test_sample_size_matches_delivery_points():
+    for n, max_points in [(0, 10), (10, 10), (11, 10), (99, 10), (100, 10), (101, 7)]:
+        df1 = points_frame(n)
+        shown, total = sample_size(df1, max_points)
+        assert total == n
+        assert shown == len(delivery_points(df1, max_points))
+        assert shown <= max_points
+
+
+def test_no_sample_below_limit():
+    df1 = points_frame(10)
+    assert sample_size(df1, 10) == (10, 10)
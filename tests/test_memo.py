@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from utils.memo import Deferred, LRUCache, chart_cache, memoize, resolve
+
+
+@pytest.fixture(autouse=True)
+def empty_chart_cache():
+    chart_cache.clear()
+    yield
+    chart_cache.clear()
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=10)
+    cache.put('a', 1, 4)
+    cache.put('b', 2, 4)
+    assert cache.get('a') == 1
+
+    cache.put('c', 3, 4)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 8
+
+
+def test_lru_skips_values_larger_than_the_limit():
+    cache = LRUCache(max_bytes=10)
+    cache.put('a', 1, 4)
+    cache.put('big', 2, 11)
+
+    assert cache.get('big') is None
+    assert cache.get('a') == 1
+
+
+def test_deferred_runs_once():
+    calls = []
+    deferred = Deferred('test/deferred', lambda x: calls.append(x) or x * 2, 21)
+
+    assert resolve(deferred) == 42
+    assert resolve(deferred) == 42
+    assert calls == [21]
+    assert resolve(7) == 7
+
+
+def count_rows(df1, label='x'):
+    return pd.Series({label: len(df1)})
+
+
+def test_memoize_skips_the_filter_on_a_hit():
+    filtered = []
+
+    def rows(n):
+        filtered.append(n)
+        return pd.DataFrame({'a': range(n)})
+
+    state = ('dataset', ('2022-03-01',), ())
+    first = memoize(count_rows, state, Deferred('test/rows', rows, 3), label='n')
+    again = memoize(count_rows, state, Deferred('test/rows', rows, 5), label='n')
+    other = memoize(count_rows, state, Deferred('test/rows', rows, 5), label='m')
+
+    assert again is first and first['n'] == 3
+    assert other['m'] == 5
+    assert filtered == [3, 5]
@@ -0,0 +1,49 @@
+import pandas as pd
+
+from benchmarks.generate import generate_chunk
+from utils.memo import filter_state, resolve
+from utils.pages import page_functions
+from utils.precompute import PAGES, combinations, precompute, state_inputs
+from utils.snapshot import read_snapshot
+
+PAGE = 'pages/2_visao_entregador.py'
+
+
+def assert_same(actual, expected):
+    if isinstance(expected, tuple):
+        assert len(actual) == len(expected)
+        for item, expected_item in zip(actual, expected):
+            assert_same(item, expected_item)
+    elif isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(actual, expected)
+    else:
+        assert actual == expected
+
+
+def test_combinations():
+    options = {'City': ['Urban', 'Metropolitian'], 'Road_traffic_density': ['Low']}
+
+    assert combinations(options, 'default') == [options]
+    assert len(combinations(options, 'single')) == 1 + 2 + 1
+    assert len(combinations(options, 'all')) == 3 * 1
+
+
+def test_precompute_serves_the_page_values(tmp_path, monkeypatch):
+    path = str(tmp_path / 'train.csv')
+    generate_chunk(0, 2000, seed=4).to_csv(path, index=False)
+    directory = str(tmp_path / 'snapshots')
+    monkeypatch.setitem(PAGES[PAGE], 'dates', ('2022-03-01', '2022-03-03', '2022-03-03'))
+
+    manifest = precompute(directory, path, [PAGE], 'default')
+
+    assert manifest['states'] == 3
+    assert manifest['entries'] == 3 * len(PAGES[PAGE]['calls'])
+    funcs = page_functions(PAGE)
+    date = (pd.Timestamp('2022-03-01'), pd.Timestamp('2022-03-03'))
+    selections = combinations(PAGES[PAGE]['selections'], 'default')[0]
+    state = filter_state(date, selections, path)
+    inputs = state_inputs(path, date, selections)
+    for name, args, kwargs in PAGES[PAGE]['calls']:
+        func = funcs[name]
+        expected = func(*[resolve(inputs[arg]) for arg in args], **kwargs)
+        assert_same(read_snapshot(func, state, kwargs, directory), expected)
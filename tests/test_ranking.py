@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.ranking import DELIVERER, deliverer_means, rank_deliverers, smallest_positions, top_k
+
+
+@pytest.fixture
+def orders():
+    rng = np.random.default_rng(13)
+    size = 600
+    return pd.DataFrame({
+        'City': pd.Categorical(rng.choice(['Metropolitian', 'Urban', 'Semi-Urban'], size)),
+        DELIVERER: pd.Categorical([f'DEL{n:03d}' for n in rng.integers(0, 80, size)]),
+        # Poucos valores distintos: muitos empates nas médias
+        'Time_taken(min)': rng.integers(10, 14, size).astype('int16'),
+    })
+
+
+def test_smallest_positions_keeps_first_ties():
+    values = np.array([3.0, 1.0, 2.0, 1.0, 2.0, 0.5])
+
+    assert list(smallest_positions(values, 3)) == [5, 1, 3]
+    assert list(smallest_positions(values, 4)) == [5, 1, 3, 2]
+    assert list(smallest_positions(values, 10)) == [5, 1, 3, 2, 4, 0]
+
+
+@pytest.mark.parametrize('k', [1, 10, 100])
+def test_top_k_matches_stable_sort(orders, k):
+    means = deliverer_means(orders)
+    fastest, slowest = rank_deliverers(orders, k)
+
+    # Ordenação estável: empates na ordem dos IDs (o nsmallest do pandas só
+    # garante isso quando k é menor que o grupo)
+    groups = means.groupby(level=0, observed=True)
+    expected_fastest = pd.concat([group.sort_values(kind='mergesort').head(k)
+                                  for _, group in groups])
+    expected_slowest = pd.concat([group.sort_values(ascending=False, kind='mergesort').head(k)
+                                  for _, group in groups])
+    pd.testing.assert_frame_equal(fastest, expected_fastest.reset_index())
+    pd.testing.assert_frame_equal(slowest, expected_slowest.reset_index())
+
+
+def test_top_k_of_empty_means(orders):
+    means = deliverer_means(orders.iloc[:0])
+
+    assert len(top_k(means, 10)) == 0
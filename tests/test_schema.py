@@ -0,0 +1,24 @@
+import io
+
+import numpy as np
+
+from benchmarks.generate import generate_chunk
+from utils.features import compute_feature
+from utils.geo import haversine_np
+from utils.schema import apply_schema, compact_dataset
+from utils.transform import clean_code, read_dataset
+
+COORDINATES = ['Restaurant_latitude', 'Restaurant_longitude',
+               'Delivery_location_latitude', 'Delivery_location_longitude']
+
+
+def test_distance_uses_float64_coordinates():
+    df1 = clean_code(read_dataset(io.StringIO(generate_chunk(0, 2000, seed=6).to_csv(index=False))))
+    expected = haversine_np(*[df1[col].to_numpy('float64') for col in COORDINATES])
+
+    result = compact_dataset(df1)
+
+    assert all(result[col].dtype == np.float32 for col in COORDINATES)
+    np.testing.assert_array_equal(result['distance'].to_numpy(), expected)
+    # Calculada depois da compactação, a distância perde precisão
+    assert not np.array_equal(compute_feature(apply_schema(df1), 'distance').to_numpy(), expected)
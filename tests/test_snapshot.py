@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+
+from utils import snapshot
+from utils.memo import filter_state
+from utils.snapshot import entry_key, read_snapshot, write_manifest, write_state
+
+SELECTIONS = {'City': ['Urban', 'Metropolitian']}
+
+
+def deliveries(df1, top=3):
+    return df1.head(top)
+
+
+def write_csv(path, rows):
+    with open(path, 'w') as f:
+        f.write('ID,City\n' + ''.join(f'{n},Urban\n' for n in range(rows)))
+
+
+def test_snapshot_round_trip_until_the_dataset_changes(tmp_path):
+    path = str(tmp_path / 'train.csv')
+    directory = str(tmp_path / 'snapshots')
+    write_csv(path, 5)
+    value = pd.DataFrame({'a': [1, 2, 3]})
+
+    state = filter_state('2022-04-01', SELECTIONS, path)
+    write_state(directory, state, {entry_key(deliveries, {'top': 3}): value})
+    write_manifest(directory, state)
+
+    pd.testing.assert_frame_equal(read_snapshot(deliveries, state, {'top': 3}, directory), value)
+    assert read_snapshot(deliveries, state, {'top': 5}, directory) is None
+    assert read_snapshot(deliveries, state, {'top': 3}, None) is None
+
+    # Só o mtime mudou (checkout, cópia): o snapshot continua valendo
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    state = filter_state('2022-04-01', SELECTIONS, path)
+    pd.testing.assert_frame_equal(read_snapshot(deliveries, state, {'top': 3}, directory), value)
+
+    # Conteúdo novo: o sha1 do dataset muda e o snapshot é descartado
+    write_csv(path, 6)
+    state = filter_state('2022-04-01', SELECTIONS, path)
+    assert read_snapshot(deliveries, state, {'top': 3}, directory) is None
+
+
+def test_snapshot_is_discarded_on_another_cache_version(tmp_path, monkeypatch):
+    path = str(tmp_path / 'train.csv')
+    directory = str(tmp_path / 'snapshots')
+    write_csv(path, 5)
+    state = filter_state('2022-04-01', SELECTIONS, path)
+    write_state(directory, state, {entry_key(deliveries, {}): 1})
+    write_manifest(directory, state)
+    assert read_snapshot(deliveries, state, {}, directory) == 1
+
+    monkeypatch.setattr(snapshot, 'CACHE_VERSION', 'outra')
+
+    assert read_snapshot(deliveries, state, {}, directory) is None
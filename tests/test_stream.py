@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate import generate_chunk
+from utils.cube import DIMENSIONS
+from utils.distinct import CELL_KEYS
+from utils.schema import compact_dataset, decode_categories
+from utils.stream import build_aggregates, stream_aggregates
+from utils.transform import clean_code, feature_engineering, read_dataset
+
+
+def sorted_frame(df, keys):
+    return decode_categories(df).sort_values(keys, na_position='first').reset_index(drop=True)
+
+
+def test_stream_matches_full_aggregates(tmp_path):
+    df = generate_chunk(0, 2500, seed=11)
+    rng = np.random.default_rng(11)
+    for col in ['City', 'Road_traffic_density', 'Festival']:
+        df.loc[rng.choice(len(df), 30, replace=False), col] = None
+    path = str(tmp_path / 'train.csv')
+    df.to_csv(path, index=False)
+
+    expected = build_aggregates(feature_engineering(compact_dataset(clean_code(read_dataset(path)))))
+    result = stream_aggregates(path, chunksize=300)
+
+    assert result['rows'] == expected['rows']
+    pd.testing.assert_frame_equal(sorted_frame(result['cube'], DIMENSIONS),
+                                  sorted_frame(expected['cube'], DIMENSIONS))
+    keys = CELL_KEYS + ['Delivery_person_ID']
+    pd.testing.assert_frame_equal(sorted_frame(result['cell_deliverers'], keys),
+                                  sorted_frame(expected['cell_deliverers'], keys))
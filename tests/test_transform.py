@@ -0,0 +1,87 @@
+import io
+import re
+
+import pandas as pd
+import pytest
+
+from benchmarks.generate import generate_chunk
+from utils.transform import clean_code, read_dataset
+
+
+def original_clean_code(df1):
+    """ clean_code como era nas páginas, antes da vetorização (referência) """
+    df1 = df1.loc[df1['Delivery_person_Age'] != 'NaN ', :].copy()
+    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
+
+    df1 = df1.loc[df1['Delivery_person_Ratings'] != 'NaN ', :].copy()
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(
+        float)
+
+    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
+
+    df1 = df1.loc[df1['multiple_deliveries'] != 'NaN ', :].copy()
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
+
+    df1 = df1.loc[df1['Festival'] != 'NaN ', :].copy()
+
+    df1 = df1.loc[df1['Road_traffic_density'] != 'NaN ', :].copy()
+
+    df1 = df1.loc[df1['City'] != 'NaN ', :].copy()
+
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(
+        lambda x: re.search('[0-9]+', x).group(0))
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
+
+    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
+    df1.loc[:, 'Road_traffic_density'] = df1.loc[:,
+                                                 'Road_traffic_density'].str.strip()
+    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
+    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
+    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
+    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
+
+    return df1
+
+
+def csv_text(df):
+    return df.to_csv(index=False)
+
+
+@pytest.fixture
+def sample_csv():
+    # Formato do dataset real, com sentinelas 'NaN ' (benchmarks.generate)
+    return csv_text(generate_chunk(0, 3000, seed=7))
+
+
+@pytest.fixture
+def empty_cells_csv():
+    # Células vazias (não 'NaN ') em colunas de texto e na avaliação: a
+    # limpeza original mantém essas linhas
+    df = generate_chunk(0, 6, seed=1)
+    for col in ['Delivery_person_Age', 'Delivery_person_Ratings', 'multiple_deliveries',
+                'Festival', 'Road_traffic_density', 'City']:
+        df.loc[df[col] == 'NaN ', col] = '1' if col != 'Festival' else 'No '
+    df.loc[0, 'Festival'] = None
+    df.loc[1, 'City'] = None
+    df.loc[2, 'Road_traffic_density'] = None
+    df.loc[3, 'Delivery_person_Ratings'] = None
+    df.loc[4, 'City'] = 'NaN '
+
+    return csv_text(df)
+
+
+@pytest.mark.parametrize('reader', [read_dataset, pd.read_csv])
+def test_clean_code_matches_original(sample_csv, reader):
+    expected = original_clean_code(pd.read_csv(io.StringIO(sample_csv)))
+    result = clean_code(reader(io.StringIO(sample_csv)))
+
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+
+
+@pytest.mark.parametrize('reader', [read_dataset, pd.read_csv])
+def test_clean_code_keeps_empty_cells(empty_cells_csv, reader):
+    expected = original_clean_code(pd.read_csv(io.StringIO(empty_cells_csv)))
+    result = clean_code(reader(io.StringIO(empty_cells_csv)))
+
+    assert len(expected) == 5
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
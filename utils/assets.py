@@ -0,0 +1,35 @@
+import io
+import threading
+
+LOGO_PATH = 'logo.jpg'
+
+# Largura do logo na sidebar das páginas
+LOGO_WIDTH = 120
+
+# Arquivos estáticos já processados: {(caminho, largura): bytes}
+_cache = {}
+_lock = threading.Lock()
+
+
+def logo(path=LOGO_PATH, width=LOGO_WIDTH):
+    """ Esta função tem a responsabilidade de carregar o logo
+
+        O arquivo é decodificado e reduzido para a largura exibida uma vez
+        por processo. O resultado são bytes JPEG já no tamanho final, então
+        o st.image não precisa redimensionar a imagem a cada rerun.
+    """
+    key = (path, width)
+    with _lock:
+        if key not in _cache:
+            # O PIL só é importado na primeira vez
+            from PIL import Image
+
+            with Image.open(path) as image:
+                if image.width > width:
+                    height = round(image.height * width / image.width)
+                    image = image.resize((width, height), Image.LANCZOS)
+                buffer = io.BytesIO()
+                image.convert('RGB').save(buffer, format='JPEG', quality=95)
+            _cache[key] = buffer.getvalue()
+
+    return _cache[key]
@@ -0,0 +1,89 @@
+import os
+
+from utils import cube, distinct, filters, profiles, timeindex
+from utils.loader import DATASET_PATH, cached
+
+# Backend das consultas das páginas: 'pandas' (em memória) ou 'sqlite'
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'pandas')
+
+BACKENDS = ['pandas', 'sqlite']
+
+
+def query_backend(backend=None):
+    """ Backend informado ou o configurado em QUERY_BACKEND """
+    backend = backend or QUERY_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f'Backend de consultas desconhecido: {backend}')
+
+    return backend
+
+
+def load_filter_index(path=DATASET_PATH, backend=None):
+    """ Esta função tem a responsabilidade de carregar o índice das linhas
+
+        Com o backend 'pandas' é o FilterIndex sobre o dataset em memória;
+        com 'sqlite' os filtros viram consultas ao banco
+        (utils.sqlite_backend). Os dois têm o mesmo método filter.
+    """
+    if query_backend(backend) == 'sqlite':
+        from utils.sqlite_backend import SqliteFilterIndex, load_database
+        return SqliteFilterIndex(load_database(path))
+
+    return filters.load_filter_index(path)
+
+
+def load_cube_index(path=DATASET_PATH, backend=None):
+    """ Esta função tem a responsabilidade de carregar o índice do cubo
+
+        Ver load_filter_index. Os dois backends retornam o mesmo cubo
+        filtrado.
+    """
+    if query_backend(backend) == 'sqlite':
+        from utils.sqlite_backend import SqliteCubeIndex, load_database
+        return SqliteCubeIndex(load_database(path))
+
+    return cube.load_cube_index(path)
+
+
+def load_distinct_index(path=DATASET_PATH, backend=None):
+    """ Esta função tem a responsabilidade de carregar o índice de
+        entregadores distintos
+
+        Ver load_filter_index. Os dois backends têm o mesmo método count.
+    """
+    if query_backend(backend) == 'sqlite':
+        from utils.sqlite_backend import SqliteDistinctIndex, load_database
+        return SqliteDistinctIndex(load_database(path))
+
+    return distinct.load_distinct_index(path)
+
+
+def load_time_index(path=DATASET_PATH, backend=None):
+    """ Esta função tem a responsabilidade de carregar o índice de tempo
+        (utils.timeindex.TimeIndex)
+
+        Com o backend 'sqlite' o cubo usado para montar o índice vem de um
+        GROUP BY no banco, feito uma vez por versão do dataset.
+    """
+    if query_backend(backend) == 'sqlite':
+        from utils.sqlite_backend import SqliteCubeIndex, load_database
+        return cached(path, 'sqlite_time_index', lambda: timeindex.TimeIndex(
+            SqliteCubeIndex(load_database(path)).cube()))
+
+    return timeindex.load_time_index(path)
+
+
+def load_profile_index(path=DATASET_PATH, backend=None):
+    """ Esta função tem a responsabilidade de carregar o índice de
+        entregadores (utils.profiles.ProfileIndex)
+
+        Com o backend 'sqlite' os resumos vêm de GROUP BY no banco, uma vez
+        por versão do dataset, e os pedidos de cada entregador são
+        consultados na busca (utils.sqlite_backend.SqliteProfileIndex).
+    """
+    if query_backend(backend) == 'sqlite':
+        from utils.sqlite_backend import SqliteProfileIndex, load_database
+        return cached(path, 'sqlite_profile_index',
+                      lambda: SqliteProfileIndex(load_database(path)))
+
+    return profiles.load_profile_index(path)
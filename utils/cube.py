@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+from utils.features import FEATURES, compute_feature, with_features
+from utils.filters import FilterIndex
+from utils.loader import DATASET_PATH, cached, dataset_delta, ingest_mode, load_features
+from utils.schema import apply_schema
+
+# Dimensões do cubo: cada linha do cubo é uma combinação observada,
+# inclusive com dimensões vazias
+DIMENSIONS = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions',
+              'Festival', 'Type_of_order', 'Type_of_vehicle']
+
+# Medidas guardadas como contagem, soma e soma dos quadrados
+MEASURES = ['Time_taken(min)', 'distance', 'Delivery_person_Ratings']
+
+# Medidas que são colunas derivadas (utils.features)
+CUBE_FEATURES = [col for col in MEASURES if col in FEATURES]
+
+
+def build_cube(df1):
+    """ Esta função tem a responsabilidade de pré-agregar os pedidos
+
+        Agrupa o dataset pelas DIMENSIONS e guarda, para cada combinação:
+        1. 'count' - Quantidade de pedidos.
+        2. '<medida>_sum' - Soma da medida.
+        3. '<medida>_sumsq' - Soma dos quadrados da medida.
+        4. 'order_week' - Semana do ano, derivada de Order_Date.
+
+        Média e desvio padrão de qualquer agrupamento podem ser recalculados
+        a partir desses momentos com cube_stats.
+    """
+    df1 = with_features(df1, CUBE_FEATURES)
+    aux = df1.loc[:, DIMENSIONS].copy()
+    aux['count'] = 1
+    for col in MEASURES:
+        values = df1[col].astype('float64')
+        aux[f'{col}_sum'] = values
+        aux[f'{col}_sumsq'] = values ** 2
+
+    return _add_week(_sum_by_dimensions(aux))
+
+
+def merge_cubes(cubes):
+    """ Esta função tem a responsabilidade de juntar cubos parciais
+
+        Soma os momentos de cubos montados sobre partes diferentes do
+        dataset (ex.: blocos do CSV). O resultado é o mesmo cubo que
+        build_cube geraria com o dataset inteiro.
+    """
+    aux = pd.concat([cube.drop(columns='order_week') for cube in cubes],
+                    ignore_index=True)
+    # Blocos diferentes podem ter categorias diferentes: unifica os tipos
+    aux = apply_schema(aux)
+
+    return _add_week(_sum_by_dimensions(aux))
+
+
+def _sum_by_dimensions(aux):
+    """ Esta função tem a responsabilidade de somar por DIMENSIONS
+
+        O groupby do pandas descarta as linhas com dimensão vazia (em
+        category, até com dropna=False), e o cubo precisa de todos os
+        pedidos: as contagens por dia, por exemplo, incluem pedidos sem
+        Festival. As colunas category são agrupadas pelos códigos (-1 para
+        vazio), que voltam a ser categorias no final.
+    """
+    categorical = [col for col in DIMENSIONS if isinstance(aux[col].dtype, pd.CategoricalDtype)]
+    keys = [aux[col].cat.codes.rename(col) if col in categorical else aux[col]
+            for col in DIMENSIONS]
+    cube = aux.drop(columns=DIMENSIONS).groupby(keys, dropna=False).sum().reset_index()
+    for col in categorical:
+        cube[col] = pd.Categorical.from_codes(cube[col], dtype=aux[col].dtype)
+
+    return cube
+
+
+def _add_week(cube):
+    cube.insert(1, 'order_week', compute_feature(cube, 'order_week'))
+
+    return cube
+
+
+def load_cube(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de carregar o cubo do dataset
+
+        O cubo é montado uma vez por processo e atualizado junto com o
+        dataset quando o CSV muda: se o CSV só ganhou linhas, o cubo das
+        linhas novas é somado ao atual (merge_cubes). No modo de ingestão
+        'stream' o cubo vem dos agregados em blocos (utils.stream).
+    """
+    if ingest_mode() == 'stream':
+        from utils.stream import load_aggregates
+        return load_aggregates(path)['cube']
+
+    df1 = load_features(path, CUBE_FEATURES)
+
+    def update(cube, old_key):
+        # CSV cresceu por append: soma só o cubo das linhas novas
+        new = dataset_delta(path, old_key)
+        if new is None:
+            return None
+        if len(new) == 0:
+            return cube
+        return merge_cubes([cube, build_cube(new)])
+
+    return cached(path, 'cube', lambda: build_cube(df1), update)
+
+
+def load_cube_index(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de carregar o índice de filtros
+        do cubo (ver utils.filters.FilterIndex)
+    """
+    return cached(path, 'cube_index', lambda: FilterIndex(load_cube(path)))
+
+
+def cube_count(cube, by):
+    """ Esta função tem a responsabilidade de contar os pedidos por grupo
+
+        Retorna uma Series com a quantidade de pedidos, ordenada por 'by'.
+    """
+    return cube.groupby(by, observed=True)['count'].sum().sort_index()
+
+
+def cube_stats(cube, by, col):
+    """ Esta função tem a responsabilidade de calcular média e desvio padrão
+
+        Usa os momentos do cubo (contagem, soma e soma dos quadrados) da
+        medida 'col' agrupados por 'by'. O desvio padrão é o amostral
+        (ddof=1), como em pandas, e fica NaN para grupos com um pedido.
+        Retorna as colunas 'count', 'mean' e 'std', ordenadas por 'by'.
+    """
+    aux = (cube.groupby(by, observed=True)[['count', f'{col}_sum', f'{col}_sumsq']]
+               .sum()
+               .sort_index())
+    n = aux['count']
+    mean = aux[f'{col}_sum'] / n
+    var = (aux[f'{col}_sumsq'] - n * mean ** 2) / (n - 1).where(n > 1)
+
+    return pd.DataFrame({'count': n,
+                         'mean': mean,
+                         'std': np.sqrt(var.clip(lower=0))})
@@ -0,0 +1,298 @@
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.features import compute_feature
+from utils.filters import FilterIndex
+from utils.loader import DATASET_PATH, cached, dataset_delta, ingest_mode, load_dataset
+from utils.schema import concat_frames, decode_categories
+
+# Células dos contadores distintos: uma por dia, cidade, trânsito e clima
+CELL_KEYS = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions']
+
+# Precisão do HyperLogLog: 2 ** precisão registradores (bytes) por célula.
+# O erro padrão da estimativa é ~1.04 / sqrt(2 ** precisão): 3.2% com 10
+HLL_PRECISION = int(os.environ.get('DISTINCT_HLL_PRECISION', 10))
+
+METHODS = ['exact', 'hll']
+
+# Células por bloco ao montar os registradores HLL a partir dos bitsets
+HLL_BLOCK = 4096
+
+
+def hll_alpha(m):
+    """ Constante de correção do estimador HyperLogLog para m registradores """
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+
+    return 0.7213 / (1 + 1.079 / m)
+
+
+def hll_estimate(registers):
+    """ Esta função tem a responsabilidade de estimar a cardinalidade
+
+        Usa o estimador do HyperLogLog com a correção para cardinalidades
+        pequenas (linear counting quando ainda há registradores zerados).
+    """
+    m = len(registers)
+    estimate = hll_alpha(m) * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)
+
+    return int(round(estimate))
+
+
+def hll_hash(values, precision=HLL_PRECISION):
+    """ Esta função tem a responsabilidade de posicionar valores no HLL
+
+        Cada valor recebe um hash de 64 bits (pd.util.hash_array, que não
+        depende da sessão). Os primeiros 'precision' bits escolhem o
+        registrador e o rank é a posição do primeiro bit 1 no restante.
+        Retorna (registradores, ranks).
+    """
+    hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+    width = 64 - precision
+    registers = (hashes >> np.uint64(width)).astype(np.int64)
+    rest = hashes & np.uint64((1 << width) - 1)
+    ranks = [width - int(value).bit_length() + 1 for value in rest]
+
+    return registers, np.array(ranks, dtype=np.uint8)
+
+
+def cell_codes(df1, keys=CELL_KEYS):
+    """ Esta função tem a responsabilidade de numerar as células
+
+        Cada coluna de keys é fatorada separadamente e os códigos são
+        combinados em um inteiro, sem montar tuplas em Python. Retorna (a
+        célula de cada linha, dataframe com as chaves de cada célula).
+    """
+    combined = np.zeros(len(df1), dtype=np.int64)
+    for col in keys:
+        codes, uniques = pd.factorize(df1[col], use_na_sentinel=False)
+        combined = combined * len(uniques) + codes
+
+    cell_ids, uniques = pd.factorize(combined)
+    # Primeira linha de cada célula: os códigos do factorize aparecem em
+    # ordem crescente, então basta descartar as repetições (sem ordenar)
+    first = pd.Series(cell_ids).drop_duplicates().index.to_numpy()
+    cells = df1.loc[:, keys].iloc[first].reset_index(drop=True)
+
+    return cell_ids, cells
+
+
+def match_cells(cells, new_cells, keys=CELL_KEYS):
+    """ Esta função tem a responsabilidade de localizar células já numeradas
+
+        Retorna, para cada linha de new_cells, a posição da célula com as
+        mesmas chaves em cells, ou -1 se ela ainda não existe. As chaves
+        são comparadas como texto, então as categorias dos dois dataframes
+        podem ser diferentes.
+    """
+    known = pd.MultiIndex.from_frame(decode_categories(cells.loc[:, keys]))
+
+    return known.get_indexer(pd.MultiIndex.from_frame(decode_categories(new_cells.loc[:, keys])))
+
+
+def value_pairs(cell_ids, ids, size):
+    """ Esta função tem a responsabilidade de listar os pares distintos
+
+        Retorna (células, valores) com um par por valor distinto de cada
+        célula, em ordem. Linhas sem valor (código -1) ficam de fora; só os
+        pares distintos são ordenados, não as linhas.
+    """
+    keep = ids >= 0
+    pairs = np.sort(pd.unique(cell_ids[keep].astype(np.int64) * size + ids[keep]))
+
+    return np.divmod(pairs, size)
+
+
+def set_bits(bitsets, pair_cells, pair_ids):
+    """ Esta função tem a responsabilidade de gravar os pares nos bitsets
+
+        Mesmo layout do np.packbits: o bit do valor i é o (7 - i % 8) do
+        byte i // 8. Os pares estão ordenados, então os bits de cada byte
+        são vizinhos e um OR por grupo (reduceat) monta o byte, que é
+        somado (OR) ao que já está em bitsets.
+    """
+    if len(pair_cells) == 0:
+        return
+
+    width = bitsets.shape[1]
+    positions = pair_cells * width + (pair_ids >> 3)
+    starts = np.flatnonzero(np.r_[True, positions[1:] != positions[:-1]])
+    bits = (0x80 >> (pair_ids & 7)).astype(np.uint8)
+    flat = bitsets.reshape(-1)
+    flat[positions[starts]] |= np.bitwise_or.reduceat(bits, starts)
+
+
+class DistinctIndex:
+    """ Contagem de valores distintos (ex.: entregadores) por filtro
+
+        Contagens distintas não somam entre células do cubo, então para
+        cada célula (CELL_KEYS) são guardados:
+        1. Um bitset exato dos valores presentes, sobre a codificação densa
+           (códigos da categoria) da coluna. Os bits são gravados direto no
+           array compactado, sem a matriz células x valores.
+        2. Um sketch HyperLogLog com 2 ** precision registradores, montado
+           a partir dos bitsets só na primeira contagem com method='hll'.
+
+        Um filtro da sidebar vira um conjunto de células (FilterIndex sobre
+        as células) e a contagem é a união delas: OR dos bitsets ou máximo
+        dos registradores, sem varrer os pedidos.
+    """
+
+    def __init__(self, df1, col='Delivery_person_ID', precision=HLL_PRECISION):
+        values = df1[col].astype('category')
+        ids = values.cat.codes.to_numpy()
+        cell_ids, cells = cell_codes(df1)
+        size = len(values.cat.categories)
+        pair_cells, pair_ids = value_pairs(cell_ids, ids, size)
+
+        self.col = col
+        self.precision = precision
+        self.categories = values.cat.categories
+        self.bitsets = np.zeros((len(cells), (size + 7) // 8), dtype=np.uint8)
+        set_bits(self.bitsets, pair_cells, pair_ids)
+        self._registers = None
+
+        cells['order_week'] = compute_feature(cells, 'order_week')
+        cells['cell'] = np.arange(len(cells))
+        self.index = FilterIndex(cells, columns=CELL_KEYS[1:])
+
+    def add(self, df1):
+        """ Esta função tem a responsabilidade de somar pedidos novos
+
+            Retorna um novo índice com os pedidos de df1 (ex.: as linhas
+            acrescentadas ao CSV, ver loader.dataset_delta): só os pares
+            (célula, valor) delas são gravados, e células e valores que
+            ainda não existiam entram no fim. O custo depende das linhas
+            novas e do tamanho do índice, não do histórico de pedidos. O
+            índice atual não é alterado (outras sessões podem estar lendo).
+        """
+        if len(df1) == 0:
+            return self
+
+        values = df1[self.col].astype(object)
+        categories = self.categories.append(
+            pd.Index(values.dropna().unique()).difference(self.categories))
+        ids = categories.get_indexer(values)
+
+        cell_ids, cells = cell_codes(df1)
+        known = self.index.df
+        positions = match_cells(known, cells)
+        missing = positions < 0
+        positions[missing] = len(known) + np.arange(int(missing.sum()))
+        pair_cells, pair_ids = value_pairs(positions[cell_ids], ids, len(categories))
+
+        index = copy.copy(self)
+        index.categories = categories
+        index.bitsets = np.zeros((len(known) + int(missing.sum()), (len(categories) + 7) // 8),
+                                 dtype=np.uint8)
+        index.bitsets[:len(known), :self.bitsets.shape[1]] = self.bitsets
+        set_bits(index.bitsets, pair_cells, pair_ids)
+        index._registers = None
+
+        if missing.any():
+            added = cells.loc[missing].reset_index(drop=True)
+            added['order_week'] = compute_feature(added, 'order_week')
+            added['cell'] = positions[missing]
+            index.index = FilterIndex(concat_frames([known, added]).reset_index(drop=True),
+                                      columns=CELL_KEYS[1:])
+
+        return index
+
+    @property
+    def registers(self):
+        """ Esta função tem a responsabilidade de montar os sketches HLL
+
+            Calculados uma vez, na primeira contagem aproximada, a partir
+            dos bitsets (em blocos de células, para não abrir a matriz
+            inteira).
+        """
+        if self._registers is None:
+            id_registers, id_ranks = hll_hash(self.categories, self.precision)
+            registers = np.zeros((len(self.bitsets), 1 << self.precision), dtype=np.uint8)
+            for first in range(0, len(self.bitsets), HLL_BLOCK):
+                present = np.unpackbits(self.bitsets[first:first + HLL_BLOCK], axis=1,
+                                        count=len(self.categories))
+                pair_cells, pair_ids = np.nonzero(present)
+                np.maximum.at(registers, (first + pair_cells, id_registers[pair_ids]),
+                              id_ranks[pair_ids])
+            self._registers = registers
+
+        return self._registers
+
+    def cells(self, date_limit, selections):
+        """ Esta função tem a responsabilidade de selecionar as células
+
+            Mesmos argumentos de FilterIndex.rows. Retorna as células
+            selecionadas, ordenadas por Order_Date.
+        """
+        return self.index.filter(date_limit, selections)
+
+    def union(self, cells, method='exact'):
+        """ Une as células informadas e retorna a contagem distinta """
+        if method not in METHODS:
+            raise ValueError(f'Método de contagem desconhecido: {method}')
+
+        rows = cells['cell'].to_numpy()
+        if len(rows) == 0:
+            return 0
+        if method == 'exact':
+            return int(np.unpackbits(np.bitwise_or.reduce(self.bitsets[rows])).sum())
+
+        return hll_estimate(np.maximum.reduce(self.registers[rows]))
+
+    def count(self, date_limit, selections, method='exact', by=None):
+        """ Esta função tem a responsabilidade de contar valores distintos
+
+            Retorna a quantidade de valores distintos de self.col nos
+            pedidos que passam pelos filtros. Com by (ex.: 'order_week'),
+            retorna uma Series com a contagem por valor de by.
+            method: 'exact' (bitsets) ou 'hll' (HyperLogLog, aproximado).
+        """
+        cells = self.cells(date_limit, selections)
+        if by is None:
+            return self.union(cells, method)
+
+        groups = cells.groupby(by, observed=True, sort=True)
+        counts = [(key, self.union(group, method)) for key, group in groups]
+
+        return pd.Series([count for _, count in counts],
+                         index=pd.Index([key for key, _ in counts],
+                                        dtype=cells[by].dtype, name=by),
+                         name=self.col, dtype='int64')
+
+
+def load_distinct_index(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de carregar o índice de
+        entregadores distintos do dataset
+
+        Se o CSV só ganhou linhas, o índice é atualizado com elas
+        (DistinctIndex.add). No modo de ingestão 'stream' o índice é
+        montado com os pares únicos (célula, entregador) dos agregados em
+        blocos (utils.stream): as contagens são as mesmas e o dataset não
+        é carregado.
+    """
+    if ingest_mode() == 'stream':
+        from utils.stream import load_aggregates
+        return cached(path, 'distinct_index',
+                      lambda: DistinctIndex(load_aggregates(path)['cell_deliverers']))
+
+    df1 = load_dataset(path)
+
+    def update(index, old_key):
+        # CSV cresceu por append: grava só os pares das linhas novas
+        new = dataset_delta(path, old_key)
+        if new is None:
+            return None
+        return index.add(new)
+
+    return cached(path, 'distinct_index', lambda: DistinctIndex(df1), update)
@@ -0,0 +1,67 @@
+import pandas as pd
+
+from utils.geo import haversine_np
+
+# Registro das colunas derivadas: {nome: (colunas de entrada, função)}
+FEATURES = {}
+
+
+def feature(name, inputs):
+    """ Esta função tem a responsabilidade de registrar uma coluna derivada
+
+        Decorator: a função decorada recebe o dataframe (com as colunas em
+        inputs) e retorna os valores da coluna, de forma vetorizada.
+    """
+    def register(func):
+        FEATURES[name] = (list(inputs), func)
+        return func
+
+    return register
+
+
+@feature('distance', ['Restaurant_latitude', 'Restaurant_longitude',
+                      'Delivery_location_latitude', 'Delivery_location_longitude'])
+def distance(df1):
+    """ Distancia em quilometros entre o restaurante e o local de entrega """
+    return haversine_np(df1['Restaurant_latitude'],
+                        df1['Restaurant_longitude'],
+                        df1['Delivery_location_latitude'],
+                        df1['Delivery_location_longitude'])
+
+
+@feature('order_week', ['Order_Date'])
+def order_week(df1):
+    """ Semana do ano em que o pedido foi realizado """
+    return df1['Order_Date'].dt.isocalendar().week.astype('UInt8')
+
+
+def compute_feature(df1, name):
+    """ Esta função tem a responsabilidade de calcular uma coluna derivada
+
+        Retorna uma Series com o mesmo índice de df1. Levanta KeyError se a
+        coluna não está registrada ou se faltam colunas de entrada.
+    """
+    if name not in FEATURES:
+        raise KeyError(f'Coluna derivada desconhecida: {name}')
+
+    inputs, func = FEATURES[name]
+    missing = [col for col in inputs if col not in df1]
+    if missing:
+        raise KeyError(f'{name} precisa das colunas {missing}')
+
+    return pd.Series(func(df1), index=df1.index, name=name)
+
+
+def with_features(df1, names, compute=compute_feature):
+    """ Esta função tem a responsabilidade de juntar colunas derivadas
+
+        Retorna df1 com as colunas de names que ainda não existem nele,
+        calculadas por compute(df1, nome). As colunas de df1 não são
+        copiadas; se nada falta, o próprio df1 é retornado.
+    """
+    missing = [name for name in names if name not in df1]
+    if not missing:
+        return df1
+
+    return pd.concat([df1] + [compute(df1, name) for name in missing],
+                     axis=1, copy=False)
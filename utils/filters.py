@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+from utils.loader import DATASET_PATH, cached, load_dataset
+
+# Colunas usadas nos filtros da sidebar das páginas
+FILTER_COLUMNS = ['Road_traffic_density', 'City', 'Weatherconditions']
+
+
+def date_bounds(date_range):
+    """ Esta função tem a responsabilidade de normalizar o filtro de datas
+
+        Aceita só a data limite (como o slider antigo) ou o par (data
+        inicial, data limite) do slider de período. Retorna (início ou
+        None, limite) como pd.Timestamp: os pedidos selecionados têm
+        Order_Date >= início e Order_Date < limite.
+    """
+    if isinstance(date_range, (tuple, list)):
+        start, end = date_range
+        return pd.Timestamp(start), pd.Timestamp(end)
+
+    return None, pd.Timestamp(date_range)
+
+
+class FilterIndex:
+    """ Índice para os filtros da sidebar
+
+        Montado uma vez por dataset:
+        1. É guardada a ordem das linhas por Order_Date (self.order), então
+           o filtro de data limite vira um searchsorted (um prefixo dessa
+           ordem). O dataframe não é copiado: self.df é o mesmo do cache e
+           só as linhas filtradas são copiadas, no iloc final.
+        2. Para cada valor das colunas em FILTER_COLUMNS é guardado um
+           bitmap (np.packbits) das linhas, na ordem por data, com aquele
+           valor.
+
+        Uma seleção vira um OR dos bitmaps dos valores escolhidos em cada
+        coluna e um AND entre as colunas, restrito ao prefixo de datas.
+        O resultado é um único array de posições e um único iloc.
+    """
+
+    def __init__(self, df1, columns=FILTER_COLUMNS, date_col='Order_Date'):
+        dates = df1[date_col].to_numpy()
+        order = np.argsort(dates, kind='stable')
+        self.df = df1
+        # Dataset já ordenado (ex.: o cubo): as posições valem direto
+        self.order = None if np.array_equal(order, np.arange(len(order))) else order
+        self.dates = dates if self.order is None else dates[order]
+        self.bitmaps = {}
+
+        for col in columns:
+            values = df1[col].astype('category')
+            codes = values.cat.codes.to_numpy()
+            if self.order is not None:
+                codes = codes[order]
+            self.bitmaps[col] = {value: np.packbits(codes == code)
+                                 for code, value in enumerate(values.cat.categories)}
+
+    def __len__(self):
+        return len(self.df)
+
+    def rows(self, date_limit, selections):
+        """ Esta função tem a responsabilidade de selecionar as linhas
+
+            Retorna as posições, na ordem por data (ver positions), das
+            linhas com Order_Date anterior a date_limit e com valores nas seleções informadas,
+            ex.: {'City': ['Urban'], 'Road_traffic_density': ['Low', 'Jam']}.
+            date_limit também pode ser um período (início, limite), ver
+            date_bounds.
+        """
+        start, end = date_bounds(date_limit)
+        cut = int(np.searchsorted(self.dates, end.to_datetime64(), side='left'))
+        first = 0
+        if start is not None:
+            first = min(int(np.searchsorted(self.dates, start.to_datetime64(),
+                                            side='left')), cut)
+        nbytes = (cut + 7) // 8
+        mask = None
+
+        for col, values in selections.items():
+            # Mesmo com todos os valores selecionados o OR é feito: linhas
+            # sem valor ficam de fora, como no isin e no IN do SQLite
+            bitmaps = self.bitmaps[col]
+            col_mask = np.zeros(nbytes, dtype=np.uint8)
+            for value in values:
+                if value in bitmaps:
+                    col_mask |= bitmaps[value][:nbytes]
+
+            mask = col_mask if mask is None else mask & col_mask
+
+        if mask is None:
+            return np.arange(first, cut)
+
+        rows = np.flatnonzero(np.unpackbits(mask, count=cut))
+
+        return rows[np.searchsorted(rows, first):]
+
+    def positions(self, rows):
+        """ Posições em self.df das linhas retornadas por rows """
+        return rows if self.order is None else self.order[rows]
+
+    def filter(self, date_limit, selections, columns=None):
+        """ Esta função tem a responsabilidade de aplicar os filtros
+
+            Retorna o dataframe filtrado (ou só as colunas informadas),
+            ordenado por Order_Date.
+        """
+        rows = self.positions(self.rows(date_limit, selections))
+        if columns is None:
+            return self.df.iloc[rows]
+
+        return self.df.iloc[rows, self.df.columns.get_indexer(columns)]
+
+    def group_mean(self, date_limit, selections, by, col):
+        """ Esta função tem a responsabilidade de calcular médias por grupo
+
+            Retorna a média de col nas linhas filtradas por grupo das
+            colunas by (lista), ordenada pelo índice. Grupos com chave
+            ausente ficam de fora, como no groupby do pandas.
+        """
+        df1 = self.filter(date_limit, selections, by + [col])
+
+        return df1.groupby(by, observed=True)[col].mean().sort_index()
+
+    def extremes(self, date_limit, selections, columns):
+        """ Esta função tem a responsabilidade de calcular mínimos e máximos
+
+            Retorna um dataframe com as linhas 'min' e 'max' das colunas
+            informadas, nas linhas filtradas.
+        """
+        return self.filter(date_limit, selections, columns).agg(['min', 'max'])
+
+
+def load_filter_index(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de carregar o índice do dataset """
+    return cached(path, 'filter_index', lambda: FilterIndex(load_dataset(path)))
@@ -0,0 +1,650 @@
+import glob
+import hashlib
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils.perf import timed
+from utils.schema import compact_dataset, concat_frames
+from utils.features import compute_feature, with_features
+from utils.transform import clean_code, read_dataset
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow vem junto com o streamlit
+    pa = None
+
+# Um CSV, um diretório com CSVs ou um glob (ex.: 'exports/*/pedidos_*.csv')
+DATASET_PATH = os.environ.get('DATASET_PATH', 'dataset/train.csv')
+
+# Processos usados para ingerir vários CSVs em paralelo (padrão: um por CPU)
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 0)) or os.cpu_count() or 1
+
+# Ingestão do cubo e dos índices derivados dele: 'full' (a partir do
+# dataset em memória) ou 'stream' (CSV lido em blocos, ver utils.stream).
+# O modo 'stream' cobre só o cubo, o índice de tempo e o de entregadores
+# distintos: os pedidos da página 2, o mapa e o índice de entregadores
+# (utils.profiles) ainda carregam o dataset inteiro
+INGEST_MODE = os.environ.get('INGEST_MODE', 'full')
+
+INGEST_MODES = ['full', 'stream']
+
+# Arquivos de append do cache colunar antes de ele ser regravado inteiro
+CACHE_SEGMENTS = 16
+
+# Versão do formato do cache em disco. Deve ser incrementada sempre que
+# clean_code, utils.schema ou o cubo mudarem o resultado (os snapshots de
+# utils.snapshot também são invalidados por ela).
+CACHE_VERSION = '8'
+
+# Cache do processo: {(caminho absoluto, nome): (chave, objeto)}. O lock
+# global só protege os dicionários; cada objeto é construído sob o seu
+# próprio lock (ver cached)
+_cache = {}
+_lock = threading.RLock()
+_build_locks = {}
+
+# Bytes do CSV já ingeridos pelo dataset em cache: {caminho absoluto: source}
+_sources = {}
+
+# Última ingestão incremental: {caminho absoluto: (chave anterior, linhas novas)}
+_deltas = {}
+
+# sha1 do conteúdo de cada versão do dataset: {dataset_key: sha1}
+_digests = {}
+
+
+def ingest_mode():
+    """ Modo de ingestão configurado em INGEST_MODE """
+    if INGEST_MODE not in INGEST_MODES:
+        raise ValueError(f'Modo de ingestão desconhecido: {INGEST_MODE}')
+
+    return INGEST_MODE
+
+
+def is_multi_file(path):
+    """ Indica se path é um diretório ou um glob, e não um único CSV """
+    return os.path.isdir(path) or glob.has_magic(path)
+
+
+def source_files(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de listar os CSVs do dataset
+
+        Um diretório vira todos os *.csv dentro dele e um glob os arquivos
+        que casam com ele, em ordem alfabética, que é a ordem das linhas no
+        dataset. Um caminho comum é o próprio arquivo.
+    """
+    if not is_multi_file(path):
+        return [path]
+
+    pattern = os.path.join(path, '*.csv') if os.path.isdir(path) else path
+    files = sorted(f for f in glob.glob(pattern) if os.path.isfile(f))
+    if not files:
+        raise FileNotFoundError(f'Nenhum CSV encontrado em {path}')
+
+    return files
+
+
+def dataset_key(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de identificar a versão do arquivo
+
+        A chave é formada por (caminho absoluto, mtime, tamanho), então
+        qualquer alteração no CSV gera uma chave nova. Para um diretório ou
+        glob, mtime e tamanho são tuplas com um item por arquivo, então
+        arquivos novos, removidos ou alterados também geram uma chave nova.
+    """
+    if is_multi_file(path):
+        stats = [(f, os.stat(f)) for f in source_files(path)]
+        return (os.path.abspath(path),
+                tuple((os.path.abspath(f), stat.st_mtime_ns) for f, stat in stats),
+                tuple(stat.st_size for _, stat in stats))
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def dataset_digest(key):
+    """ Esta função tem a responsabilidade de identificar o conteúdo do
+        dataset
+
+        key é o resultado de dataset_key. Retorna o sha1 do CSV (para um
+        diretório ou glob, o sha1 dos sha1 de cada arquivo, em ordem), que
+        não muda com checkout ou cópia para outra máquina, ao contrário do
+        mtime da chave. É calculado uma vez por versão do dataset; se o CSV
+        já foi ingerido por inteiro, vem do sha1 guardado pelo loader.
+    """
+    digest = _digests.get(key)
+    if digest is not None:
+        return digest
+
+    if isinstance(key[1], tuple):
+        combined = hashlib.sha1()
+        for path, _ in key[1]:
+            combined.update(prefix_digest(path).digest())
+        digest = combined.hexdigest()
+    else:
+        source = _sources.get(key[0], {})
+        if (source.get('source_size') == str(key[2])
+                and source.get('source_mtime_ns') == str(key[1])):
+            digest = source['source_sha1']
+        else:
+            digest = prefix_digest(key[0]).hexdigest()
+    _digests[key] = digest
+
+    return digest
+
+
+def cache_path(path=DATASET_PATH):
+    """ Caminho do cache colunar: dataset/train.csv -> dataset/train.feather """
+    return os.path.splitext(path)[0] + '.feather'
+
+
+def segment_paths(path=DATASET_PATH):
+    """ Arquivos de append do cache colunar, em ordem: dataset/train.1.feather, ... """
+    stem = os.path.splitext(path)[0]
+    segments = []
+    for target in glob.glob(glob.escape(stem) + '.*.feather'):
+        number = target[len(stem) + 1:-len('.feather')]
+        if number.isdigit():
+            segments.append((int(number), target))
+
+    return [target for _, target in sorted(segments)]
+
+
+def prefix_digest(path, size=None):
+    """ Esta função tem a responsabilidade de calcular o sha1 do arquivo
+
+        Considera só os primeiros 'size' bytes quando informado. Retorna o
+        objeto hashlib, que pode continuar sendo atualizado.
+    """
+    digest = hashlib.sha1()
+    remaining = size
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            block = f.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+
+    return digest
+
+
+def _source(size, mtime_ns, digest, rows):
+    """ Descrição dos bytes do CSV que geraram o dataset em cache
+
+        'source_size' é o offset até onde o CSV foi lido, 'source_sha1' o
+        sha1 desses bytes e 'source_rows' a quantidade de linhas de dados
+        (antes da limpeza) que eles contêm.
+    """
+    return {'cache_version': CACHE_VERSION,
+            'source_size': str(size),
+            'source_mtime_ns': str(mtime_ns),
+            'source_sha1': digest.hexdigest(),
+            'source_rows': str(rows)}
+
+
+def _cache_is_valid(source, path):
+    """ Esta função tem a responsabilidade de validar o cache
+
+        O cache vale se foi gerado pela mesma versão do pipeline e a partir
+        do mesmo CSV. Tamanho e mtime iguais bastam; se só o mtime mudou
+        (ex.: checkout ou cópia no deploy) o sha1 do CSV decide.
+    """
+    stat = os.stat(path)
+    if source.get('cache_version') != CACHE_VERSION:
+        return False
+    if source.get('source_size') != str(stat.st_size):
+        return False
+    if source.get('source_mtime_ns') == str(stat.st_mtime_ns):
+        return True
+
+    return source.get('source_sha1') == prefix_digest(path).hexdigest()
+
+
+def _read_feather(target):
+    """ Abre um arquivo do cache e devolve (pyarrow.Table ou None, source) """
+    try:
+        table = feather.read_table(target, memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        return None, {}
+
+    source = {k.decode(): v.decode()
+              for k, v in (table.schema.metadata or {}).items()
+              if k.startswith((b'cache_', b'source_'))}
+    if source.get('cache_version') != CACHE_VERSION:
+        return None, {}
+
+    return table, source
+
+
+def _read_cache_file(path):
+    """ Abre o cache colunar e devolve (pyarrow.Table ou None, source)
+
+        O cache é o arquivo base mais os arquivos de append (ver
+        append_cache), cada um com as linhas novas e o source do dataset
+        até ele. Um append só vale se continua o source anterior
+        ('cache_previous'); os seguintes a um append inválido são
+        ignorados. A tabela ainda não foi convertida (ver _to_frame): quem
+        chama valida o cache antes de pagar pela conversão.
+    """
+    target = cache_path(path)
+    if pa is None or not os.path.exists(target):
+        return None, {}
+
+    table, source = _read_feather(target)
+    if table is None:
+        return None, {}
+
+    tables = [table]
+    for segment in segment_paths(path):
+        part, part_source = _read_feather(segment)
+        if part is None or part_source.get('cache_previous') != source['source_sha1']:
+            break
+        tables.append(part)
+        source = part_source
+
+    if len(tables) > 1:
+        try:
+            table = pa.concat_tables(tables)
+        except pa.ArrowInvalid:
+            return None, {}
+
+    return table, source
+
+
+def _to_frame(df1):
+    """ Converte a tabela do cache para dataframe (dataframes passam direto)
+
+        Com split_blocks as colunas numéricas não são copiadas para um
+        bloco único: continuam apontando para o arquivo mapeado. Com
+        arquivos de append, as categorias novas vêm no fim do dicionário e
+        são reordenadas (ordem alfabética, como em utils.schema).
+    """
+    if pa is None or not isinstance(df1, pa.Table):
+        return df1
+
+    chunked = df1.column(0).num_chunks > 1 if df1.num_columns else False
+    df1 = df1.to_pandas(split_blocks=True)
+    if chunked:
+        for col in df1.columns:
+            if isinstance(df1[col].dtype, pd.CategoricalDtype):
+                categories = df1[col].cat.categories
+                if not categories.is_monotonic_increasing:
+                    df1[col] = df1[col].cat.reorder_categories(categories.sort_values())
+
+    return df1
+
+
+def read_cache(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de ler o cache colunar
+
+        O arquivo Feather é aberto com memory map e só é convertido para
+        dataframe se estiver em dia com o CSV. Retorna None quando o cache
+        não existe, está desatualizado ou o pyarrow não está disponível.
+    """
+    table, source = _read_cache_file(path)
+    if table is None or not _cache_is_valid(source, path):
+        return None
+
+    return _to_frame(table)
+
+
+def write_cache(df1, source, path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de gravar o cache colunar
+
+        'source' descreve os bytes do CSV que geraram df1 e vai junto nos
+        metadados do arquivo. O arquivo é gravado sem compressão, para o
+        memory map da leitura não precisar descompactar (cópia) as colunas.
+        A escrita é feita em um arquivo temporário e depois renomeada,
+        então um leitor nunca vê um cache pela metade.
+        Falhas de escrita (ex.: disco somente leitura) são ignoradas: o
+        cache é só uma otimização.
+    """
+    if pa is None:
+        return None
+
+    try:
+        # Os appends da versão anterior saem antes: um leitor no meio da
+        # troca vê só o base antigo, que continua consistente
+        for segment in segment_paths(path):
+            os.remove(segment)
+    except OSError:
+        return None
+
+    return _write_feather(pa.Table.from_pandas(df1, preserve_index=True), source,
+                          cache_path(path))
+
+
+def append_cache(df1, new, source, previous, path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de acrescentar linhas ao cache
+
+        Grava só as linhas novas (new) em um arquivo de append, com o
+        schema do cache atual e os metadados de 'source'; 'previous' é o
+        source que elas continuam. O arquivo base não é reescrito, então
+        um append custa as linhas novas e não o histórico. Depois de
+        CACHE_SEGMENTS appends, ou se o cache em disco não é o de
+        'previous', o dataset inteiro (df1) é regravado com write_cache.
+    """
+    if pa is None:
+        return None
+
+    segments = segment_paths(path)
+    cache, current = _read_cache_file(path)
+    # Todos os appends em disco precisam estar válidos e em sequência
+    if (cache is None or len(segments) >= CACHE_SEGMENTS
+            or current.get('cache_segment', '0') != str(len(segments))
+            or current.get('source_sha1') != previous.get('source_sha1')):
+        return write_cache(df1, source, path)
+
+    try:
+        table = pa.Table.from_pandas(new, schema=cache.schema, preserve_index=True)
+    except (KeyError, TypeError, ValueError, pa.ArrowInvalid):
+        return write_cache(df1, source, path)
+
+    number = len(segments) + 1
+    target = f'{os.path.splitext(path)[0]}.{number}.feather'
+    source = dict(source, cache_previous=previous['source_sha1'], cache_segment=str(number))
+
+    return _write_feather(table, source, target)
+
+
+def _write_feather(table, source, target):
+    """ Grava a tabela com os metadados de source (temporário + rename) """
+    tmp = f'{target}.{os.getpid()}.tmp'
+    try:
+        metadata = dict(table.schema.metadata or {})
+        metadata.update({k.encode(): v.encode() for k, v in source.items()})
+        feather.write_feather(table.replace_schema_metadata(metadata), tmp,
+                              compression='uncompressed')
+        os.replace(tmp, target)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+
+    return target
+
+
+def _build(path):
+    """ Lê o CSV inteiro e devolve (dataset tratado, source) """
+    mtime_ns = os.stat(path).st_mtime_ns
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    df = timed('load/read', read_dataset, io.BytesIO(data))
+    df1 = timed('load/clean_code', clean_code, df)
+    df1 = timed('load/apply_schema', compact_dataset, df1)
+
+    return df1, _source(len(data), mtime_ns, hashlib.sha1(data), len(df))
+
+
+def _append(path, df1, source):
+    """ Esta função tem a responsabilidade de ingerir só as linhas novas
+
+        Se o CSV atual é o CSV de 'source' com linhas a mais no final (mesmo
+        sha1 até o offset já ingerido, terminado em quebra de linha), lê só
+        as linhas completas depois do offset, aplica a limpeza nelas e
+        junta ao dataset. Retorna (dataset, source, linhas novas) ou None se
+        o começo do arquivo mudou e é preciso reconstruir tudo. df1 pode
+        ser a tabela do cache: só é convertida se as linhas forem juntadas.
+    """
+    offset = int(source.get('source_size', 0))
+    stat = os.stat(path)
+    if offset == 0 or stat.st_size <= offset:
+        return None
+
+    with open(path, 'rb') as f:
+        f.seek(offset - 1)
+        if f.read(1) != b'\n':
+            return None
+        data = f.read()
+
+    digest = prefix_digest(path, offset)
+    if digest.hexdigest() != source.get('source_sha1'):
+        return None
+
+    # Só linhas completas: uma linha sendo escrita fica para a próxima vez
+    data = data[:data.rfind(b'\n') + 1]
+    digest.update(data)
+
+    columns = pd.read_csv(path, nrows=0).columns
+    rows = int(source['source_rows'])
+    tail = timed('append/read', read_dataset, io.BytesIO(data), header=None, names=columns)
+    tail.index = pd.RangeIndex(rows, rows + len(tail))
+
+    new = timed('append/clean_code', clean_code, tail)
+    new = timed('append/apply_schema', compact_dataset, new)
+    df1 = _to_frame(df1)
+    if len(new):
+        df1 = concat_frames([df1, new])
+
+    return df1, _source(offset + len(data), stat.st_mtime_ns, digest, rows + len(tail)), new
+
+
+def _ingest(path, df1=None, source=None):
+    """ Esta função tem a responsabilidade de atualizar o dataset tratado
+
+        Parte do dataset já ingerido (df1/source) ou do cache em disco e:
+        1. Reaproveita o dataset se o CSV não mudou.
+        2. Ingere só as linhas novas se o CSV cresceu por append.
+        3. Reconstrói tudo a partir do CSV nos outros casos.
+        Retorna (dataset, source, linhas novas ou None se reconstruiu).
+    """
+    if df1 is None or not source:
+        df1, source = _read_cache_file(path)
+
+    if df1 is not None:
+        if _cache_is_valid(source, path):
+            df1 = _to_frame(df1)
+            return df1, source, df1.iloc[:0]
+
+        appended = _append(path, df1, source)
+        if appended is not None:
+            append_cache(appended[0], appended[2], appended[1], source, path)
+            return appended
+
+    df1, source = _build(path)
+    write_cache(df1, source, path)
+
+    return df1, source, None
+
+
+def _ingest_file(path):
+    """ Dataset tratado de um CSV e quantidade de linhas lidas dele
+
+        Roda nos processos do ProcessPoolExecutor de _ingest_files; usa o
+        cache colunar do próprio arquivo.
+    """
+    df1, source, _ = _ingest(path)
+
+    return df1, int(source['source_rows'])
+
+
+def _ingest_files(files, workers=None):
+    """ Esta função tem a responsabilidade de ingerir vários CSVs
+
+        Cada arquivo é lido, limpo e compactado (com o cache colunar dele)
+        em um ProcessPoolExecutor com até 'workers' processos. Os
+        resultados voltam na ordem de 'files' e são concatenados com
+        categorias unificadas (concat_frames). O índice continua de um
+        arquivo para o outro, então cada linha lida tem um rótulo único.
+    """
+    workers = min(workers or INGEST_WORKERS, len(files))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_ingest_file, files))
+    else:
+        results = [_ingest_file(f) for f in files]
+
+    frames = []
+    offset = 0
+    for df1, rows in results:
+        frames.append(df1.set_axis(df1.index + offset, axis=0))
+        offset += rows
+
+    return concat_frames(frames)
+
+
+def build_dataset(path=DATASET_PATH, workers=None):
+    """ Esta função tem a responsabilidade de gerar o dataset tratado
+
+        Lê o CSV, aplica clean_code, compacta os tipos (utils.schema) e
+        atualiza o cache colunar em disco. As colunas derivadas não fazem
+        parte do dataset base: ver load_features. Para um diretório ou glob
+        os arquivos são processados em paralelo (ver _ingest_files) e cada
+        um ganha o seu cache.
+    """
+    if is_multi_file(path):
+        return timed('load/ingest_files', _ingest_files, source_files(path), workers)
+
+    df1, source = _build(path)
+    write_cache(df1, source, path)
+
+    return df1
+
+
+def cached(path, name, build, update=None):
+    """ Esta função tem a responsabilidade de guardar objetos do processo
+
+        Guarda o resultado de build() com a chave do dataset (caminho,
+        mtime, tamanho) sob o nome informado. Serve para o dataset tratado
+        e para as estruturas derivadas dele (cubo, índices), que são
+        reconstruídas automaticamente quando o CSV muda.
+
+        Se 'update' for informado e houver um valor de uma versão anterior
+        do CSV, update(valor anterior, chave anterior) é tentado antes;
+        quando ele retorna None, o valor é reconstruído com build().
+    """
+    key = dataset_key(path)
+    cache_key = (key[0], name)
+
+    with _lock:
+        entry = _cache.get(cache_key)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        build_lock = _build_locks.setdefault(cache_key, threading.RLock())
+
+    # Só as sessões que pedem o mesmo objeto esperam pela construção; as
+    # outras continuam lendo o cache
+    with build_lock:
+        with _lock:
+            entry = _cache.get(cache_key)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        value = None
+        if entry is not None and update is not None:
+            value = timed(f'update/{name}', update, entry[1], entry[0])
+        if value is None:
+            value = timed(f'build/{name}', build)
+        with _lock:
+            _cache[cache_key] = (key, value)
+
+    return value
+
+
+def load_dataset(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de carregar o dataset tratado
+
+        O dataset vem do cache colunar quando ele está em dia com o CSV; se
+        o CSV só ganhou linhas no final, apenas elas são processadas; se
+        não, é reconstruído a partir do CSV. O resultado fica em cache no
+        processo enquanto o arquivo não mudar. Um diretório ou glob de CSVs
+        é ingerido em paralelo (ver build_dataset). O dataframe retornado é
+        compartilhado entre as sessões e não deve ser alterado in-place.
+    """
+    source_key = os.path.abspath(path)
+
+    if is_multi_file(path):
+        # Arquivos sem mudança vêm do cache colunar de cada um
+        return cached(path, 'dataset', lambda: build_dataset(path))
+
+    def build():
+        df1, _sources[source_key], _ = _ingest(path)
+        _deltas.pop(source_key, None)
+        return df1
+
+    def update(df1, old_key):
+        df1, _sources[source_key], new = _ingest(
+            path, df1, _sources.get(source_key))
+        _deltas[source_key] = (old_key, new)
+        return df1
+
+    return cached(path, 'dataset', build, update)
+
+
+def dataset_delta(path, old_key):
+    """ Esta função tem a responsabilidade de informar as linhas novas
+
+        Retorna as linhas (já tratadas) acrescentadas ao dataset desde a
+        versão old_key, se a última atualização foi incremental a partir
+        dela; senão None. Usada para atualizar estruturas derivadas (ex.: o
+        cubo) sem recalcular tudo.
+    """
+    with _lock:
+        entry = _deltas.get(os.path.abspath(path))
+
+    if entry is None or entry[0] != old_key:
+        return None
+
+    return entry[1]
+
+
+def load_feature(path, name):
+    """ Esta função tem a responsabilidade de carregar uma coluna derivada
+
+        A coluna (utils.features) é calculada na primeira vez que alguma
+        página pede por ela e fica em cache junto com o dataset. Se o CSV
+        só ganhou linhas, só as linhas novas são calculadas.
+    """
+    load_dataset(path)
+
+    def update(values, old_key):
+        new = dataset_delta(path, old_key)
+        if new is None:
+            return None
+        return pd.concat([values, compute_feature(new, name)])
+
+    return cached(path, f'feature/{name}',
+                  lambda: compute_feature(load_dataset(path), name), update)
+
+
+def load_features(path=DATASET_PATH, names=()):
+    """ Esta função tem a responsabilidade de carregar o dataset com as
+        colunas derivadas pedidas
+
+        Retorna o dataset base com as colunas de names (ver load_feature).
+        Cada página paga só pelas colunas que usa.
+    """
+    df1 = load_dataset(path)
+    names = list(names)
+
+    return cached(path, 'dataset+' + ','.join(names),
+                  lambda: with_features(df1, names, lambda _, name: load_feature(path, name)))
+
+
+def clear_cache():
+    """ Esta função tem a responsabilidade de esvaziar o cache do processo """
+    with _lock:
+        _cache.clear()
+        _sources.clear()
+        _deltas.clear()
+        _digests.clear()
+
+
+if __name__ == '__main__':
+    # Etapa de build: python -m utils.loader [dataset/train.csv | diretório | glob]
+    source = sys.argv[1] if len(sys.argv) > 1 else DATASET_PATH
+    df1 = build_dataset(source)
+    for path in source_files(source):
+        print(f'{cache_path(path)}')
+    print(f'{len(df1)} linhas')
@@ -0,0 +1,107 @@
+import numpy as np
+
+# Modos do mapa: {chave: rótulo exibido na página}
+MAP_MODES = {'medians': 'Medianas por cidade e trânsito',
+             'cluster': 'Pontos de entrega agrupados',
+             'heatmap': 'Mapa de calor'}
+
+# Limite de pontos enviados ao navegador nos modos 'cluster' e 'heatmap'
+MAX_POINTS = 50000
+
+LAT = 'Delivery_location_latitude'
+LON = 'Delivery_location_longitude'
+
+# Colunas usadas pelos mapas: só elas são filtradas para a visão geográfica
+MAP_COLUMNS = ['City', 'Road_traffic_density', LAT, LON]
+
+
+def sample_step(total, max_points=MAX_POINTS):
+    """ Esta função tem a responsabilidade de calcular o passo da amostra
+        de pontos: 1 até max_points, senão o menor passo que fica abaixo dele
+    """
+    return max(1, int(np.ceil(total / max_points)))
+
+
+def sample_size(df1, max_points=MAX_POINTS):
+    """ Esta função tem a responsabilidade de contar os pontos do mapa
+
+        Retorna (pontos exibidos, pedidos filtrados), usado na página para
+        avisar quando o mapa mostra só uma amostra (ver delivery_points).
+    """
+    total = len(df1)
+
+    return -(-total // sample_step(total, max_points)), total
+
+
+def delivery_points(df1, max_points=MAX_POINTS):
+    """ Esta função tem a responsabilidade de extrair os pontos de entrega
+
+        Retorna um array (n, 2) de [latitude, longitude] arredondado para 6
+        casas (~10 cm). Acima de max_points, é feita uma amostra com passo
+        fixo, para o resultado não depender de aleatoriedade.
+    """
+    points = np.column_stack([df1[LAT].to_numpy(dtype=np.float64),
+                              df1[LON].to_numpy(dtype=np.float64)])
+    step = sample_step(len(points), max_points)
+    if step > 1:
+        points = points[::step]
+
+    return np.round(points, 6)
+
+
+def median_points(df1):
+    """ Esta função tem a responsabilidade de calcular as medianas dos
+        pontos de entrega por cidade e tipo de trânsito
+    """
+    aux = df1.loc[:, MAP_COLUMNS].groupby(
+        ['City', 'Road_traffic_density'], observed=True).median()
+
+    return aux.loc[:, [LAT, LON]].to_numpy(dtype=np.float64)
+
+
+def build_map(df1, mode='medians'):
+    """ Esta função tem a responsabilidade de montar o mapa no modo pedido
+
+        Modos (ver MAP_MODES):
+        1. 'medians' - Um marcador por mediana de cidade/trânsito.
+        2. 'cluster' - Pontos de entrega com FastMarkerCluster (os
+           marcadores são criados no navegador, em JavaScript).
+        3. 'heatmap' - Mapa de calor dos pontos de entrega.
+    """
+    # O folium só é importado quando um mapa é montado (visão geográfica)
+    import folium
+    from folium.plugins import FastMarkerCluster, HeatMap
+
+    map = folium.Map()
+
+    if mode == 'medians':
+        for lat, lon in median_points(df1):
+            folium.Marker([lat, lon]).add_to(map)
+        return map
+
+    points = delivery_points(df1)
+    if mode == 'cluster':
+        FastMarkerCluster(points.tolist()).add_to(map)
+    elif mode == 'heatmap':
+        HeatMap(points.tolist(), radius=10).add_to(map)
+    else:
+        raise ValueError(f'Modo de mapa desconhecido: {mode}')
+
+    if len(points):
+        map.fit_bounds([points.min(axis=0).tolist(),
+                        points.max(axis=0).tolist()])
+
+    return map
+
+
+def map_html(df1, mode='medians'):
+    """ Esta função tem a responsabilidade de gerar o HTML do mapa
+
+        É o mesmo HTML que o folium_static envia ao navegador, então pode
+        ser guardado em cache (utils.memo) e reenviado sem montar o mapa.
+    """
+    import folium
+
+    fig = folium.Figure().add_child(build_map(df1, mode))
+
+    return fig.render()
@@ -0,0 +1,192 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.filters import date_bounds
+from utils.loader import DATASET_PATH, dataset_key
+from utils.perf import record, rows_of, rss_mb, timed
+from utils.snapshot import read_snapshot
+
+# Limite de memória do cache de gráficos, compartilhado por todas as sessões
+MAX_BYTES = int(os.environ.get('CHART_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+
+def size_of(value):
+    """ Esta função tem a responsabilidade de estimar o tamanho em bytes
+
+        Figuras do plotly são medidas pelo JSON que o streamlit envia ao
+        navegador; dataframes e series pelo memory_usage(deep=True); tuplas
+        pela soma dos seus itens; objetos com nbytes (tabelas do pyarrow e
+        utils.table.TableIndex) pelo próprio nbytes.
+    """
+    if isinstance(value, tuple):
+        return sum(size_of(item) for item in value)
+    if hasattr(value, 'to_plotly_json'):
+        # Só chega aqui com o plotly já carregado pela função do gráfico
+        import plotly.io as pio
+
+        return len(pio.to_json(value, validate=False))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """ Cache LRU limitado pela soma dos tamanhos em bytes dos valores
+
+        As entradas menos usadas são descartadas quando o total passa de
+        max_bytes. Os contadores de hits/misses ficam em stats().
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        with self.lock:
+            if nbytes > self.max_bytes:
+                return
+
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+
+            self.entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+
+            while self.nbytes > self.max_bytes:
+                _, (_, size) = self.entries.popitem(last=False)
+                self.nbytes -= size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': self.hits / total if total else 0.0,
+                    'evictions': self.evictions,
+                    'entries': len(self.entries),
+                    'bytes': self.nbytes,
+                    'max_bytes': self.max_bytes}
+
+
+chart_cache = LRUCache()
+
+
+def filter_state(date_limit, selections, path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de normalizar o estado dos filtros
+
+        Retorna uma tupla com a versão do dataset (caminho, mtime,
+        tamanho), o período de datas (ver filters.date_bounds) e as
+        seleções ordenadas, usada como parte
+        da chave do cache de gráficos.
+    """
+    return (dataset_key(path),
+            tuple(None if date is None else date.isoformat()
+                  for date in date_bounds(date_limit)),
+            tuple(sorted((col, tuple(sorted(values)))
+                         for col, values in selections.items())))
+
+
+class Deferred:
+    """ Dados que só são calculados quando alguém precisa deles
+
+        Usado nos dados filtrados passados ao memoize: quando o gráfico vem
+        do cache ou de um snapshot, o filtro nem é executado. O valor é
+        calculado uma vez, medido em utils.perf com o nome stage.
+    """
+
+    def __init__(self, stage, func, *args, **kwargs):
+        self.stage = stage
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.done = False
+        self.value = None
+
+    def __call__(self):
+        if not self.done:
+            self.value = timed(self.stage, self.func, *self.args, **self.kwargs)
+            self.done = True
+
+        return self.value
+
+
+def resolve(value):
+    """ O valor de um Deferred, ou o próprio valor """
+    return value() if isinstance(value, Deferred) else value
+
+
+def memoize(func, state, *args, **kwargs):
+    """ Esta função tem a responsabilidade de memorizar gráficos e tabelas
+
+        Retorna func(*args, **kwargs) do cache quando a mesma função já foi
+        chamada com o mesmo estado de filtros (ver filter_state) e os mesmos
+        kwargs. Os argumentos posicionais são os dados já filtrados e não
+        entram na chave; podem ser Deferred, calculados só se func rodar. No
+        modo snapshot (utils.snapshot) o valor pré-calculado é usado antes
+        de chamar func. O valor retornado é compartilhado entre as sessões
+        e não deve ser alterado. Cada chamada é registrada em utils.perf,
+        indicando se veio do cache.
+    """
+    key = (func.__code__.co_filename, func.__qualname__, state,
+           tuple(sorted(kwargs.items())))
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    value = chart_cache.get(key)
+    cached = value is not None
+    snapshot = False
+    if not cached:
+        value = read_snapshot(func, state, kwargs)
+        cached = snapshot = value is not None
+    if not cached:
+        args = tuple(resolve(arg) for arg in args)
+        value = func(*args, **kwargs)
+    if not cached or snapshot:
+        chart_cache.put(key, value, size_of(value))
+
+    stage = ', '.join(f'{k}={v}' for k, v in sorted(kwargs.items()))
+    record(f'chart/{func.__qualname__}({stage})', time.perf_counter() - start,
+           rows_in=rows_of(args[0]) if args else None,
+           rows_out=rows_of(value),
+           rss_delta_mb=None if rss_before is None else rss_mb() - rss_before,
+           cached=cached, snapshot=snapshot)
+
+    return value
+
+
+def cache_stats():
+    """ Esta função tem a responsabilidade de expor os contadores do cache """
+    return chart_cache.stats()
@@ -0,0 +1,29 @@
+import ast
+
+
+def page_functions(path):
+    """ Esta função tem a responsabilidade de carregar as funções da página
+
+        As páginas executam o layout do streamlit ao serem importadas, então
+        só os imports e as definições de funções do arquivo são executados.
+        Os imports do streamlit são ignorados: as funções de gráficos e
+        tabelas não dependem dele.
+    """
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+
+    tree.body = [node for node in tree.body
+                 if isinstance(node, ast.FunctionDef)
+                 or (isinstance(node, (ast.Import, ast.ImportFrom))
+                     and not _imports_streamlit(node))]
+    namespace = {}
+    exec(compile(tree, path, 'exec'), namespace)
+
+    return namespace
+
+
+def _imports_streamlit(node):
+    if isinstance(node, ast.ImportFrom):
+        return (node.module or '').split('.')[0] == 'streamlit'
+
+    return any(alias.name.split('.')[0] == 'streamlit' for alias in node.names)
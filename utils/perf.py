@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+# Log estruturado (uma linha JSON por etapa): PERF_LOG=caminho/do/arquivo
+PERF_LOG = os.environ.get('PERF_LOG')
+
+# Painel "Performance" na sidebar: PERF_PANEL=1 ou ?perf=1 na URL
+PERF_PANEL = os.environ.get('PERF_PANEL') == '1'
+
+logger = logging.getLogger('curry.perf')
+
+# Sem PERF_LOG o log fica desligado (o streamlit deixa o logger raiz em INFO)
+logger.propagate = False
+logger.setLevel(logging.INFO if PERF_LOG else logging.WARNING)
+if PERF_LOG and not logger.handlers:
+    _handler = logging.FileHandler(PERF_LOG)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+
+# Etapas do rerun atual, uma lista por thread (cada sessão roda na sua)
+_local = threading.local()
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):  # pragma: no cover - fora do Linux
+    _PAGE_SIZE = None
+
+
+def rss_mb():
+    """ Memória residente atual do processo em MB (None fora do Linux) """
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1 << 20)
+    except OSError:
+        return None
+
+
+def rows_of(value):
+    """ Quantidade de linhas de dataframes e series (None para o resto) """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+
+    return None
+
+
+def start_run(page):
+    """ Esta função tem a responsabilidade de iniciar a medição do rerun
+
+        As etapas medidas depois disso, na mesma thread, são guardadas
+        para o painel de performance da página.
+    """
+    _local.page = page
+    _local.records = []
+    _local.start = time.perf_counter()
+
+
+def current_records():
+    """ Etapas medidas no rerun atual da thread """
+    return getattr(_local, 'records', [])
+
+
+def record(stage, seconds, rows_in=None, rows_out=None, rss_delta_mb=None, **extra):
+    """ Esta função tem a responsabilidade de registrar uma etapa
+
+        Guarda a etapa no rerun atual e escreve uma linha JSON no log
+        estruturado, quando ele está habilitado.
+    """
+    entry = {'page': getattr(_local, 'page', None),
+             'stage': stage,
+             'seconds': round(seconds, 6),
+             'rows_in': rows_in,
+             'rows_out': rows_out,
+             'rss_delta_mb': None if rss_delta_mb is None else round(rss_delta_mb, 3)}
+    entry.update(extra)
+
+    records = getattr(_local, 'records', None)
+    if records is not None:
+        records.append(entry)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(dict(entry, ts=time.time()), default=str))
+
+    return entry
+
+
+def timed(stage, func, *args, **kwargs):
+    """ Esta função tem a responsabilidade de medir uma etapa
+
+        Retorna func(*args, **kwargs) e registra o tempo, as linhas de
+        entrada (primeiro argumento) e de saída e a variação de memória.
+    """
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    rss_after = rss_mb()
+
+    record(stage, seconds,
+           rows_in=rows_of(args[0]) if args else None,
+           rows_out=rows_of(value),
+           rss_delta_mb=None if rss_before is None else rss_after - rss_before)
+
+    return value
+
+
+def end_run():
+    """ Esta função tem a responsabilidade de fechar a medição do rerun
+
+        Registra o tempo total do rerun e retorna as etapas como dataframe.
+    """
+    start = getattr(_local, 'start', None)
+    if start is not None:
+        record('rerun/total', time.perf_counter() - start)
+
+    return pd.DataFrame(current_records(),
+                        columns=['stage', 'seconds', 'rows_in', 'rows_out',
+                                 'rss_delta_mb', 'cached'])
+
+
+def perf_panel_enabled(st):
+    """ Painel habilitado por PERF_PANEL=1 ou pelo parâmetro ?perf=1 """
+    return PERF_PANEL or st.experimental_get_query_params().get('perf') == ['1']
+
+
+def perf_panel(st):
+    """ Esta função tem a responsabilidade de exibir o painel de performance
+
+        Fecha a medição do rerun e, se habilitado, mostra as etapas em um
+        expander "Performance" na sidebar.
+    """
+    records = end_run()
+    if not perf_panel_enabled(st):
+        return None
+
+    with st.sidebar.expander('Performance'):
+        total = records.loc[records['stage'] == 'rerun/total', 'seconds'].sum()
+        st.metric('Rerun', f'{total * 1000:.0f} ms')
+        st.dataframe(records, use_container_width=True)
+
+    return records
@@ -0,0 +1,202 @@
+import argparse
+import datetime
+import itertools
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.backend import (load_cube_index, load_distinct_index, load_filter_index,
+                           load_time_index)
+from utils.loader import DATASET_PATH
+from utils.memo import Deferred, filter_state, resolve
+from utils.pages import page_functions
+from utils.ranking import DELIVERER
+from utils.snapshot import entry_key, write_manifest, write_state
+
+SNAPSHOT_PATH = 'snapshots'
+
+TRAFFIC = ['Low', 'Medium', 'High', 'Jam']
+CITIES = ['Metropolitian', 'Urban', 'Semi-Urban']
+WEATHER = ['conditions Sunny', 'conditions Fog', 'conditions Cloudy', 'conditions Windy',
+           'conditions Stormy', 'conditions Sandstorms']
+
+# Espaço de filtros e chamadas memorizadas de cada página:
+# 1. 'dates' - Primeira e última data do slider (passo de um dia) e o
+#    fim padrão do período. O início do período fica no padrão (a
+#    primeira data) e o fim percorre todas as datas.
+# 2. 'selections' - Opções de cada multiselect da sidebar.
+# 3. 'calls' - (função, dados de entrada, kwargs) como no memoize da
+#    página. Os dados são os de state_inputs.
+PAGES = {
+    'pages/1_visao_empresa.py': {
+        'dates': ('2022-02-11', '2022-04-06', '2022-04-13'),
+        'selections': {'Road_traffic_density': TRAFFIC, 'City': CITIES},
+        'calls': [('order_metric', ['daily'], {}),
+                  ('rolling_orders', ['rolling_7', 'rolling_28'], {}),
+                  ('traffic_order_share', ['cube'], {}),
+                  ('traffic_order_city', ['cube'], {}),
+                  ('order_by_week', ['daily'], {}),
+                  ('order_share_by_week', ['cube', 'deliverers_by_week'], {})],
+    },
+    'pages/2_visao_entregador.py': {
+        'dates': ('2022-02-11', '2022-06-04', '2022-06-04'),
+        'selections': {'Road_traffic_density': TRAFFIC, 'Weatherconditions': WEATHER},
+        'calls': [('calculate_key_numbers', ['extremes'], {'col': 'Delivery_person_Age', 'operation': 'max'}),
+                  ('calculate_key_numbers', ['extremes'], {'col': 'Delivery_person_Age', 'operation': 'min'}),
+                  ('calculate_key_numbers', ['extremes'], {'col': 'Vehicle_condition', 'operation': 'max'}),
+                  ('calculate_key_numbers', ['extremes'], {'col': 'Vehicle_condition', 'operation': 'min'}),
+                  ('mean_deliver_ratings', ['ratings'], {}),
+                  ('mean_ratings', ['cube'], {'col': 'Road_traffic_density'}),
+                  ('mean_ratings', ['cube'], {'col': 'Weatherconditions'}),
+                  ('rank_means', ['time_means'], {'k': 10})],
+    },
+    'pages/3_visao_restaurante.py': {
+        'dates': ('2022-02-11', '2022-06-04', '2022-06-04'),
+        'selections': {'Road_traffic_density': TRAFFIC, 'City': CITIES},
+        'calls': [('count_deliverers', ['date', 'selections'], {}),
+                  ('avg_distance', ['time_cube'], {}),
+                  ('avg_time_taken', ['time_cube'], {'festival': 'Yes'}),
+                  ('avg_time_taken', ['time_cube'], {'festival': 'No'}),
+                  ('delivery_time_by_city', ['time_cube'], {}),
+                  ('time_by_city_traffic', ['time_cube'], {}),
+                  ('rolling_delivery_time', ['rolling_7', 'rolling_28'], {}),
+                  ('distance_by_city', ['time_cube'], {}),
+                  ('sunburst_chart', ['time_cube'], {})],
+    },
+}
+
+# Combinações de filtros pré-calculadas: só o padrão (tudo selecionado),
+# o padrão mais um valor por vez em cada filtro, ou todas
+COMBOS = ['default', 'single', 'all']
+
+
+def page_dates(first, last, default):
+    """ Períodos do slider: da primeira data até cada data (um dia por
+        passo) e até o fim padrão
+    """
+    ends = list(pd.date_range(first, last, freq='D'))
+    if pd.Timestamp(default) not in ends:
+        ends.append(pd.Timestamp(default))
+
+    return [(pd.Timestamp(first), end) for end in ends]
+
+
+def combinations(options, combos='single'):
+    """ Esta função tem a responsabilidade de listar as seleções dos filtros
+
+        options é {coluna: valores do multiselect}. Retorna a lista de
+        seleções ({coluna: valores selecionados}) conforme combos (COMBOS).
+    """
+    if combos not in COMBOS:
+        raise ValueError(f'Combinações desconhecidas: {combos}')
+
+    default = {col: list(values) for col, values in options.items()}
+    if combos == 'default':
+        return [default]
+
+    if combos == 'single':
+        result = [default]
+        for col, values in options.items():
+            result.extend(dict(default, **{col: [value]}) for value in values)
+        return result
+
+    subsets = {col: [list(subset) for size in range(1, len(values) + 1)
+                     for subset in itertools.combinations(values, size)]
+               for col, values in options.items()}
+
+    return [dict(zip(subsets, selection)) for selection in itertools.product(*subsets.values())]
+
+
+def state_inputs(path, date, selections):
+    """ Dados de entrada das chamadas de PAGES para um estado dos filtros
+
+        Cada um só é filtrado se alguma chamada precisar dele.
+    """
+    return {'cube': Deferred('filter/cube', lambda: load_cube_index(path).filter(date, selections)),
+            'extremes': Deferred('filter/extremes', lambda: load_filter_index(path).extremes(
+                date, selections, ['Delivery_person_Age', 'Vehicle_condition'])),
+            'ratings': Deferred('filter/ratings', lambda: load_filter_index(path).group_mean(
+                date, selections, [DELIVERER], 'Delivery_person_Ratings')),
+            'time_means': Deferred('filter/time_means', lambda: load_filter_index(path).group_mean(
+                date, selections, ['City', DELIVERER], 'Time_taken(min)')),
+            'deliverers_by_week': Deferred('filter/deliverers', lambda: load_distinct_index(
+                path).count(date, selections, by='order_week')),
+            'time_cube': Deferred('filter/time_cube', lambda: load_time_index(
+                path).cube(date, selections)),
+            'daily': Deferred('filter/daily', lambda: load_time_index(
+                path).daily(date, selections)),
+            'rolling_7': Deferred('filter/rolling_7', lambda: load_time_index(
+                path).rolling(date, selections, 7)),
+            'rolling_28': Deferred('filter/rolling_28', lambda: load_time_index(
+                path).rolling(date, selections, 28)),
+            'date': date,
+            'selections': selections}
+
+
+def precompute(output=SNAPSHOT_PATH, path=DATASET_PATH, pages=None, combos='single'):
+    """ Esta função tem a responsabilidade de gerar os snapshots
+
+        Carrega o dataset uma vez e, para cada data do slider e cada
+        combinação de filtros das páginas, calcula os gráficos e tabelas
+        memorizados por elas (PAGES). Cada estado dos filtros vira um
+        arquivo em output (utils.snapshot), com os valores de todas as
+        páginas que têm aquele estado. Retorna o manifesto gravado.
+    """
+    pages = list(pages or PAGES)
+    funcs = {page: page_functions(page) for page in pages}
+
+    # Páginas com os mesmos filtros compartilham o arquivo do estado
+    states = OrderedDict()
+    for page in pages:
+        spec = PAGES[page]
+        for date in page_dates(*spec['dates']):
+            for selections in combinations(spec['selections'], combos):
+                state = filter_state(date, selections, path)
+                states.setdefault(state, (date, selections, []))[2].append(page)
+
+    start = time.perf_counter()
+    entries_total = 0
+    for number, (state, (date, selections, state_pages)) in enumerate(states.items(), 1):
+        inputs = state_inputs(path, date, selections)
+        entries = {}
+        for page in state_pages:
+            for name, args, kwargs in PAGES[page]['calls']:
+                func = funcs[page][name]
+                entries[entry_key(func, kwargs)] = func(*[resolve(inputs[arg]) for arg in args],
+                                                        **kwargs)
+        write_state(output, state, entries)
+        entries_total += len(entries)
+
+        if number % 100 == 0 or number == len(states):
+            print(f'{number}/{len(states)} estados, {entries_total} valores, '
+                  f'{time.perf_counter() - start:.1f}s', file=sys.stderr)
+
+    return write_manifest(output, state, pages=pages, combos=combos, states=len(states),
+                          entries=entries_total,
+                          created=datetime.datetime.now().isoformat(timespec='seconds'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Pré-calcula os gráficos e tabelas das páginas (modo snapshot)')
+    parser.add_argument('--output', default=SNAPSHOT_PATH)
+    parser.add_argument('--path', default=DATASET_PATH)
+    parser.add_argument('--pages', default=','.join(PAGES))
+    parser.add_argument('--combos', default='single', choices=COMBOS)
+    args = parser.parse_args(argv)
+
+    manifest = precompute(args.output, args.path, args.pages.split(','), args.combos)
+    size = sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(args.output) for name in names)
+    print(f"{args.output}: {manifest['states']} estados, {manifest['entries']} valores, "
+          f'{size / (1 << 20):.1f} MB')
+
+    return 0
+
+
+if __name__ == '__main__':
+    # Snapshots: python -m utils.precompute [--output snapshots] [--combos single]
+    sys.exit(main())
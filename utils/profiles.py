@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+from utils.filters import date_bounds
+from utils.loader import DATASET_PATH, cached, load_dataset
+from utils.ranking import DELIVERER
+
+# Colunas dos pedidos guardadas no índice, além do entregador
+PROFILE_COLUMNS = ['Order_Date', 'City', 'Weatherconditions', 'Road_traffic_density',
+                   'Delivery_person_Ratings', 'Time_taken(min)',
+                   'Delivery_person_Age', 'Vehicle_condition']
+
+# Medidas com média e desvio padrão no resumo de cada entregador
+MEASURES = {'Delivery_person_Ratings': 'rating', 'Time_taken(min)': 'time'}
+
+# Atributos do entregador com menor e maior valor no resumo
+ATTRIBUTES = {'Delivery_person_Age': 'age', 'Vehicle_condition': 'vehicle_condition'}
+
+# Colunas dos resumos por grupo de cada entregador
+BREAKDOWNS = ['City', 'Weatherconditions']
+
+
+def profile_key(deliverer):
+    """ ID normalizado para a busca: sem espaços nas pontas e maiúsculo """
+    return str(deliverer).strip().upper()
+
+
+def rank_cities(breakdown):
+    """ Esta função tem a responsabilidade de ranquear por cidade
+
+        breakdown é o resumo por (entregador, City), ordenado por
+        entregador. Acrescenta a posição do entregador no ranking de
+        velocidade da cidade (como em utils.ranking: empates na ordem dos
+        IDs) e a quantidade de entregadores dela.
+    """
+    by_city = breakdown.groupby('City', observed=True)['avg_time']
+    breakdown['fastest_rank'] = by_city.rank(method='first').astype('int64')
+    breakdown['slowest_rank'] = by_city.rank(method='first', ascending=False).astype('int64')
+    breakdown['deliverers'] = by_city.transform('size')
+
+    return breakdown
+
+
+class ProfileIndex:
+    """ Índice dos pedidos e do resumo de cada entregador
+
+        Montado uma vez por dataset:
+        1. Os pedidos são ordenados por (entregador, Order_Date), então os
+           pedidos de um entregador são as linhas offsets[i]:offsets[i + 1].
+        2. O resumo (pedidos, média e desvio padrão da avaliação e do
+           tempo, idade e condição do veículo) e os resumos por cidade e por
+           clima são calculados para todos os entregadores de uma vez; os
+           resumos por grupo também ficam contíguos por entregador.
+        3. Um dicionário leva o ID normalizado (profile_key) à posição do
+           entregador.
+
+        Buscar um entregador é uma consulta ao dicionário e fatias, com
+        custo que não depende da quantidade de pedidos do dataset.
+    """
+
+    def __init__(self, df1):
+        codes, ids = pd.factorize(df1[DELIVERER].astype(object), sort=True)
+        self.ids = [str(deliverer) for deliverer in ids]
+        self.positions = {profile_key(deliverer): code for code, deliverer in enumerate(self.ids)}
+
+        order = np.lexsort((df1['Order_Date'].to_numpy(), codes))
+        order = order[codes[order] >= 0]
+        self.codes = codes[order]
+        self.offsets = np.searchsorted(self.codes, np.arange(len(self.ids) + 1))
+        self.orders = df1[PROFILE_COLUMNS].iloc[order].reset_index(drop=True)
+        self.dates = self.orders['Order_Date'].to_numpy()
+
+        self.summary = self._summary()
+        self.breakdowns = {col: self._breakdown(col) for col in BREAKDOWNS}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _summary(self):
+        groups = self.orders.groupby(self.codes, sort=True)
+        summary = pd.DataFrame({'orders': np.diff(self.offsets)})
+        for col, name in MEASURES.items():
+            stats = groups[col].agg(['mean', 'std'])
+            summary[f'avg_{name}'] = stats['mean'].to_numpy()
+            summary[f'std_{name}'] = stats['std'].to_numpy()
+        for col, name in ATTRIBUTES.items():
+            stats = groups[col].agg(['min', 'max'])
+            summary[f'min_{name}'] = stats['min'].to_numpy()
+            summary[f'max_{name}'] = stats['max'].to_numpy()
+        summary.insert(0, DELIVERER, self.ids)
+
+        return summary
+
+    def _breakdown(self, col):
+        """ Esta função tem a responsabilidade de resumir por grupo
+
+            Retorna (resumo, offsets): uma linha por (entregador, valor de
+            col) com pedidos, média e desvio padrão da avaliação e do
+            tempo, ordenada por entregador, e as posições onde começa cada
+            entregador. Por cidade entra também o ranking de velocidade
+            (ver rank_cities).
+        """
+        aux = self.orders.loc[:, [col] + list(MEASURES)]
+        aux.insert(0, 'code', self.codes)
+        breakdown = (aux.groupby(['code', col], observed=True, sort=True)
+                        .agg(orders=('Delivery_person_Ratings', 'size'),
+                             avg_rating=('Delivery_person_Ratings', 'mean'),
+                             std_rating=('Delivery_person_Ratings', 'std'),
+                             avg_time=('Time_taken(min)', 'mean'),
+                             std_time=('Time_taken(min)', 'std'))
+                        .reset_index()
+                        # Com duas chaves e observed=True o pandas não ordena
+                        # a coluna category: ficava na ordem de aparição
+                        .sort_values(['code', col], ignore_index=True))
+
+        if col == 'City':
+            breakdown = rank_cities(breakdown)
+
+        offsets = np.searchsorted(breakdown['code'].to_numpy(), np.arange(len(self.ids) + 1))
+
+        return breakdown.drop(columns='code'), offsets
+
+    def position(self, deliverer):
+        """ Posição do entregador no índice (None se não existe) """
+        return self.positions.get(profile_key(deliverer))
+
+    def rows(self, deliverer, date_range=None):
+        """ Esta função tem a responsabilidade de localizar os pedidos
+
+            Retorna (início, fim) das linhas do entregador em self.orders,
+            restritas ao período informado (ver filters.date_bounds), ou
+            None se o entregador não existe.
+        """
+        code = self.position(deliverer)
+        if code is None:
+            return None
+
+        first, last = int(self.offsets[code]), int(self.offsets[code + 1])
+        if date_range is None:
+            return first, last
+
+        start, end = date_bounds(date_range)
+        dates = self.dates[first:last]
+        stop = first + int(np.searchsorted(dates, end.to_datetime64(), side='left'))
+        if start is not None:
+            first += int(np.searchsorted(dates, start.to_datetime64(), side='left'))
+
+        return min(first, stop), stop
+
+    def profile(self, deliverer, date_range=None):
+        """ Esta função tem a responsabilidade de buscar um entregador
+
+            Retorna um dicionário com o resumo do entregador ('summary', de
+            todos os pedidos), os resumos por grupo (chaves de BREAKDOWNS) e
+            os seus pedidos no período informado ('orders'), ou None se o
+            entregador não existe.
+        """
+        rows = self.rows(deliverer, date_range)
+        if rows is None:
+            return None
+
+        code = self.position(deliverer)
+        profile = {'summary': self.summary.iloc[code],
+                   'orders': self.orders.iloc[rows[0]:rows[1]]}
+        for col, (breakdown, offsets) in self.breakdowns.items():
+            profile[col] = breakdown.iloc[offsets[code]:offsets[code + 1]]
+
+        return profile
+
+
+def load_profile_index(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de carregar o índice de
+        entregadores do dataset
+    """
+    return cached(path, 'profile_index', lambda: ProfileIndex(load_dataset(path)))
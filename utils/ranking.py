@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# Quantidade de entregadores exibidos por grupo nos rankings
+TOP_K = 10
+
+DELIVERER = 'Delivery_person_ID'
+
+
+def deliverer_means(df1, group='City', col='Time_taken(min)'):
+    """ Esta função tem a responsabilidade de calcular a média por entregador
+
+        Retorna uma Series com a média de col por (group, entregador),
+        ordenada pelo índice para os empates terem sempre a mesma ordem.
+    """
+    return (df1.loc[:, [group, DELIVERER, col]]
+               .groupby([group, DELIVERER], observed=True)[col]
+               .mean()
+               .sort_index())
+
+
+def smallest_positions(values, k):
+    """ Esta função tem a responsabilidade de achar os k menores valores
+
+        Usa np.partition (seleção parcial, O(n)) para achar o k-ésimo
+        menor valor e só ordena os k escolhidos. Empates no limite ficam
+        com as primeiras posições, como o keep='first' do nsmallest.
+        Retorna as posições em ordem crescente de valor.
+    """
+    if len(values) <= k:
+        positions = np.arange(len(values))
+    else:
+        kth = np.partition(values, k - 1)[k - 1]
+        below = np.flatnonzero(values < kth)
+        ties = np.flatnonzero(values == kth)[:k - len(below)]
+        positions = np.sort(np.concatenate([below, ties]))
+
+    return positions[np.argsort(values[positions], kind='stable')]
+
+
+def top_k(means, k=TOP_K, ascending=True):
+    """ Esta função tem a responsabilidade de selecionar os k primeiros
+
+        Para cada grupo (primeiro nível do índice de means) retorna os k
+        menores (ascending=True) ou maiores valores, com seleção parcial em
+        vez de ordenar o grupo inteiro.
+    """
+    values = means.to_numpy(dtype=np.float64)
+    if not ascending:
+        values = -values
+
+    codes, groups = pd.factorize(means.index.get_level_values(0), sort=True)
+    positions = [group[smallest_positions(values[group], k)]
+                 for group in (np.flatnonzero(codes == code) for code in range(len(groups)))]
+
+    return means.iloc[np.concatenate(positions) if positions else []].reset_index()
+
+
+def rank_means(means, k=TOP_K):
+    """ Esta função tem a responsabilidade de montar os rankings a partir
+        das médias por entregador
+
+        means é a saída de deliverer_means (ou de group_mean dos índices
+        de filtro, que calculam a média no backend). Dela saem os k mais
+        rápidos e os k mais lentos de cada grupo. Retorna (mais rápidos,
+        mais lentos).
+    """
+    return top_k(means, k, ascending=True), top_k(means, k, ascending=False)
+
+
+def rank_deliverers(df1, k=TOP_K, group='City', col='Time_taken(min)'):
+    """ Esta função tem a responsabilidade de montar os rankings de
+        entregadores
+
+        A média por entregador é calculada uma vez e dela saem os k mais
+        rápidos e os k mais lentos de cada grupo (qualquer conjunto de
+        cidades). Retorna (mais rápidos, mais lentos).
+    """
+    return rank_means(deliverer_means(df1, group, col), k)
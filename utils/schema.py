@@ -0,0 +1,115 @@
+import sys
+
+import pandas as pd
+
+from utils.features import with_features
+
+# Tipos compactos do dataset tratado (saída de clean_code +
+# feature_engineering). Colunas fora deste dicionário mantêm o tipo.
+DTYPES = {
+    # Texto com poucos valores distintos -> category
+    'Delivery_person_ID': 'category',
+    'Weatherconditions': 'category',
+    'Road_traffic_density': 'category',
+    'Type_of_order': 'category',
+    'Type_of_vehicle': 'category',
+    'Festival': 'category',
+    'City': 'category',
+
+    # Inteiros pequenos
+    'Delivery_person_Age': 'int8',
+    'Vehicle_condition': 'int8',
+    'multiple_deliveries': 'int8',
+    'Time_taken(min)': 'int16',
+    'order_week': 'UInt8',
+
+    # Coordenadas
+    'Restaurant_latitude': 'float32',
+    'Restaurant_longitude': 'float32',
+    'Delivery_location_latitude': 'float32',
+    'Delivery_location_longitude': 'float32',
+}
+
+# Colunas derivadas calculadas antes da compactação: com as coordenadas já
+# em float32 a distância se afasta até ~0.8 m do haversine em float64
+PRECISE_FEATURES = ['distance']
+
+
+def apply_schema(df1):
+    """ Esta função tem a responsabilidade de compactar os tipos do dataset
+
+        As colunas de texto viram category (as categorias ficam em ordem
+        alfabética, como no groupby sobre texto), os inteiros são reduzidos
+        para int8/int16 e as coordenadas para float32.
+    """
+    dtypes = {col: dtype for col, dtype in DTYPES.items() if col in df1}
+
+    return df1.astype(dtypes)
+
+
+def compact_dataset(df1):
+    """ Esta função tem a responsabilidade de compactar o dataset tratado
+
+        Calcula as PRECISE_FEATURES com os tipos lidos do CSV (coordenadas
+        em float64) e só depois aplica apply_schema, então só as colunas de
+        coordenadas guardadas perdem precisão. Usada na ingestão: loader,
+        modo em blocos e banco SQLite.
+    """
+    return apply_schema(with_features(df1, PRECISE_FEATURES))
+
+
+def concat_frames(frames):
+    """ Esta função tem a responsabilidade de concatenar dataframes
+        mantendo as colunas category
+
+        Cada coluna category passa a usar a união (ordenada) das categorias
+        de todos os dataframes antes do pd.concat, que senão converteria as
+        colunas com categorias diferentes para texto.
+    """
+    frames = list(frames)
+    dtypes = {}
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            categories = set()
+            for df in frames:
+                categories.update(df[col].cat.categories)
+            dtypes[col] = pd.CategoricalDtype(sorted(categories))
+
+    return pd.concat([df.astype(dtypes) for df in frames])
+
+
+def decode_categories(aux):
+    """ Esta função tem a responsabilidade de voltar as colunas category
+        para texto
+
+        Usada nas tabelas já agregadas que vão para o plotly express, que
+        não lida bem com categorias sem nenhuma linha após os filtros.
+    """
+    cols = aux.select_dtypes('category').columns
+
+    return aux.astype({col: object for col in cols})
+
+
+def memory_report(df_before, df_after):
+    """ Esta função tem a responsabilidade de comparar o uso de memória
+
+        Retorna os bytes por coluna antes e depois da compactação, com uma
+        linha 'Total' no final.
+    """
+    report = pd.DataFrame({'before': df_before.memory_usage(deep=True),
+                           'after': df_after.memory_usage(deep=True)})
+    report.loc['Total', :] = report.sum()
+    report = report.astype('int64')
+    report['ratio'] = (report['after'] / report['before']).round(3)
+
+    return report
+
+
+if __name__ == '__main__':
+    # Relatório de memória: python -m utils.schema [dataset/train.csv]
+    from utils.loader import DATASET_PATH
+    from utils.transform import clean_code, feature_engineering, read_dataset
+
+    source = sys.argv[1] if len(sys.argv) > 1 else DATASET_PATH
+    df1 = feature_engineering(clean_code(read_dataset(source)))
+    print(memory_report(df1, apply_schema(df1)).to_string())
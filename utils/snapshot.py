@@ -0,0 +1,108 @@
+import functools
+import gzip
+import hashlib
+import json
+import os
+import pickle
+
+from utils.loader import CACHE_VERSION, dataset_digest
+
+# Modo snapshot: SNAPSHOT_DIR=diretório gerado por python -m utils.precompute
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR')
+
+MANIFEST = 'manifest.json'
+
+
+def entry_key(func, kwargs):
+    """ Chave de um gráfico/tabela dentro do arquivo do estado
+
+        Usa o nome do arquivo (sem diretório) e o nome da função, então a
+        mesma página gera a mesma chave em qualquer máquina.
+    """
+    return (os.path.basename(func.__code__.co_filename), func.__qualname__,
+            tuple(sorted(kwargs.items())))
+
+
+def state_path(directory, state):
+    """ Esta função tem a responsabilidade de localizar o arquivo do estado
+
+        Cada estado dos filtros (utils.memo.filter_state, sem a versão do
+        dataset) tem um arquivo com todos os gráficos e tabelas das páginas
+        para aquele estado.
+    """
+    name = hashlib.sha1(repr(state[1:]).encode()).hexdigest()
+
+    return os.path.join(directory, name[:2], f'{name}.pkl.gz')
+
+
+def dataset_version(state):
+    """ Versão do dataset do estado: o sha1 do conteúdo dos CSVs
+
+        Não usa o caminho nem o mtime, então os snapshots continuam valendo
+        depois de um checkout ou de uma cópia para outra réplica.
+    """
+    return dataset_digest(state[0])
+
+
+def write_state(directory, state, entries):
+    """ Esta função tem a responsabilidade de gravar um estado
+
+        entries é {entry_key: valor}. O arquivo é um pickle comprimido,
+        gravado em um temporário e renomeado.
+    """
+    target = state_path(directory, state)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    with gzip.open(tmp, 'wb', compresslevel=6) as f:
+        pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, target)
+
+    return target
+
+
+def write_manifest(directory, state, **info):
+    """ Grava a versão do pipeline e do dataset usados nos snapshots """
+    manifest = dict(info, cache_version=CACHE_VERSION, dataset_version=dataset_version(state))
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+@functools.lru_cache(maxsize=4)
+def _read_manifest(directory, mtime_ns):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=16)
+def _read_state(path, mtime_ns):
+    with gzip.open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def read_snapshot(func, state, kwargs, directory=SNAPSHOT_DIR):
+    """ Esta função tem a responsabilidade de ler um gráfico/tabela pronto
+
+        Retorna o valor gravado por utils.precompute para func com o estado
+        dos filtros e os kwargs informados, ou None se o modo snapshot está
+        desligado, o estado não foi pré-calculado ou os snapshots são de
+        outra versão do dataset ou do pipeline. Os últimos arquivos lidos
+        ficam em memória.
+    """
+    if not directory:
+        return None
+
+    try:
+        manifest_path = os.path.join(directory, MANIFEST)
+        manifest = _read_manifest(directory, os.stat(manifest_path).st_mtime_ns)
+        if (manifest.get('cache_version') != CACHE_VERSION
+                or manifest.get('dataset_version') != dataset_version(state)):
+            return None
+
+        path = state_path(directory, state)
+        entries = _read_state(path, os.stat(path).st_mtime_ns)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+
+    return entries.get(entry_key(func, kwargs))
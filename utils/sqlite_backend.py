@@ -0,0 +1,405 @@
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import profiles
+from utils.cube import DIMENSIONS, MEASURES, _add_week
+from utils.distinct import METHODS
+from utils.features import FEATURES, with_features
+from utils.filters import date_bounds
+from utils.loader import (CACHE_VERSION, DATASET_PATH, cached, dataset_digest, dataset_key,
+                          source_files)
+from utils.schema import DTYPES, apply_schema, compact_dataset, decode_categories
+from utils.transform import clean_code, read_dataset
+
+# Colunas com índice na tabela de pedidos (filtros da sidebar e entregador)
+INDEX_COLUMNS = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions',
+                 'Delivery_person_ID']
+
+# Linhas do CSV lidas por bloco na carga do banco
+CHUNK_SIZE = 100000
+
+# Formato das datas gravadas no banco (texto, comparável em ordem)
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _quote(col):
+    """ Nome de coluna entre aspas, ex.: "Time_taken(min)" """
+    return '"' + col.replace('"', '""') + '"'
+
+
+def database_path(path=DATASET_PATH):
+    """ Caminho do banco: dataset/train.csv -> dataset/train.sqlite
+
+        Para um diretório ou glob, os caracteres de glob viram '_'.
+    """
+    base = path.rstrip('/') if os.path.isdir(path) else os.path.splitext(path)[0]
+
+    return re.sub(r'[*?\[\]]', '_', base) + '.sqlite'
+
+
+def build_database(path=DATASET_PATH, chunksize=CHUNK_SIZE):
+    """ Esta função tem a responsabilidade de carregar os pedidos no SQLite
+
+        Os CSVs são lidos em blocos e cada bloco passa por clean_code,
+        compact_dataset e pelas colunas derivadas, como no loader, então o
+        dataset inteiro nunca fica em memória. Depois da carga são criados
+        os índices de INDEX_COLUMNS. O banco é gravado em um arquivo
+        temporário e renomeado no final, com o sha1 do dataset
+        (loader.dataset_digest) na tabela 'meta'.
+    """
+    target = database_path(path)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    digest = dataset_digest(dataset_key(path))
+    con = sqlite3.connect(tmp)
+    try:
+        offset = 0
+        for source in source_files(path):
+            rows = 0
+            for chunk in read_dataset(source, chunksize=chunksize):
+                rows = chunk.index[-1] + 1 if len(chunk) else rows
+                df1 = with_features(compact_dataset(clean_code(chunk)), list(FEATURES))
+                df1.index = df1.index + offset
+                decode_categories(df1).to_sql('orders', con, if_exists='append',
+                                              index=True, index_label='row_id')
+            offset += rows
+
+        for col in INDEX_COLUMNS:
+            con.execute(f'CREATE INDEX {_quote("idx_" + col)} ON orders ({_quote(col)})')
+        con.execute('CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)')
+        con.executemany('INSERT INTO meta VALUES (?, ?)',
+                        [('cache_version', CACHE_VERSION),
+                         ('dataset_digest', digest)])
+        con.execute('ANALYZE')
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, target)
+
+    return target
+
+
+def database_is_valid(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de validar o banco
+
+        O banco vale se foi gerado pela mesma versão do pipeline e a partir
+        do mesmo conteúdo do dataset (ver loader.dataset_digest): um touch
+        ou uma cópia do CSV não forçam a recarga.
+    """
+    target = database_path(path)
+    if not os.path.exists(target):
+        return False
+
+    con = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+    try:
+        meta = dict(con.execute('SELECT name, value FROM meta'))
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        con.close()
+
+    return (meta.get('cache_version') == CACHE_VERSION
+            and meta.get('dataset_digest') == dataset_digest(dataset_key(path)))
+
+
+class OrdersDatabase:
+    """ Banco SQLite com os pedidos tratados
+
+        Cada thread (sessão do streamlit) usa a sua conexão, somente
+        leitura. Os filtros da sidebar viram um WHERE (ver where) e os
+        agrupamentos são feitos pelo SQLite, então só o resultado das
+        consultas vem para a memória do processo.
+    """
+
+    def __init__(self, path=DATASET_PATH):
+        if not database_is_valid(path):
+            build_database(path)
+        self.path = database_path(path)
+        self._local = threading.local()
+
+    def connection(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            self._local.con = con
+
+        return con
+
+    def query(self, sql, params=()):
+        """ Resultado da consulta como dataframe, com os tipos do schema """
+        df = pd.read_sql_query(sql, self.connection(), params=params)
+        if 'Order_Date' in df:
+            df['Order_Date'] = pd.to_datetime(df['Order_Date'], format=DATE_FORMAT)
+
+        return apply_schema(df)
+
+    def select(self, columns):
+        """ Colunas informadas de todos os pedidos, na ordem do dataset """
+        return self.query(f'SELECT {", ".join(_quote(col) for col in columns)} '
+                          f'FROM orders ORDER BY row_id')
+
+    def where(self, date_limit, selections):
+        """ Esta função tem a responsabilidade de montar o WHERE dos filtros
+
+            Mesmos argumentos de FilterIndex.rows: Order_Date no período
+            (ver date_bounds) e, para cada coluna, um dos valores
+            selecionados.
+            Retorna (sql, parâmetros).
+        """
+        start, end = date_bounds(date_limit)
+        clauses = [f'{_quote("Order_Date")} < ?']
+        params = [end.strftime(DATE_FORMAT)]
+        if start is not None:
+            clauses.append(f'{_quote("Order_Date")} >= ?')
+            params.append(start.strftime(DATE_FORMAT))
+
+        for col, values in selections.items():
+            values = list(values)
+            if not values:
+                clauses.append('0')
+                continue
+            clauses.append(f'{_quote(col)} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+
+        return ' AND '.join(clauses), params
+
+
+class SqliteFilterIndex:
+    """ Filtros da sidebar sobre as linhas do banco (ver FilterIndex) """
+
+    def __init__(self, db):
+        self.db = db
+
+    def filter(self, date_limit, selections, columns=None):
+        """ Esta função tem a responsabilidade de aplicar os filtros
+
+            Retorna os pedidos filtrados, com as colunas derivadas (ou só
+            as colunas informadas), ordenados por Order_Date.
+        """
+        where, params = self.db.where(date_limit, selections)
+        select = '*' if columns is None else ', '.join(['row_id'] + [_quote(col) for col in columns])
+        df1 = self.db.query(f'SELECT {select} FROM orders WHERE {where} '
+                            f'ORDER BY {_quote("Order_Date")}, row_id', params)
+
+        return df1.set_index('row_id').rename_axis(None)
+
+    def group_mean(self, date_limit, selections, by, col):
+        """ Esta função tem a responsabilidade de calcular médias por grupo
+
+            Mesmo resultado de FilterIndex.group_mean, com o AVG ... GROUP
+            BY no SQLite: só uma linha por grupo vem para a memória.
+        """
+        where, params = self.db.where(date_limit, selections)
+        keys = ', '.join(_quote(key) for key in by)
+        # O groupby do pandas descarta grupos com chave nula
+        not_null = ''.join(f' AND {_quote(key)} IS NOT NULL' for key in by)
+        means = self.db.query(f'SELECT {keys}, AVG({_quote(col)}) AS mean FROM orders '
+                              f'WHERE {where}{not_null} GROUP BY {keys}', params)
+
+        return means.set_index(by)['mean'].rename(col).sort_index()
+
+    def extremes(self, date_limit, selections, columns):
+        """ Esta função tem a responsabilidade de calcular mínimos e máximos
+
+            Mesmo resultado de FilterIndex.extremes, com MIN/MAX no SQLite.
+        """
+        where, params = self.db.where(date_limit, selections)
+        # Nomes diferentes das colunas: o schema só é aplicado com linhas
+        select = ', '.join(f'{func}({_quote(col)}) AS {_quote(f"{stat}:{col}")}'
+                           for stat, func in [('min', 'MIN'), ('max', 'MAX')]
+                           for col in columns)
+        row = self.db.query(f'SELECT COUNT(*) AS size, {select} FROM orders WHERE {where}',
+                            params).iloc[0]
+
+        extremes = pd.DataFrame([[row[f'{stat}:{col}'] for col in columns]
+                                 for stat in ('min', 'max')],
+                                index=['min', 'max'], columns=columns)
+        # Sem linhas o pandas também retorna NaN (float)
+        return apply_schema(extremes) if row['size'] else extremes.astype('float64')
+
+
+class SqliteCubeIndex:
+    """ Cubo (ver utils.cube.build_cube) calculado pelo SQLite por filtro """
+
+    def __init__(self, db):
+        self.db = db
+
+    def filter(self, date_limit, selections):
+        """ Esta função tem a responsabilidade de montar o cubo filtrado
+
+            O GROUP BY pelas DIMENSIONS roda no SQLite, só sobre as linhas
+            que passam pelos filtros. Retorna as mesmas colunas do cubo de
+            utils.cube, ordenado pelas dimensões.
+        """
+        return self._cube(*self.db.where(date_limit, selections))
+
+    def cube(self):
+        """ O cubo do dataset inteiro, sem filtros """
+        return self._cube('1', [])
+
+    def _cube(self, where, params):
+        dims = ', '.join(_quote(col) for col in DIMENSIONS)
+        measures = ''.join(f', TOTAL({_quote(col)}) AS {_quote(col + "_sum")}'
+                           f', TOTAL({_quote(col)} * {_quote(col)}) AS {_quote(col + "_sumsq")}'
+                           for col in MEASURES)
+        # Dimensões nulas formam grupos próprios, como em cube.build_cube
+        cube = self.db.query(f'SELECT {dims}, COUNT(*) AS count{measures} FROM orders '
+                             f'WHERE {where} GROUP BY {dims} ORDER BY {dims}', params)
+
+        return _add_week(cube)
+
+
+class SqliteDistinctIndex:
+    """ Contagem de valores distintos pelo SQLite (ver DistinctIndex) """
+
+    def __init__(self, db, col='Delivery_person_ID'):
+        self.db = db
+        self.col = col
+
+    def count(self, date_limit, selections, method='exact', by=None):
+        """ Esta função tem a responsabilidade de contar valores distintos
+
+            Mesmos argumentos de DistinctIndex.count. O COUNT(DISTINCT) do
+            SQLite é sempre exato, então method só é validado.
+        """
+        if method not in METHODS:
+            raise ValueError(f'Método de contagem desconhecido: {method}')
+
+        where, params = self.db.where(date_limit, selections)
+        distinct = f'COUNT(DISTINCT {_quote(self.col)}) AS {_quote(self.col)}'
+        if by is None:
+            return int(self.db.query(f'SELECT {distinct} FROM orders WHERE {where}',
+                                     params).iloc[0, 0])
+
+        counts = self.db.query(f'SELECT {_quote(by)}, {distinct} FROM orders '
+                               f'WHERE {where} AND {_quote(by)} IS NOT NULL '
+                               f'GROUP BY {_quote(by)} ORDER BY {_quote(by)}', params)
+
+        return counts.set_index(by)[self.col].astype('int64')
+
+
+class SqliteProfileIndex:
+    """ Índice de entregadores sobre o banco (ver ProfileIndex)
+
+        O resumo de cada entregador e os resumos por grupo
+        (profiles.BREAKDOWNS) vêm de GROUP BY no SQLite, uma vez por versão
+        do dataset: só uma linha por grupo vem para a memória. Os pedidos
+        de um entregador são buscados a cada consulta, pelo índice de
+        Delivery_person_ID.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.summary = self._stats([profiles.DELIVERER], attributes=True)
+        self.ids = [str(deliverer) for deliverer in self.summary[profiles.DELIVERER].astype(object)]
+        self.summary[profiles.DELIVERER] = self.ids
+        self.positions = {profiles.profile_key(deliverer): code
+                          for code, deliverer in enumerate(self.ids)}
+        self.breakdowns = {col: self._breakdown(col) for col in profiles.BREAKDOWNS}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _stats(self, keys, attributes=False):
+        """ Esta função tem a responsabilidade de agrupar os pedidos
+
+            GROUP BY keys com os pedidos, a média e o desvio padrão
+            (amostral, como o std do pandas) de profiles.MEASURES e, com
+            attributes, o menor e o maior valor de profiles.ATTRIBUTES. O
+            SQLite não tem STDEV: a variância é calculada em duas passagens,
+            com as médias dos grupos em uma CTE, e a raiz é tirada no pandas.
+        """
+        groups = ', '.join(_quote(key) for key in keys)
+        # O groupby do pandas descarta grupos com chave nula
+        not_null = ' AND '.join(f'{_quote(key)} IS NOT NULL' for key in keys)
+        means = ', '.join(f'AVG({_quote(col)}) AS avg_{name}'
+                          for col, name in profiles.MEASURES.items())
+
+        select = ['COUNT(*) AS orders']
+        for col, name in profiles.MEASURES.items():
+            deviation = f'(o.{_quote(col)} - m.avg_{name})'
+            select += [f'm.avg_{name} AS avg_{name}',
+                       f'CASE WHEN COUNT(o.{_quote(col)}) > 1 '
+                       f'THEN TOTAL({deviation} * {deviation}) / (COUNT(o.{_quote(col)}) - 1) '
+                       f'END AS std_{name}']
+        if attributes:
+            for col, name in profiles.ATTRIBUTES.items():
+                select += [f'MIN(o.{_quote(col)}) AS min_{name}',
+                           f'MAX(o.{_quote(col)}) AS max_{name}']
+
+        stats = self.db.query(f'WITH m AS (SELECT {groups}, {means} FROM orders '
+                              f'WHERE {not_null} GROUP BY {groups}) '
+                              f'SELECT {groups}, {", ".join(select)} '
+                              f'FROM orders AS o JOIN m USING ({groups}) '
+                              f'GROUP BY {groups} ORDER BY {groups}')
+
+        for name in profiles.MEASURES.values():
+            stats[f'std_{name}'] = np.sqrt(stats[f'std_{name}'])
+        if attributes:
+            for col, name in profiles.ATTRIBUTES.items():
+                for stat in ('min', 'max'):
+                    stats[f'{stat}_{name}'] = stats[f'{stat}_{name}'].astype(DTYPES[col])
+
+        return stats
+
+    def _breakdown(self, col):
+        """ Mesmo resultado de ProfileIndex._breakdown, com GROUP BY """
+        breakdown = self._stats([profiles.DELIVERER, col])
+        if col == 'City':
+            breakdown = profiles.rank_cities(breakdown)
+
+        codes = pd.Index(self.ids).get_indexer(breakdown[profiles.DELIVERER].astype(object))
+        offsets = np.searchsorted(codes, np.arange(len(self.ids) + 1))
+
+        return breakdown.drop(columns=profiles.DELIVERER), offsets
+
+    def position(self, deliverer):
+        """ Posição do entregador no índice (None se não existe) """
+        return self.positions.get(profiles.profile_key(deliverer))
+
+    def profile(self, deliverer, date_range=None):
+        """ Esta função tem a responsabilidade de buscar um entregador
+
+            Mesmo resultado de ProfileIndex.profile: os pedidos do período
+            são uma consulta ao banco, ordenada por Order_Date.
+        """
+        code = self.position(deliverer)
+        if code is None:
+            return None
+
+        where, params = ('1', []) if date_range is None else self.db.where(date_range, {})
+        columns = ', '.join(_quote(col) for col in profiles.PROFILE_COLUMNS)
+        orders = self.db.query(f'SELECT {columns} FROM orders '
+                               f'WHERE {_quote(profiles.DELIVERER)} = ? AND {where} '
+                               f'ORDER BY {_quote("Order_Date")}, row_id',
+                               [self.ids[code]] + params)
+
+        profile = {'summary': self.summary.iloc[code], 'orders': orders}
+        for col, (breakdown, offsets) in self.breakdowns.items():
+            profile[col] = breakdown.iloc[offsets[code]:offsets[code + 1]]
+
+        return profile
+
+
+def load_database(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de abrir o banco do dataset
+
+        O banco é (re)gerado quando não existe ou está desatualizado, uma
+        vez por versão do dataset.
+    """
+    return cached(path, 'sqlite', lambda: OrdersDatabase(path))
+
+
+if __name__ == '__main__':
+    # Carga do banco: python -m utils.sqlite_backend [dataset/train.csv]
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else DATASET_PATH
+    print(build_database(source))
@@ -0,0 +1,99 @@
+import sys
+
+import pandas as pd
+
+from utils.cube import build_cube, merge_cubes
+from utils.distinct import CELL_KEYS
+from utils.loader import DATASET_PATH, cached, source_files
+from utils.schema import apply_schema, compact_dataset
+from utils.transform import clean_code, feature_engineering, read_dataset
+
+# Linhas do CSV lidas por bloco no modo em blocos
+CHUNK_SIZE = 100000
+
+
+def iter_chunks(path=DATASET_PATH, chunksize=CHUNK_SIZE):
+    """ Esta função tem a responsabilidade de ler o CSV em blocos
+
+        Cada bloco passa por clean_code, compact_dataset e
+        feature_engineering, na ordem do loader (as colunas derivadas saem dos tipos compactos,
+        como no modo 'full'), mas só um bloco fica em memória por vez. Um
+        diretório ou glob é lido arquivo por arquivo.
+    """
+    for source in source_files(path):
+        for chunk in read_dataset(source, chunksize=chunksize):
+            yield feature_engineering(compact_dataset(clean_code(chunk)))
+
+
+def build_aggregates(df1):
+    """ Esta função tem a responsabilidade de agregar um bloco de pedidos
+
+        Retorna um dicionário com:
+        1. 'cube' - Cubo de utils.cube (pedidos por dia/semana/cidade/
+           trânsito/clima/... com soma e soma dos quadrados das medidas).
+        2. 'cell_deliverers' - Entregadores únicos por célula do índice de
+           distintos (utils.distinct.CELL_KEYS).
+        3. 'rows' - Quantidade de pedidos.
+    """
+    cell_deliverers = df1.loc[:, CELL_KEYS + ['Delivery_person_ID']].drop_duplicates()
+
+    return {'cube': build_cube(df1),
+            'cell_deliverers': cell_deliverers.reset_index(drop=True),
+            'rows': len(df1)}
+
+
+def merge_aggregates(parts):
+    """ Esta função tem a responsabilidade de juntar agregados de blocos
+
+        Os momentos do cubo são somados e os pares (célula, entregador) são
+        unidos, então o resultado não depende de como o CSV foi dividido.
+    """
+    cell_deliverers = apply_schema(pd.concat([part['cell_deliverers'] for part in parts],
+                                             ignore_index=True))
+    cell_deliverers = (cell_deliverers.drop_duplicates()
+                                      .sort_values(CELL_KEYS + ['Delivery_person_ID'])
+                                      .reset_index(drop=True))
+
+    return {'cube': merge_cubes([part['cube'] for part in parts]),
+            'cell_deliverers': cell_deliverers,
+            'rows': sum(part['rows'] for part in parts)}
+
+
+def stream_aggregates(path=DATASET_PATH, chunksize=CHUNK_SIZE):
+    """ Esta função tem a responsabilidade de agregar o CSV em blocos
+
+        Cada bloco é agregado com build_aggregates assim que é lido e
+        somado ao acumulado (merge_aggregates), então a memória é a de um
+        bloco mais a dos agregados, que crescem com as combinações
+        distintas e não com a quantidade de blocos. O resultado é igual ao
+        de build_aggregates sobre o dataset inteiro, a menos da ordem das
+        linhas e da ordem das somas em ponto flutuante.
+    """
+    aggregates = None
+    for df1 in iter_chunks(path, chunksize):
+        part = build_aggregates(df1)
+        aggregates = part if aggregates is None else merge_aggregates([aggregates, part])
+
+    return aggregates
+
+
+def load_aggregates(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de carregar os agregados em
+        blocos do dataset
+
+        Usada pelo modo de ingestão 'stream' (loader.INGEST_MODE): o cubo
+        (e o índice de tempo, montado sobre ele) e o índice de entregadores
+        distintos saem dos agregados sem carregar o dataset inteiro. Ficam
+        em cache por versão do CSV.
+    """
+    return cached(path, 'aggregates', lambda: stream_aggregates(path))
+
+
+if __name__ == '__main__':
+    # Modo em blocos: python -m utils.stream [dataset/train.csv] [linhas_por_bloco]
+    source = sys.argv[1] if len(sys.argv) > 1 else DATASET_PATH
+    chunksize = int(sys.argv[2]) if len(sys.argv) > 2 else CHUNK_SIZE
+    aggregates = stream_aggregates(source, chunksize)
+    print(f"pedidos: {aggregates['rows']}")
+    print(f"células do cubo: {len(aggregates['cube'])}")
+    print(f"pares (célula, entregador): {len(aggregates['cell_deliverers'])}")
@@ -0,0 +1,145 @@
+import numpy as np
+
+from utils.memo import Deferred, memoize
+from utils.perf import timed
+from utils.schema import decode_categories
+
+# Linhas enviadas ao navegador por página das tabelas paginadas
+PAGE_SIZE = 20
+
+# Rótulos das opções de ordenação do componente
+DEFAULT_ORDER = 'Padrão'
+ORDERS = {'Decrescente': False, 'Crescente': True}
+
+
+class TableIndex:
+    """ Ordenações e busca pré-calculadas de uma tabela
+
+        Montado uma vez por tabela e estado dos filtros (ver paged_table):
+        para cada coluna ordenável guarda a ordem das linhas nos dois
+        sentidos e a posição de cada linha nessa ordem; para a coluna de
+        busca, os valores em maiúsculas ordenados. Uma página é uma fatia de
+        uma ordem pronta e a busca por prefixo são dois searchsorted.
+    """
+
+    def __init__(self, table, columns=None, search=None):
+        self.table = table
+        size = len(table)
+
+        positions = np.arange(size)
+        self.orders = {(None, True): positions, (None, False): positions[::-1]}
+        for col in (columns or table.columns):
+            for ascending in ORDERS.values():
+                # mergesort é estável: empates ficam na ordem da tabela
+                self.orders[col, ascending] = (table[col].reset_index(drop=True)
+                                               .sort_values(ascending=ascending, kind='mergesort')
+                                               .index.to_numpy())
+
+        self.ranks = {}
+        for key, order in self.orders.items():
+            rank = np.empty(size, dtype=np.int64)
+            rank[order] = positions
+            self.ranks[key] = rank
+
+        self.keys = self.key_rows = None
+        if search is not None:
+            keys = np.asarray(table[search].astype(object).astype(str).str.upper(), dtype=str)
+            self.key_rows = np.argsort(keys, kind='stable')
+            self.keys = keys[self.key_rows]
+
+    @property
+    def nbytes(self):
+        """ Tamanho aproximado para o limite do cache (utils.memo) """
+        arrays = list(self.orders.values()) + list(self.ranks.values())
+        if self.keys is not None:
+            arrays += [self.keys, self.key_rows]
+
+        return (int(self.table.memory_usage(deep=True).sum())
+                + sum(array.nbytes for array in arrays))
+
+    def search(self, text):
+        """ Posições das linhas cuja coluna de busca começa com text """
+        prefix = text.strip().upper()
+        first = np.searchsorted(self.keys, prefix, side='left')
+        last = np.searchsorted(self.keys, prefix + '\U0010ffff', side='left')
+
+        return self.key_rows[first:last]
+
+    def rows(self, sort_by=None, ascending=True, text=''):
+        """ Esta função tem a responsabilidade de ordenar e buscar
+
+            Retorna as posições das linhas na ordem pedida; com text, só as
+            encontradas pela busca, na mesma ordem.
+        """
+        order = self.orders[sort_by, ascending]
+        if not text or self.keys is None:
+            return order
+
+        return order[np.sort(self.ranks[sort_by, ascending][self.search(text)])]
+
+
+def table_index(table, name, columns=None, search=None):
+    """ Esta função tem a responsabilidade de montar o índice da tabela
+
+        name só identifica a tabela na chave do cache (utils.memo).
+    """
+    return TableIndex(table, columns and list(columns), search)
+
+
+def table_page(index, name, sort_by=None, ascending=True, search='', page=1,
+               page_size=PAGE_SIZE):
+    """ Esta função tem a responsabilidade de montar uma página da tabela
+
+        Retorna (página como pyarrow.Table, linhas encontradas, página
+        exibida). A página pedida é limitada às existentes. As colunas
+        category viram texto: só os valores da página vão ao navegador, e
+        não o dicionário inteiro de categorias.
+    """
+    import pyarrow as pa
+
+    rows = index.rows(sort_by, ascending, search)
+    pages = max(1, -(-len(rows) // page_size))
+    page = min(max(int(page), 1), pages)
+    part = index.table.iloc[rows[(page - 1) * page_size:page * page_size]]
+
+    return pa.Table.from_pandas(decode_categories(part)), len(rows), page
+
+
+def paged_table(st, name, state, table, columns, search=None, page_size=PAGE_SIZE, **kwargs):
+    """ Esta função tem a responsabilidade de exibir uma tabela paginada
+
+        A ordenação, a busca e a paginação acontecem no servidor: só a
+        página visível vai ao navegador. table é a tabela completa (pode ser
+        Deferred) e columns as colunas ordenáveis, conhecidas antes de
+        calcular a tabela. O índice (TableIndex) e o payload Arrow de cada
+        página ficam no cache de gráficos por (tabela, estado dos filtros,
+        ordenação, busca, página), então um rerun com o mesmo estado não
+        ordena nem serializa nada. search é a coluna da caixa de busca
+        (busca por prefixo, sem diferenciar maiúsculas). Os kwargs vão para
+        o st.dataframe. Retorna a página exibida (pyarrow.Table).
+    """
+    sort_label = st.selectbox('Ordenar por', [DEFAULT_ORDER] + list(columns),
+                              key=f'{name}_sort')
+    sort_by = None if sort_label == DEFAULT_ORDER else sort_label
+    ascending = True
+    if sort_by is not None:
+        ascending = ORDERS[st.radio('Ordem', list(ORDERS), horizontal=True,
+                                    key=f'{name}_order', label_visibility='collapsed')]
+
+    text = ''
+    if search is not None:
+        text = st.text_input(f'Buscar {search}', key=f'{name}_search').strip().upper()
+
+    page = st.number_input('Página', min_value=1, value=1, step=1, key=f'{name}_page')
+
+    index = Deferred(f'table/{name}', memoize, table_index, state, table, name=name,
+                     columns=tuple(columns), search=search)
+    payload, total, page = memoize(table_page, state, index, name=name, sort_by=sort_by,
+                                   ascending=ascending, search=text, page=page,
+                                   page_size=page_size)
+
+    timed(f'render/{name}', st.dataframe, payload, **kwargs)
+    pages = max(1, -(-total // page_size))
+    st.caption(f'Página {page} de {pages} · {total} linhas')
+
+    return payload
@@ -0,0 +1,187 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from utils.cube import MEASURES, build_cube, load_cube
+from utils.distinct import cell_codes, match_cells
+from utils.features import compute_feature
+from utils.filters import date_bounds
+from utils.loader import DATASET_PATH, cached, dataset_delta
+from utils.schema import concat_frames
+
+# Colunas das células do índice de tempo: filtros da sidebar e Festival
+TIME_DIMENSIONS = ['City', 'Road_traffic_density', 'Weatherconditions', 'Festival']
+
+# Momentos acumulados por dia: contagem, soma e soma dos quadrados
+MOMENTS = ['count'] + [f'{col}_{moment}' for col in MEASURES for moment in ('sum', 'sumsq')]
+
+ONE_DAY = pd.Timedelta(days=1)
+
+
+class TimeIndex:
+    """ Índice de somas acumuladas por dia para consultas de período
+
+        Montado uma vez a partir do cubo (utils.cube): para cada célula
+        (combinação de TIME_DIMENSIONS) e cada momento de MOMENTS guarda a
+        soma acumulada dia a dia, num calendário contínuo que começa no
+        primeiro Order_Date. prefix[d] é a soma dos d primeiros dias, então:
+        1. Um período qualquer são duas posições e uma subtração.
+        2. Uma janela móvel de w dias termina no dia t é
+           prefix[t + 1] - prefix[t + 1 - w], vetorizado para todos os t.
+        As seleções da sidebar escolhem as células que entram na soma.
+    """
+
+    def __init__(self, cube):
+        cell_ids, self.cells = cell_codes(cube, TIME_DIMENSIONS)
+        self.first = cube['Order_Date'].min().normalize()
+        days = ((cube['Order_Date'] - self.first) // ONE_DAY).to_numpy()
+        self.days = int(days.max()) + 1 if len(days) else 0
+
+        values = np.zeros((self.days + 1, len(self.cells), len(MOMENTS)))
+        np.add.at(values, (days + 1, cell_ids), cube[MOMENTS].to_numpy('float64'))
+        self.prefix = np.cumsum(values, axis=0)
+        self.masks = self._masks()
+
+    def _masks(self):
+        # Para cada valor das dimensões, as células com aquele valor
+        return {col: {value: (self.cells[col] == value).to_numpy()
+                      for value in self.cells[col].dropna().unique()}
+                for col in TIME_DIMENSIONS}
+
+    def add(self, cube):
+        """ Esta função tem a responsabilidade de somar pedidos novos
+
+            cube é o cubo (utils.cube) das linhas acrescentadas ao CSV.
+            Retorna um novo índice com os momentos delas somados às somas
+            acumuladas a partir do dia de cada uma; células e dias novos
+            entram no fim. O custo depende do tamanho do índice (dias x
+            células), não do histórico de pedidos. Retorna None se há
+            pedidos antes do primeiro dia do calendário (é preciso
+            reconstruir). O índice atual não é alterado.
+        """
+        if len(cube) == 0:
+            return self
+        if cube['Order_Date'].min().normalize() < self.first:
+            return None
+
+        cell_ids, cells = cell_codes(cube, TIME_DIMENSIONS)
+        positions = match_cells(self.cells, cells, TIME_DIMENSIONS)
+        missing = positions < 0
+        positions[missing] = len(self.cells) + np.arange(int(missing.sum()))
+        days = ((cube['Order_Date'] - self.first) // ONE_DAY).to_numpy()
+
+        index = copy.copy(self)
+        if missing.any():
+            index.cells = concat_frames([self.cells, cells.loc[missing]]).reset_index(drop=True)
+        index.days = max(self.days, int(days.max()) + 1)
+
+        values = np.zeros((index.days + 1, len(index.cells), len(MOMENTS)))
+        np.add.at(values, (days + 1, positions[cell_ids]), cube[MOMENTS].to_numpy('float64'))
+        # Dias novos repetem o acumulado do último dia; células novas começam em zero
+        prefix = np.zeros_like(values)
+        prefix[:self.days + 1, :len(self.cells)] = self.prefix
+        prefix[self.days + 1:, :len(self.cells)] = self.prefix[-1]
+        index.prefix = prefix + np.cumsum(values, axis=0)
+        index.masks = index._masks()
+
+        return index
+
+    def position(self, date):
+        """ Quantidade de dias do calendário anteriores a date """
+        days = int(np.ceil((pd.Timestamp(date) - self.first) / ONE_DAY))
+
+        return min(max(days, 0), self.days)
+
+    def bounds(self, date_range):
+        """ Posições em prefix do período (ver filters.date_bounds) """
+        start, end = date_bounds(date_range)
+        stop = self.position(end)
+
+        return (0 if start is None else min(self.position(start), stop)), stop
+
+    def mask(self, selections):
+        """ Células com valores nas seleções informadas """
+        mask = np.ones(len(self.cells), dtype=bool)
+        for col, values in selections.items():
+            col_mask = np.zeros(len(self.cells), dtype=bool)
+            for value in values:
+                if value in self.masks[col]:
+                    col_mask |= self.masks[col][value]
+            mask &= col_mask
+
+        return mask
+
+    def _moments(self, values):
+        moments = pd.DataFrame(values, columns=MOMENTS)
+        moments['count'] = moments['count'].round().astype('int64')
+
+        return moments
+
+    def _frame(self, values, dates):
+        frame = self._moments(values)
+        frame.insert(0, 'Order_Date', dates)
+        frame.insert(1, 'order_week', compute_feature(frame, 'order_week'))
+
+        return frame
+
+    def cube(self, date_range, selections):
+        """ Esta função tem a responsabilidade de agregar um período
+
+            Retorna os momentos de cada célula selecionada com pedidos no
+            período, no formato do cubo (colunas TIME_DIMENSIONS e MOMENTS),
+            então cube_count e cube_stats funcionam sobre o resultado.
+        """
+        start, stop = self.bounds(date_range)
+        cells = np.flatnonzero(self.mask(selections))
+        totals = self.prefix[stop, cells] - self.prefix[start, cells]
+        keep = totals[:, 0] > 0.5
+
+        return pd.concat([self.cells.iloc[cells[keep]].reset_index(drop=True),
+                          self._moments(totals[keep])], axis=1)
+
+    def daily(self, date_range, selections):
+        """ Esta função tem a responsabilidade de montar a série diária
+
+            Retorna uma linha por dia do calendário no período (inclusive
+            dias sem pedidos), com Order_Date, order_week e os momentos das
+            células selecionadas.
+        """
+        start, stop = self.bounds(date_range)
+        prefix = self.prefix[start:stop + 1, self.mask(selections)].sum(axis=1)
+        dates = self.first + pd.to_timedelta(np.arange(start, stop), unit='D')
+
+        return self._frame(np.diff(prefix, axis=0), dates)
+
+    def rolling(self, date_range, selections, window):
+        """ Esta função tem a responsabilidade de montar a série móvel
+
+            Como daily, mas cada dia soma os 'window' dias terminados nele.
+            A janela usa também os dias anteriores ao início do período.
+        """
+        start, stop = self.bounds(date_range)
+        prefix = self.prefix[:, self.mask(selections)].sum(axis=1)
+        ends = np.arange(start, stop) + 1
+        dates = self.first + pd.to_timedelta(ends - 1, unit='D')
+
+        return self._frame(prefix[ends] - prefix[np.maximum(ends - window, 0)], dates)
+
+
+def load_time_index(path=DATASET_PATH):
+    """ Esta função tem a responsabilidade de carregar o índice de tempo
+        do dataset
+
+        Montado sobre o cubo, então segue o modo de ingestão dele (ver
+        cube.load_cube). Se o CSV só ganhou linhas, o cubo delas é somado
+        ao índice atual (TimeIndex.add).
+    """
+    cube = load_cube(path)
+
+    def update(index, old_key):
+        # CSV cresceu por append: soma só o cubo das linhas novas
+        new = dataset_delta(path, old_key)
+        if new is None:
+            return None
+        return index.add(build_cube(new))
+
+    return cached(path, 'time_index', lambda: TimeIndex(cube), update)
@@ -0,0 +1,80 @@
+import pandas as pd
+
+from utils.features import FEATURES, compute_feature
+
+
+# Colunas em que o texto 'NaN ' indica valor ausente
+NAN_COLUMNS = ['Delivery_person_Age', 'Delivery_person_Ratings',
+               'multiple_deliveries', 'Festival', 'Road_traffic_density', 'City']
+
+# Colunas de texto com espaços sobrando no final
+STRIP_COLUMNS = ['ID', 'Road_traffic_density', 'Type_of_order',
+                 'Type_of_vehicle', 'City', 'Festival']
+
+
+def read_dataset(path, **kwargs):
+    """ Esta função tem a responsabilidade de ler o CSV bruto
+
+        O texto 'NaN ' fica como está: clean_code descarta só as linhas
+        com esse texto. Células vazias viram NaN, como no pd.read_csv, e
+        continuam no dataset, como na limpeza original.
+    """
+    return pd.read_csv(path, **kwargs)
+
+
+def clean_code(df1):
+    """ Esta função tem a responsabilidade de limpar o dataframe
+
+        Tipos de limpeza:
+        1. Retirar os valores NaN das colunas
+        2. Converter os tipos dos dados das colunas
+        3. Remoção dos espaços vazios
+        4. Formatação da coluna de data
+        5. Limpeza da coluna 'Time_taken(min)'
+
+        Retorna o mesmo resultado da limpeza original, coluna a coluna:
+        só as linhas com o texto 'NaN ' em NAN_COLUMNS são descartadas.
+    """
+    # 1. Uma única máscara com as linhas válidas em todas as colunas
+    aux = df1.loc[:, NAN_COLUMNS]
+    linhas_validas = ~(aux == 'NaN ').any(axis=1)
+    df1 = df1.loc[linhas_validas, :].copy()
+
+    # 2. Convertendo as colunas de texto para número
+    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(
+        float)
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
+
+    # 3. Convertendo a coluna order date de texto para data
+    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
+
+    # 4. Coluna Time Taken: '(min) 24' -> 24
+    df1['Time_taken(min)'] = (df1['Time_taken(min)']
+                              .str.extract('([0-9]+)', expand=False)
+                              .astype(int))
+
+    # 5. Removendo os espaços dentro de strings/texto/object
+    for col in STRIP_COLUMNS:
+        df1[col] = df1[col].str.strip()
+
+    return df1
+
+
+def feature_engineering(df1):
+    """ Esta função tem a responsabilidade de criar novas colunas:
+
+        Todas as colunas derivadas registradas em utils.features, ex.:
+        1. 'distance' - Distancia em quilometros.
+        2. 'order_week' - Semana do ano em que o pedido foi realizado.
+
+        O app calcula só as colunas que usa (utils.loader.load_features);
+        esta função serve para quem precisa de todas, como o modo em
+        blocos.
+    """
+    for name in FEATURES:
+        # Colunas já calculadas na ingestão (schema.PRECISE_FEATURES) ficam
+        if name not in df1:
+            df1[name] = compute_feature(df1, name)
+
+    return df1
@@ -0,0 +1,18 @@
+def render_views(st, views, key, label='Visão'):
+    """ Esta função tem a responsabilidade de exibir só a visão selecionada
+
+        Substitui o st.tabs, que executa o corpo de todas as abas a cada
+        rerun. views é um dicionário {rótulo: função}; a visão é escolhida
+        em um st.radio horizontal (guardado na sessão por key) e só a função
+        dela é executada, então filtros, agregações e gráficos das outras
+        visões não são calculados. Retorna o rótulo da visão exibida.
+    """
+    labels = list(views)
+    selected = labels[0]
+    if len(labels) > 1:
+        selected = st.radio(label, labels, horizontal=True, key=key,
+                            label_visibility='collapsed')
+
+    views[selected]()
+
+    return selected